@@ -24,6 +24,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "medtrackerapp.metrics.MetricsMiddleware",
+    "medtrackerapp.db_routers.ReplicaRoutingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -64,11 +66,25 @@ DATABASES_POSTGRES = {
     }
 }
 
+# Read replicas of the Postgres primary, one alias per host.
+DB_REPLICA_HOSTS = [host for host in os.getenv("DB_REPLICA_HOSTS", "").split(",") if host]
+for number, host in enumerate(DB_REPLICA_HOSTS, start=1):
+    # Tests read the replicas through the test primary instead of
+    # creating test databases on them.
+    DATABASES_POSTGRES[f"replica{number}"] = {
+        **DATABASES_POSTGRES["default"], "HOST": host, "TEST": {"MIRROR": "default"},
+    }
+
 DATABASES_SQLITE = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+    },
+    # Stand-in replica for trying the routing locally (READ_REPLICAS=replica).
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db_replica.sqlite3",
+    },
 }
 
 LANGUAGE_CODE = "en-us"
@@ -78,4 +94,76 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
-DATABASES = DATABASES_SQLITE if os.environ.get("GITHUB_ACTIONS") == "true" else DATABASES_POSTGRES
\ No newline at end of file
+DATABASES = DATABASES_SQLITE if os.environ.get("GITHUB_ACTIONS") == "true" else DATABASES_POSTGRES
+DATABASE_ROUTERS = ["medtrackerapp.db_routers.ReplicaRouter"]
+# Aliases that safe requests read from; defaults to the Postgres replicas.
+READ_REPLICAS = [
+    alias for alias in os.getenv(
+        "READ_REPLICAS", ",".join(f"replica{number}" for number in range(1, len(DB_REPLICA_HOSTS) + 1))
+    ).split(",")
+    if alias
+]
+READ_REPLICA_STICKY_SECONDS = int(os.getenv("READ_REPLICA_STICKY_SECONDS", "10"))
+
+DOSELOG_EXPORT_CHUNK_SIZE = int(os.getenv("DOSELOG_EXPORT_CHUNK_SIZE", "2000"))
+DOSELOG_BULK_BATCH_SIZE = int(os.getenv("DOSELOG_BULK_BATCH_SIZE", "500"))
+DOSELOG_BULK_MAX_ROWS = int(os.getenv("DOSELOG_BULK_MAX_ROWS", "10000"))
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv("CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": os.getenv("CACHE_LOCATION", "medtracker"),
+    }
+}
+
+DRUG_INFO_CACHE_ALIAS = os.getenv("DRUG_INFO_CACHE_ALIAS", "default")
+DRUG_INFO_CACHE_TTL = int(os.getenv("DRUG_INFO_CACHE_TTL", str(60 * 60 * 24)))
+DRUG_INFO_NEGATIVE_CACHE_TTL = int(os.getenv("DRUG_INFO_NEGATIVE_CACHE_TTL", "300"))
+DRUG_INFO_STALE_TTL = int(os.getenv("DRUG_INFO_STALE_TTL", str(60 * 60)))
+
+DRUG_INFO_POOL_SIZE = int(os.getenv("DRUG_INFO_POOL_SIZE", "10"))
+DRUG_INFO_CONNECT_TIMEOUT = float(os.getenv("DRUG_INFO_CONNECT_TIMEOUT", "3.05"))
+DRUG_INFO_READ_TIMEOUT = float(os.getenv("DRUG_INFO_READ_TIMEOUT", "5"))
+DRUG_INFO_MAX_RETRIES = int(os.getenv("DRUG_INFO_MAX_RETRIES", "2"))
+DRUG_INFO_RETRY_BACKOFF = float(os.getenv("DRUG_INFO_RETRY_BACKOFF", "0.2"))
+DRUG_INFO_RETRY_BACKOFF_MAX = float(os.getenv("DRUG_INFO_RETRY_BACKOFF_MAX", "2"))
+DRUG_INFO_TOTAL_TIMEOUT = float(os.getenv("DRUG_INFO_TOTAL_TIMEOUT", "10"))
+DRUG_INFO_BREAKER_WINDOW = int(os.getenv("DRUG_INFO_BREAKER_WINDOW", "20"))
+DRUG_INFO_BREAKER_MIN_CALLS = int(os.getenv("DRUG_INFO_BREAKER_MIN_CALLS", "5"))
+DRUG_INFO_BREAKER_THRESHOLD = float(os.getenv("DRUG_INFO_BREAKER_THRESHOLD", "0.5"))
+DRUG_INFO_BREAKER_RESET_TIMEOUT = float(os.getenv("DRUG_INFO_BREAKER_RESET_TIMEOUT", "30"))
+DRUG_INFO_ASYNC_VIEW = os.getenv("DRUG_INFO_ASYNC_VIEW", "False") == "True"
+DRUG_INFO_BATCH_SEARCH_SIZE = int(os.getenv("DRUG_INFO_BATCH_SEARCH_SIZE", "25"))
+DRUG_INFO_BATCH_CONCURRENCY = int(os.getenv("DRUG_INFO_BATCH_CONCURRENCY", "8"))
+DRUG_INFO_BATCH_MAX_IDS = int(os.getenv("DRUG_INFO_BATCH_MAX_IDS", "100"))
+DRUG_INFO_LOCAL_INDEX = os.getenv("DRUG_INFO_LOCAL_INDEX", "True") == "True"
+ANALYTICS_MAX_BUCKETS = int(os.getenv("ANALYTICS_MAX_BUCKETS", "400"))
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True") == "True"
+
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "medtrackerapp.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "medtrackerapp.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+FAST_READ_PATH = os.getenv("FAST_READ_PATH", "False") == "True"
+MEDICATION_PURGE_ASYNC = os.getenv("MEDICATION_PURGE_ASYNC", "True") == "True"
+MEDICATION_PURGE_BATCH_SIZE = int(os.getenv("MEDICATION_PURGE_BATCH_SIZE", "1000"))
+DRUG_INFO_ENRICH_ON_WRITE = os.getenv("DRUG_INFO_ENRICH_ON_WRITE", "True") == "True"
+DRUG_INFO_ENRICH_ASYNC = os.getenv("DRUG_INFO_ENRICH_ASYNC", "True") == "True"
+DRUG_INFO_ENRICH_WORKERS = int(os.getenv("DRUG_INFO_ENRICH_WORKERS", "2"))
+DRUG_INFO_ENRICH_RATE = float(os.getenv("DRUG_INFO_ENRICH_RATE", "4"))
+DRUG_INFO_REFRESH_AGE = int(os.getenv("DRUG_INFO_REFRESH_AGE", str(7 * 24 * 3600)))
+MISSED_DOSE_REOPEN_OVERLAP = int(os.getenv("MISSED_DOSE_REOPEN_OVERLAP", "300"))
+SYNC_PAGE_SIZE = int(os.getenv("SYNC_PAGE_SIZE", "1000"))
+SYNC_OVERLAP_SECONDS = int(os.getenv("SYNC_OVERLAP_SECONDS", "30"))
+DOSELOG_WRITE_BEHIND = os.getenv("DOSELOG_WRITE_BEHIND", "False") == "True"
+DOSELOG_WRITE_BEHIND_BATCH_SIZE = int(os.getenv("DOSELOG_WRITE_BEHIND_BATCH_SIZE", "500"))
+DOSELOG_WRITE_BEHIND_MAX_DELAY_MS = float(os.getenv("DOSELOG_WRITE_BEHIND_MAX_DELAY_MS", "5"))
+DOSELOG_WRITE_BEHIND_QUEUE_SIZE = int(os.getenv("DOSELOG_WRITE_BEHIND_QUEUE_SIZE", "10000"))
+DOSELOG_WRITE_BEHIND_TIMEOUT = float(os.getenv("DOSELOG_WRITE_BEHIND_TIMEOUT", "10"))
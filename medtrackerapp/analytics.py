@@ -0,0 +1,100 @@
+from datetime import date as _date, timedelta
+
+from django.db import models
+from django.db.models.functions import Trunc
+
+from .models import DoseLog, day_range
+
+
+BUCKETS = ("day", "week", "month")
+
+
+def bucket_start(day: _date, bucket: str) -> _date:
+    """
+    Return the first day of the bucket containing day. Weeks start on
+    Monday, like the database's week truncation.
+    """
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def bucket_ranges(start_date: _date, end_date: _date, bucket: str):
+    """
+    Yield (bucket_start, first_day, last_day) for every bucket touching
+    start_date..end_date, with first/last clipped to that range.
+    """
+    current = bucket_start(start_date, bucket)
+    while current <= end_date:
+        try:
+            if bucket == "day":
+                following = current + timedelta(days=1)
+            elif bucket == "week":
+                following = current + timedelta(days=7)
+            else:
+                following = (current + timedelta(days=32)).replace(day=1)
+        except OverflowError:
+            # The last bucket before date.max.
+            yield current, max(current, start_date), end_date
+            return
+        yield current, max(current, start_date), min(following - timedelta(days=1), end_date)
+        current = following
+
+
+def bucket_count(start_date: _date, end_date: _date, bucket: str) -> int:
+    """
+    Return how many buckets bucket_ranges() yields, without building them.
+    """
+    first, last = bucket_start(start_date, bucket), bucket_start(end_date, bucket)
+    if bucket == "day":
+        return (last - first).days + 1
+    if bucket == "week":
+        return (last - first).days // 7 + 1
+    return (last.year - first.year) * 12 + last.month - first.month + 1
+
+
+def adherence_series(medications, start_date: _date, end_date: _date, bucket: str, tz):
+    """
+    Taken, expected and adherence for each medication in the medications
+    queryset, per bucket between start_date and end_date (inclusive),
+    with days taken in time zone tz.
+
+    Taken doses for every medication and bucket come from one grouped
+    query. Expected doses use Medication.expected_doses() on the number
+    of days of the bucket inside the range, and adherence is rounded like
+    Medication.adherence_rate_over_period().
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of {', '.join(BUCKETS)}")
+    if start_date > end_date:
+        raise ValueError("start_date must be before or equal to end_date")
+
+    start_at, end_at = day_range(start_date, end_date, tz)
+    rows = DoseLog.objects.filter(
+        medication__in=medications.values("pk"),
+        taken_at__gte=start_at,
+        taken_at__lt=end_at,
+        was_taken=True,
+    ).annotate(
+        bucket=Trunc("taken_at", bucket, output_field=models.DateField(), tzinfo=tz),
+    ).values_list("medication_id", "bucket").annotate(taken=models.Count("id")).order_by()
+    taken = {(medication_id, key): count for medication_id, key, count in rows}
+
+    ranges = list(bucket_ranges(start_date, end_date, bucket))
+    results = []
+    for medication in medications.order_by("pk"):
+        series = []
+        for key, first, last in ranges:
+            expected = medication.expected_doses((last - first).days + 1)
+            count = taken.get((medication.pk, key), 0)
+            series.append({
+                "start": first,
+                "end": last,
+                "taken": count,
+                "expected": expected,
+                "adherence": round((count / expected) * 100, 2) if expected else 0.0,
+            })
+        results.append({"medication_id": medication.pk, "name": medication.name, "buckets": series})
+    return results
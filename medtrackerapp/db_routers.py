@@ -0,0 +1,112 @@
+"""
+Read-replica routing.
+
+ReplicaRoutingMiddleware lets reads made while handling a safe request
+(GET, HEAD, OPTIONS) go to one of settings.READ_REPLICAS, picked once per
+request so that all its reads see the same replication lag; everything else,
+including management commands and background threads, stays on the
+primary. After a client writes, a cookie pins its reads to the primary
+for READ_REPLICA_STICKY_SECONDS so it sees its own changes despite
+replication lag.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+PIN_COOKIE = "medtracker_read_primary"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# The replica the current context reads from, or None for the primary.
+_read_replica = ContextVar("read_replica", default=None)
+
+
+def use_replicas(enabled=True):
+    """
+    Allow (or forbid) replica reads in the current context, picking the
+    replica every read of the context goes to. Returns the token to pass
+    to ContextVar.reset().
+    """
+    replicas = settings.READ_REPLICAS
+    return _read_replica.set(random.choice(replicas) if enabled and replicas else None)
+
+
+def pin_to_primary():
+    """
+    Send the remaining reads of the current context to the primary.
+    """
+    _read_replica.set(None)
+
+
+class ReplicaRouter:
+    """
+    Route reads to the replica chosen for the current context, if any.
+    Writes always go to the primary; the write paths themselves (see
+    VersionedModel) pin later reads of the same context to it.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_replica.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        pool = {DEFAULT_DB_ALIAS, *settings.READ_REPLICAS}
+        if obj1._state.db in pool and obj2._state.db in pool:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Enable replica reads for safe requests from clients that have not
+    written recently, and set the pin cookie after successful writes.
+    Works in sync and async stacks; sync_to_async copies the context, so
+    the flag reaches ORM calls made from async views.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = self._enable(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_replica.reset(token)
+        return self._pin(request, response)
+
+    async def __acall__(self, request):
+        token = self._enable(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_replica.reset(token)
+        return self._pin(request, response)
+
+    @staticmethod
+    def _enable(request):
+        pinned = PIN_COOKIE in request.COOKIES
+        return use_replicas(request.method in SAFE_METHODS and not pinned)
+
+    @staticmethod
+    def _pin(request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and settings.READ_REPLICAS:
+            response.set_cookie(
+                PIN_COOKIE, "1", max_age=settings.READ_REPLICA_STICKY_SECONDS, httponly=True, samesite="Lax",
+            )
+        return response
@@ -0,0 +1,124 @@
+"""
+Drug info enrichment.
+
+Medications store their OpenFDA label data (Medication.info_*), so reads
+never wait on the upstream API. New and renamed medications are queued
+for enrichment on a small thread pool when their transaction commits; the
+refresh_drug_info command refreshes stale entries. Both go through
+DrugInfoService.fetch_many() (cache, local index, combined searches) and
+share a rate limiter bounding upstream lookups per second.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Medication
+from .services import DrugInfoService
+
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """
+    Blocking limiter spacing out acquisitions to at most rate per second.
+    A rate of 0 disables it.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def acquire(self, amount=1):
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + amount / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_limiter = None
+
+
+def get_limiter():
+    global _limiter
+    with _executor_lock:
+        if _limiter is None or _limiter.rate != settings.DRUG_INFO_ENRICH_RATE:
+            _limiter = RateLimiter(settings.DRUG_INFO_ENRICH_RATE)
+        return _limiter
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.DRUG_INFO_ENRICH_WORKERS, thread_name_prefix="drug-info-enrichment",
+            )
+        return _executor
+
+
+def enrich(pks, using="default", limiter=None):
+    """
+    Fetch and store drug info for the medications with the given pks.
+    Returns the number of medications whose info was stored.
+    """
+    medications = list(Medication.objects.using(using).filter(pk__in=list(pks)).only("pk", "name"))
+    if not medications:
+        return 0
+    names = [medication.name for medication in medications]
+    info = DrugInfoService().fetch_many(names, limiter=limiter or get_limiter())
+    return sum(medication.store_info(info[medication.name], using=using) for medication in medications)
+
+
+def stale(max_age=None, using="default"):
+    """
+    Medications whose drug info was never fetched or is older than max_age,
+    plus "no results" answers older than DRUG_INFO_NEGATIVE_CACHE_TTL.
+    """
+    if max_age is None:
+        max_age = timedelta(seconds=settings.DRUG_INFO_REFRESH_AGE)
+    now = timezone.now()
+    negative_ttl = timedelta(seconds=settings.DRUG_INFO_NEGATIVE_CACHE_TTL)
+    return Medication.objects.using(using).filter(
+        Q(info_fetched_at__isnull=True) | Q(info_fetched_at__lt=now - max_age)
+        | (~Q(info_error="") & Q(info_fetched_at__lt=now - negative_ttl))
+    )
+
+
+def schedule_enrichment(pks, using="default"):
+    """
+    Enrich the given medications on the thread pool, or inline when
+    DRUG_INFO_ENRICH_ASYNC is off. Does nothing if DRUG_INFO_ENRICH_ON_WRITE
+    is off. Returns the future, if one was submitted.
+    """
+    if not settings.DRUG_INFO_ENRICH_ON_WRITE:
+        return None
+    pks = list(pks)
+    if not settings.DRUG_INFO_ENRICH_ASYNC:
+        enrich(pks, using)
+        return None
+    return _get_executor().submit(_enrich_in_background, pks, using)
+
+
+def _enrich_in_background(pks, using):
+    try:
+        return enrich(pks, using)
+    except Exception:
+        logger.exception("Enriching medications %s failed; refresh_drug_info will retry them.", pks)
+        return 0
+    finally:
+        connections.close_all()
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from medtrackerapp.models import DoseLog, DailyDoseRollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the per-medication daily dose rollups from the dose logs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--medication",
+            type=int,
+            action="append",
+            dest="medications",
+            help="Only rebuild rollups for this medication id (may be repeated).",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        logs = DoseLog.objects.all()
+        rollups = DailyDoseRollup.objects.all()
+        if options["medications"]:
+            logs = logs.filter(medication_id__in=options["medications"])
+            rollups = rollups.filter(medication_id__in=options["medications"])
+
+        rows = logs.annotate(
+            day=TruncDate("taken_at", tzinfo=timezone.get_default_timezone()),
+        ).values("medication_id", "day").annotate(
+            taken=models.Count("id", filter=models.Q(was_taken=True)),
+            missed=models.Count("id", filter=models.Q(was_taken=False)),
+        ).order_by()
+
+        with transaction.atomic():
+            # Stamp the rebuilt rows so the missed dose detector, which
+            # scans rollups by changed_at, looks at them again.
+            now = timezone.now()
+            rollups.delete()
+            created = DailyDoseRollup.objects.bulk_create(
+                [DailyDoseRollup(**row, changed_at=now) for row in rows.iterator()],
+                batch_size=options["batch_size"],
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {len(created)} daily rollup rows."))
@@ -0,0 +1,242 @@
+import json
+import math
+import random
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.backends.base.creation import TEST_DATABASE_PREFIX
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from medtrackerapp.models import Medication, DoseLog, DoctorNote
+from medtrackerapp.services import DrugInfoService
+
+
+DRUG_NAMES = (
+    "Aspirin", "Ibuprofen", "Metformin", "Lisinopril", "Atorvastatin", "Amlodipine",
+    "Omeprazole", "Levothyroxine", "Simvastatin", "Losartan", "Gabapentin", "Sertraline",
+)
+
+STUB_INFO = {"brand_name": "Bench", "manufacturer": "Bench Labs", "substance": "Benchamide"}
+
+
+def is_test_database(conn):
+    """
+    Whether conn points at a throwaway database: an in-memory SQLite one
+    or one named like the test runner's databases.
+    """
+    name = str(conn.settings_dict["NAME"])
+    test_name = (conn.settings_dict.get("TEST") or {}).get("NAME")
+    return (
+        name == ":memory:" or "mode=memory" in name
+        or name.startswith(TEST_DATABASE_PREFIX) or (test_name is not None and name == str(test_name))
+    )
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic medications, dose logs and notes, then time the main API endpoints "
+        "in-process and report latency percentiles, throughput and query counts as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--medications", type=int, default=200)
+        parser.add_argument("--logs-per-medication", type=int, default=100)
+        parser.add_argument("--notes-per-medication", type=int, default=5)
+        parser.add_argument("--days", type=int, default=60, help="Days of history the dose logs are spread over.")
+        parser.add_argument("--requests", type=int, default=50, help="Timed requests per endpoint.")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write the JSON report to this file (usable as a baseline).")
+        parser.add_argument("--baseline", help="Compare against a report written earlier with --output.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.25,
+            help="Allowed relative p95 slowdown against the baseline before it counts as a regression.",
+        )
+        parser.add_argument("--keep", action="store_true", help="Keep the seeded rows instead of rolling back.")
+        parser.add_argument(
+            "--allow-existing-db", action="store_true",
+            help="Seed into a database that is not a test database (it is still rolled back unless --keep).",
+        )
+        parser.add_argument(
+            "--fast-read-path", action="store_true",
+            help="Enable FAST_READ_PATH (values()-based dose log and note lists) for the run.",
+        )
+
+    def handle(self, *args, **options):
+        for name in ("medications", "logs_per_medication", "requests", "days"):
+            if options[name] <= 0:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive.")
+        if not options["allow_existing_db"] and not is_test_database(connection):
+            raise CommandError(
+                f"Refusing to seed benchmark data into {connection.settings_dict['NAME']}, which is not a test "
+                "database. Pass --allow-existing-db to run against it anyway."
+            )
+        baseline = self.load_baseline(options["baseline"]) if options["baseline"] else None
+        fast_read_path = options["fast_read_path"] or settings.FAST_READ_PATH
+
+        # Seeded medications must not be queued for upstream enrichment.
+        with override_settings(DRUG_INFO_ENRICH_ON_WRITE=False), transaction.atomic():
+            start = time.perf_counter()
+            medications = self.seed(random.Random(options["seed"]), options)
+            seed_seconds = time.perf_counter() - start
+
+            rng = random.Random(options["seed"])
+            with mock.patch.object(DrugInfoService, "fetch_external_info", return_value=STUB_INFO), \
+                    override_settings(
+                        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+                        FAST_READ_PATH=fast_read_path,
+                    ):
+                results = self.run_endpoints(rng, medications, options)
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+
+        report = {
+            "config": {
+                name: options[name]
+                for name in ("medications", "logs_per_medication", "notes_per_medication", "days", "requests", "seed")
+            },
+            "fast_read_path": fast_read_path,
+            "database": connection.vendor,
+            "seed_seconds": round(seed_seconds, 3),
+            "endpoints": results,
+        }
+        if baseline is not None:
+            report["regressions"] = self.compare(results, baseline.get("endpoints", {}), options["tolerance"])
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as handle:
+                handle.write(output + "\n")
+        self.stdout.write(output)
+
+        if report.get("regressions"):
+            raise CommandError(f"{len(report['regressions'])} endpoint(s) regressed against the baseline.")
+
+    @staticmethod
+    def load_baseline(path):
+        try:
+            with open(path) as handle:
+                return json.load(handle)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read baseline {path}: {exc}")
+
+    @staticmethod
+    def seed(rng, options):
+        medications = Medication.objects.bulk_create([
+            Medication(
+                name=f"{rng.choice(DRUG_NAMES)} {i}",
+                dosage_mg=rng.choice((5, 10, 20, 50, 100, 250, 500)),
+                prescribed_per_day=rng.randint(1, 4),
+            )
+            for i in range(options["medications"])
+        ], batch_size=1000)
+
+        now = timezone.now()
+        span = options["days"] * 24 * 60 * 60
+        logs = [
+            DoseLog(
+                medication=medication,
+                taken_at=now - timedelta(seconds=rng.randint(60, span)),
+                was_taken=rng.random() < 0.8,
+            )
+            for medication in medications
+            for _ in range(options["logs_per_medication"])
+        ]
+        DoseLog.objects.bulk_create(logs, batch_size=1000)
+
+        today = timezone.localdate()
+        DoctorNote.objects.bulk_create([
+            DoctorNote(
+                medication=medication,
+                note=f"Review {medication.name} dosage.",
+                created_at=today - timedelta(days=rng.randint(0, options["days"])),
+            )
+            for medication in medications
+            for _ in range(options["notes_per_medication"])
+        ], batch_size=1000)
+        return medications
+
+    def run_endpoints(self, rng, medications, options):
+        today = timezone.localdate()
+        week_ago = today - timedelta(days=6)
+
+        def detail(name):
+            return lambda: reverse(name, kwargs={"pk": rng.choice(medications).pk})
+
+        endpoints = {
+            "medication-list": lambda: reverse("medication-list"),
+            "medication-detail": detail("medication-detail"),
+            "medication-expected-doses": lambda: detail("medication-expected-doses")() + "?days=7",
+            "doselog-list": lambda: reverse("doselog-list") + "?page_size=500",
+            "doselog-filter": lambda: reverse("doselog-filter-by-date") + f"?start={week_ago}&end={today}",
+            "note-search": lambda: reverse("doctornote-list") + f"?search={rng.choice(DRUG_NAMES)}",
+            "medication-info": detail("medication-get-external-info"),
+        }
+
+        client = APIClient()
+        results = {}
+        for name, make_url in endpoints.items():
+            client.get(make_url())  # warm up
+
+            latencies, queries = [], []
+            started = time.perf_counter()
+            for _ in range(options["requests"]):
+                url = make_url()
+                # Reads may be routed to a replica, so count on every alias.
+                with ExitStack() as stack:
+                    captured = [stack.enter_context(CaptureQueriesContext(conn)) for conn in connections.all()]
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise CommandError(f"{name}: GET {url} returned {response.status_code}.")
+                queries.append(sum(len(capture.captured_queries) for capture in captured))
+            elapsed = time.perf_counter() - started
+
+            latencies.sort()
+            results[name] = {
+                "requests": len(latencies),
+                "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+                "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+                "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+                "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else None,
+                "queries_avg": round(sum(queries) / len(queries), 2),
+                "queries_max": max(queries),
+            }
+        return results
+
+    @staticmethod
+    def compare(results, baseline, tolerance):
+        regressions = []
+        for name, current in results.items():
+            previous = baseline.get(name)
+            if not previous:
+                continue
+            if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+                regressions.append({
+                    "endpoint": name, "metric": "p95_ms",
+                    "baseline": previous["p95_ms"], "current": current["p95_ms"],
+                })
+            if current["queries_max"] > previous["queries_max"]:
+                regressions.append({
+                    "endpoint": name, "metric": "queries_max",
+                    "baseline": previous["queries_max"], "current": current["queries_max"],
+                })
+        return regressions
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from medtrackerapp.missed_doses import detect, last_complete_day
+
+
+class Command(BaseCommand):
+    help = "Raise missed-dose alerts for the days checked since the last run and for backdated changes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--through", help="Last day to check, YYYY-MM-DD (default yesterday).",
+        )
+        parser.add_argument(
+            "--medication", type=int, action="append", dest="medications",
+            help="Only check this medication id (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        through = last_complete_day()
+        if options["through"]:
+            try:
+                through = parse_date(options["through"])
+            except ValueError:
+                through = None
+            if through is None:
+                raise CommandError("Invalid --through. Expected YYYY-MM-DD.")
+            if through > last_complete_day():
+                raise CommandError("--through must be a day that has already ended.")
+
+        medications, days, written, resolved = detect(through, options["medications"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {days} days across {medications} medications: "
+            f"{written} alerts raised or updated, {resolved} resolved."
+        ))
+
@@ -0,0 +1,167 @@
+import gzip
+import io
+import json
+import re
+import zipfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from medtrackerapp.models import DrugLabel
+from medtrackerapp.services import DrugInfoService
+
+
+RESULTS_START = re.compile(r'"results"\s*:\s*\[')
+
+
+def iter_array_items(stream, read_size=1 << 16):
+    """
+    Incrementally yield the items of the top-level "results" array of an
+    OpenFDA bulk JSON document read from a text stream. Only the item
+    being decoded is held in memory, however large the file is.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    def fill():
+        nonlocal buffer, eof
+        chunk = stream.read(read_size)
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+    while True:
+        match = RESULTS_START.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        if eof:
+            raise ValueError('No "results" array found.')
+        # Keep a tail in case the key straddles two reads.
+        buffer = buffer[-32:]
+        fill()
+
+    pos = 0
+    while True:
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            buffer, pos = "", 0
+            fill()
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of file inside the results array.")
+        if buffer[pos] == "]":
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            buffer, pos = buffer[pos:], 0
+            fill()
+            continue
+        yield item
+        pos = end
+
+
+def first(record, field):
+    """
+    Read a label field from the openfda section, falling back to the
+    top-level field.
+    """
+    openfda = record.get("openfda") if isinstance(record.get("openfda"), dict) else {}
+    for values in (openfda.get(field), record.get(field)):
+        if isinstance(values, list) and values:
+            return str(values[0])
+    return ""
+
+
+class Command(BaseCommand):
+    help = "Import an OpenFDA drug label bulk download (.json, .json.gz or .zip) into the local label index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Path to the bulk download file.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--read-size", type=int, default=1 << 16, help="Characters read per chunk.")
+        parser.add_argument("--replace", action="store_true", help="Remove all previously imported labels first.")
+
+    def handle(self, *args, **options):
+        if options["replace"]:
+            # One transaction, so a failed import keeps the previous labels.
+            with transaction.atomic():
+                DrugLabel.objects.all().delete()
+                self.import_labels(options)
+        else:
+            self.import_labels(options)
+
+    def import_labels(self, options):
+        records = imported = 0
+        batch = {}
+        for stream in self.open_streams(options["path"]):
+            with stream:
+                for record in iter_array_items(stream, options["read_size"]):
+                    records += 1
+                    for label in self.labels(record):
+                        batch[(label.set_id, label.brand_name_key)] = label
+                    if len(batch) >= options["batch_size"]:
+                        imported += self.save(batch)
+        imported += self.save(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} labels from {records} records."))
+
+    def open_streams(self, path):
+        try:
+            if zipfile.is_zipfile(path):
+                with zipfile.ZipFile(path) as archive:
+                    for member in archive.namelist():
+                        if member.endswith(".json"):
+                            yield io.TextIOWrapper(archive.open(member), encoding="utf-8")
+                return
+            with open(path, "rb") as raw:
+                magic = raw.read(2)
+            if magic == b"\x1f\x8b":
+                yield gzip.open(path, "rt", encoding="utf-8")
+            else:
+                yield open(path, encoding="utf-8")
+        except OSError as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+
+    @staticmethod
+    def labels(record):
+        if not isinstance(record, dict):
+            return []
+        openfda = record.get("openfda") if isinstance(record.get("openfda"), dict) else {}
+        brands = openfda.get("brand_name") or record.get("drug_brand_name") or []
+        set_id = str(record.get("set_id") or record.get("id") or "")[:64]
+        manufacturer = first(record, "manufacturer_name")[:255]
+        substance = first(record, "substance_name")[:255]
+        labels = []
+        for brand in brands if isinstance(brands, list) else []:
+            brand = str(brand)[:255]
+            key = DrugInfoService.normalize_name(brand)
+            if key:
+                labels.append(DrugLabel(
+                    set_id=set_id or key[:64],
+                    brand_name=brand,
+                    brand_name_key=key,
+                    manufacturer=manufacturer,
+                    substance=substance,
+                ))
+        return labels
+
+    @staticmethod
+    def save(batch):
+        if not batch:
+            return 0
+        with transaction.atomic():
+            DrugLabel.objects.bulk_create(
+                list(batch.values()),
+                update_conflicts=True,
+                unique_fields=["set_id", "brand_name_key"],
+                update_fields=["brand_name", "manufacturer", "substance"],
+            )
+        count = len(batch)
+        batch.clear()
+        return count
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from medtrackerapp.models import Medication
+from medtrackerapp.purge import purge_medication
+
+
+class Command(BaseCommand):
+    help = "Purge hidden (deleted) medications and their dose logs and notes in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows deleted per transaction.")
+
+    def handle(self, *args, **options):
+        pks = list(Medication.all_objects.filter(deleted_at__isnull=False).values_list("pk", flat=True))
+        rows = 0
+        for pk in pks:
+            rows += purge_medication(pk, batch_size=options["batch_size"]) or 0
+        self.stdout.write(self.style.SUCCESS(f"Purged {len(pks)} medications ({rows} dose logs and notes)."))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from medtrackerapp.models import Medication, AdherenceCounter
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify) the denormalized adherence counters from the dose logs."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare the stored counters with the dose logs and fail on drift.",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            expected = {
+                pk: (taken, total)
+                for pk, taken, total in Medication.all_objects.with_adherence_counts()
+                .values_list("pk", "taken_doses", "total_doses")
+                if total
+            }
+            stored = {
+                pk: (taken, total)
+                for pk, taken, total in AdherenceCounter.objects.values_list("medication_id", "taken", "total")
+                if taken or total
+            }
+            mismatched = sorted(
+                pk for pk in expected.keys() | stored.keys()
+                if expected.get(pk, (0, 0)) != stored.get(pk, (0, 0))
+            )
+
+            if options["verify"]:
+                if mismatched:
+                    raise CommandError(
+                        f"{len(mismatched)} counter(s) out of sync for medication ids: "
+                        f"{', '.join(str(pk) for pk in mismatched)}"
+                    )
+                self.stdout.write(self.style.SUCCESS(f"All {len(expected)} counters match the dose logs."))
+                return
+
+            AdherenceCounter.objects.all().delete()
+            AdherenceCounter.objects.bulk_create(
+                [AdherenceCounter(medication_id=pk, taken=taken, total=total)
+                 for pk, (taken, total) in expected.items()],
+                batch_size=1000,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(expected)} counters ({len(mismatched)} were out of sync)."
+        ))
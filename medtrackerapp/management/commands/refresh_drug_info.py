@@ -0,0 +1,51 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from medtrackerapp.enrichment import RateLimiter, enrich, stale
+
+
+class Command(BaseCommand):
+    help = "Fetch and store drug info for medications that have none or whose info is stale."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=25, help="Medications looked up together.")
+        parser.add_argument(
+            "--rate", type=float, default=None,
+            help="Maximum medications looked up per second (default DRUG_INFO_ENRICH_RATE, 0 for no limit).",
+        )
+        parser.add_argument(
+            "--max-age", type=int, default=None,
+            help="Refresh info older than this many seconds (default DRUG_INFO_REFRESH_AGE).",
+        )
+        parser.add_argument("--loop", action="store_true", help="Keep running, polling for stale entries.")
+        parser.add_argument("--idle-sleep", type=float, default=60, help="Seconds to wait when nothing is stale.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0:
+            raise CommandError("--batch-size must be positive.")
+        rate = settings.DRUG_INFO_ENRICH_RATE if options["rate"] is None else options["rate"]
+        limiter = RateLimiter(rate)
+        max_age = timedelta(seconds=settings.DRUG_INFO_REFRESH_AGE if options["max_age"] is None else options["max_age"])
+
+        stored = attempted = 0
+        seen = set()
+        while True:
+            # Entries that could not be stored stay stale; skip them until
+            # the next pass so one bad name cannot spin the loop.
+            pks = list(
+                stale(max_age).exclude(pk__in=seen).order_by("info_fetched_at", "pk")
+                .values_list("pk", flat=True)[:options["batch_size"]]
+            )
+            if not pks:
+                if not options["loop"]:
+                    break
+                seen.clear()
+                time.sleep(options["idle_sleep"])
+                continue
+            seen.update(pks)
+            attempted += len(pks)
+            stored += enrich(pks, limiter=limiter)
+
+        self.stdout.write(self.style.SUCCESS(f"Stored drug info for {stored} of {attempted} medications."))
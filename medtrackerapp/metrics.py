@@ -0,0 +1,253 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+
+class Metric:
+    """
+    Base class of the in-process metrics. Values are kept per label tuple
+    behind one lock, so recording costs a dict lookup and an addition.
+    """
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def _labels(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+            lines.extend(self.samples(items))
+        return lines
+
+    def samples(self, items):
+        for labels, value in items:
+            yield f"{self.name}{self._labels(labels)} {_number(value)}"
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            entry[0][index] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    def samples(self, items):
+        for labels, (counts, count, total) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else _number(bound)
+                yield f"{self.name}_bucket{self._labels(labels, [('le', le)])} {cumulative}"
+            yield f"{self.name}_count{self._labels(labels)} {count}"
+            yield f"{self.name}_sum{self._labels(labels)} {_number(total)}"
+
+
+REQUEST_LATENCY = Histogram(
+    "medtracker_request_duration_seconds", "Request latency by view.", ("view", "method", "status"),
+)
+REQUEST_QUERIES = Histogram(
+    "medtracker_request_queries", "SQL queries executed per request by view.", ("view", "method"),
+    buckets=QUERY_BUCKETS,
+)
+REQUEST_SQL_TIME = Histogram(
+    "medtracker_request_sql_duration_seconds", "Time spent in SQL per request by view.", ("view", "method"),
+)
+FUNCTION_LATENCY = Histogram(
+    "medtracker_function_duration_seconds", "Latency of instrumented hot paths.", ("function",),
+)
+FUNCTION_ERRORS = Counter(
+    "medtracker_function_errors_total", "Exceptions raised by instrumented hot paths.", ("function",),
+)
+
+WRITE_BEHIND_BATCH_ROWS = Histogram(
+    "medtracker_doselog_write_behind_batch_rows", "Dose logs committed per write-behind batch.",
+    buckets=BATCH_BUCKETS,
+)
+
+REGISTRY = [
+    REQUEST_LATENCY, REQUEST_QUERIES, REQUEST_SQL_TIME, FUNCTION_LATENCY, FUNCTION_ERRORS, WRITE_BEHIND_BATCH_ROWS,
+]
+
+
+def timed(name):
+    """
+    Decorator recording the wall time of every call into the function
+    latency histogram under the given name. Coroutine functions are timed
+    until their result is ready.
+    """
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    FUNCTION_ERRORS.inc(name)
+                    raise
+                finally:
+                    FUNCTION_LATENCY.observe(time.perf_counter() - start, name)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                FUNCTION_ERRORS.inc(name)
+                raise
+            finally:
+                FUNCTION_LATENCY.observe(time.perf_counter() - start, name)
+        return wrapper
+    return decorator
+
+
+class _QueryTimer:
+    """
+    connection.execute_wrapper() hook counting queries and their time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL query count and SQL time of every request,
+    labelled with the resolved view name. Disabled with METRICS_ENABLED.
+
+    Works in sync and async stacks. Under ASGI the ORM runs on the
+    request's sync_to_async thread, so the query hooks are installed on
+    that thread's connections.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        queries = _QueryTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            self._hook(stack, queries)
+            response = self.get_response(request)
+        self._record(request, response, queries, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        queries = _QueryTimer()
+        start = time.perf_counter()
+        stack = ExitStack()
+        await sync_to_async(self._hook)(stack, queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self._record(request, response, queries, time.perf_counter() - start)
+        return response
+
+    @staticmethod
+    def _hook(stack, queries):
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(queries))
+
+    @staticmethod
+    def _record(request, response, queries, duration):
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name or match.route) if match else "unresolved"
+        REQUEST_LATENCY.observe(duration, view, request.method, str(response.status_code))
+        REQUEST_QUERIES.observe(queries.count, view, request.method)
+        REQUEST_SQL_TIME.observe(queries.duration, view, request.method)
+
+
+def render(extra=()):
+    """
+    Render every registered metric, followed by the extra lines, in the
+    Prometheus text exposition format.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    for metric in REGISTRY:
+        metric.clear()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
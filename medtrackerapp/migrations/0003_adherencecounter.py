@@ -0,0 +1,37 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_counters(apps, schema_editor):
+    Medication = apps.get_model("medtrackerapp", "Medication")
+    AdherenceCounter = apps.get_model("medtrackerapp", "AdherenceCounter")
+    db = schema_editor.connection.alias
+    rows = Medication.objects.using(db).annotate(
+        total_doses=models.Count("doselog"),
+        taken_doses=models.Count("doselog", filter=models.Q(doselog__was_taken=True)),
+    ).values_list("pk", "taken_doses", "total_doses")
+    AdherenceCounter.objects.using(db).bulk_create(
+        [AdherenceCounter(medication_id=pk, taken=taken, total=total) for pk, taken, total in rows if total],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medtrackerapp', '0002_doctornote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdherenceCounter',
+            fields=[
+                ('medication', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='adherence_counter', serialize=False, to='medtrackerapp.medication')),
+                ('taken', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
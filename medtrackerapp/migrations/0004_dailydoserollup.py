@@ -0,0 +1,47 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:23
+
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def backfill_rollups(apps, schema_editor):
+    DoseLog = apps.get_model("medtrackerapp", "DoseLog")
+    DailyDoseRollup = apps.get_model("medtrackerapp", "DailyDoseRollup")
+    db = schema_editor.connection.alias
+    rows = DoseLog.objects.using(db).annotate(
+        day=TruncDate("taken_at", tzinfo=timezone.get_default_timezone()),
+    ).values("medication_id", "day").annotate(
+        taken=models.Count("id", filter=models.Q(was_taken=True)),
+        missed=models.Count("id", filter=models.Q(was_taken=False)),
+    ).order_by()
+    DailyDoseRollup.objects.using(db).bulk_create(
+        [DailyDoseRollup(**row) for row in rows.iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medtrackerapp', '0003_adherencecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyDoseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('taken', models.IntegerField(default=0)),
+                ('missed', models.IntegerField(default=0)),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='medtrackerapp.medication')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailydoserollup',
+            constraint=models.UniqueConstraint(fields=('medication', 'day'), name='unique_rollup_per_medication_day'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medtrackerapp', '0004_dailydoserollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='doselog',
+            index=models.Index(fields=['medication', 'taken_at'], name='doselog_med_taken_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doselog',
+            index=models.Index(fields=['taken_at'], name='doselog_taken_at_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medtrackerapp', '0005_doselog_taken_at_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='doselog',
+            name='doselog_taken_at_idx',
+        ),
+        migrations.AddIndex(
+            model_name='doselog',
+            index=models.Index(fields=['taken_at', 'id'], name='doselog_taken_at_id_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medtrackerapp', '0006_doselog_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DrugLabel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('set_id', models.CharField(max_length=64)),
+                ('brand_name', models.CharField(max_length=255)),
+                ('brand_name_key', models.CharField(db_index=True, help_text='Normalized brand name', max_length=255)),
+                ('manufacturer', models.CharField(blank=True, max_length=255)),
+                ('substance', models.CharField(blank=True, max_length=255)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='druglabel',
+            constraint=models.UniqueConstraint(fields=('set_id', 'brand_name_key'), name='unique_label_brand'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:33
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def seed_versions(apps, schema_editor):
+    CollectionVersion = apps.get_model("medtrackerapp", "CollectionVersion")
+    now = timezone.now()
+    CollectionVersion.objects.using(schema_editor.connection.alias).bulk_create(
+        [CollectionVersion(name=name, version=1, updated_at=now) for name in ("medication", "doselog", "doctornote")],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medtrackerapp', '0007_druglabel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionVersion',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
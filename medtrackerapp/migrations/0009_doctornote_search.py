@@ -0,0 +1,61 @@
+import django.contrib.postgres.search
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+NOTE_TABLE = "medtrackerapp_doctornote"
+MEDICATION_TABLE = "medtrackerapp_medication"
+FTS_TABLE = "medtrackerapp_doctornote_fts"
+SEARCH_INDEX = "doctornote_search_idx"
+
+
+def search_index():
+    return GinIndex(fields=["search_vector"], name=SEARCH_INDEX)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        DoctorNote = apps.get_model("medtrackerapp", "DoctorNote")
+        Medication = apps.get_model("medtrackerapp", "Medication")
+        # Not part of the model state: SQLite cannot build GIN indexes.
+        schema_editor.add_index(DoctorNote, search_index())
+        name = Subquery(Medication.objects.filter(pk=OuterRef("medication_id")).values("name")[:1])
+        DoctorNote.objects.using(schema_editor.connection.alias).update(
+            search_vector=SearchVector("note", weight="A", config="simple")
+            + SearchVector(name, weight="B", config="simple"),
+        )
+    elif vendor == "sqlite":
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(note, medication, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, note, medication) "
+            f"SELECT n.id, n.note, m.name FROM {NOTE_TABLE} n JOIN {MEDICATION_TABLE} m ON m.id = n.medication_id"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.remove_index(apps.get_model("medtrackerapp", "DoctorNote"), search_index())
+    elif vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medtrackerapp', '0008_collectionversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctornote',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medtrackerapp', '0009_doctornote_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medication',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, help_text='Set when the medication is hidden; its history is purged in the background.', null=True),
+        ),
+    ]
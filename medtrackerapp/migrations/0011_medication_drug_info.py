@@ -0,0 +1,38 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medtrackerapp', '0010_medication_deleted_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medication',
+            name='info_brand_name',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='medication',
+            name='info_error',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='medication',
+            name='info_fetched_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='medication',
+            name='info_manufacturer',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='medication',
+            name='info_substance',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medtrackerapp', '0011_medication_drug_info'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MissedDoseWatermark',
+            fields=[
+                ('medication', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='missed_dose_watermark', serialize=False, to='medtrackerapp.medication')),
+                ('day', models.DateField()),
+                ('scanned_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='dailydoserollup',
+            name='changed_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='MissedDoseAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('expected', models.IntegerField()),
+                ('taken', models.IntegerField()),
+                ('missed', models.IntegerField()),
+                ('detected_at', models.DateTimeField()),
+                ('medication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='missed_dose_alerts', to='medtrackerapp.medication')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day', 'id'], name='alert_day_id_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='misseddosealert',
+            constraint=models.UniqueConstraint(fields=('medication', 'day'), name='unique_alert_per_medication_day'),
+        ),
+    ]
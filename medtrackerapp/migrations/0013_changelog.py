@@ -0,0 +1,44 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:52
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_changelog(apps, schema_editor):
+    """
+    Give every existing dose log and note an entry, so a sync without a
+    token returns the whole collection.
+    """
+    ChangeLogEntry = apps.get_model("medtrackerapp", "ChangeLogEntry")
+    alias = schema_editor.connection.alias
+    now = timezone.now()
+    for collection, model_name in (("doselog", "DoseLog"), ("doctornote", "DoctorNote")):
+        pks = apps.get_model("medtrackerapp", model_name).objects.using(alias).order_by("pk").values_list("pk", flat=True)
+        ChangeLogEntry.objects.using(alias).bulk_create(
+            (ChangeLogEntry(collection=collection, object_id=pk, changed_at=now) for pk in pks.iterator()),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medtrackerapp', '0012_missed_dose_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('collection', models.CharField(max_length=50)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+                ('changed_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['collection', 'object_id'], name='changelog_object_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_changelog, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,368 @@
-from django.db import models
-from datetime import date as _date
+from django.conf import settings
+from django.db import models, router, transaction
+from datetime import date as _date, datetime, time, timedelta, timezone as dt_timezone
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from .services import DrugInfoService
+from django.contrib.postgres.search import SearchVectorField
+from .services import DrugInfoService, NO_RESULTS_ERROR
+from .metrics import timed
+from .db_routers import pin_to_primary
+from . import search
 
 
-class Medication(models.Model):
+def day_range(start_date: _date, end_date: _date, tz=None):
+    """
+    Return the half-open [start, end) pair of aware datetimes covering the
+    calendar days start_date..end_date in tz (the current time zone by
+    default). Filtering on it matches taken_at__date__gte/lte but lets the
+    database use an index on taken_at. Bounds beyond what datetime can
+    represent in UTC (around date.min and date.max) are clamped to it.
+    """
+    tz = tz or timezone.get_current_timezone()
+    start = _clamped_midnight(start_date, tz, UTC_MIN)
+    if end_date == _date.max:
+        return start, UTC_MAX
+    return start, _clamped_midnight(end_date + timedelta(days=1), tz, UTC_MAX)
+
+
+UTC_MIN = datetime.min.replace(tzinfo=dt_timezone.utc)
+UTC_MAX = datetime.max.replace(tzinfo=dt_timezone.utc)
+
+
+def _clamped_midnight(day, tz, limit):
+    value = timezone.make_aware(datetime.combine(day, time.min), tz)
+    try:
+        value.astimezone(dt_timezone.utc)
+    except OverflowError:
+        return limit
+    return value
+
+
+class CollectionVersion(models.Model):
+    """
+    Version stamp of an API collection, bumped by every write so
+    conditional GETs can be answered without loading any rows.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+    @classmethod
+    def bump(cls, *names, using=None):
+        """
+        Increment the named stamps in the current transaction, so they
+        commit (or roll back) together with the write that bumped them.
+        """
+        using = using or router.db_for_write(cls)
+        now = timezone.now()
+        for name in names:
+            stamps = cls.objects.using(using).filter(pk=name)
+            if not stamps.update(version=models.F("version") + 1, updated_at=now):
+                cls.objects.using(using).get_or_create(name=name, defaults={"version": 1, "updated_at": now})
+
+    @classmethod
+    def stamps(cls, names):
+        """
+        Return {name: (version, updated_at)} for the named stamps in one query.
+        """
+        found = {name: (0, None) for name in names}
+        found.update(
+            (name, (version, updated_at))
+            for name, version, updated_at in cls.objects.filter(pk__in=names).values_list("name", "version", "updated_at")
+        )
+        return found
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Latest change to a row of a synced collection. The id orders changes
+    for the sync endpoint; deleted entries are tombstones. Each write
+    replaces the row's previous entries, so the log holds about one entry
+    per live row plus one per deleted row.
+    """
+    id = models.BigAutoField(primary_key=True)
+    collection = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    deleted = models.BooleanField(default=False)
+    changed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["collection", "object_id"], name="changelog_object_idx"),
+        ]
+
+    def __str__(self):
+        action = "deleted" if self.deleted else "changed"
+        return f"#{self.id}: {self.collection} {self.object_id} {action}"
+
+    @classmethod
+    def record(cls, collection, pks, deleted=False, created=False, using=None):
+        """
+        Record that the rows with the given pks were written (or deleted).
+        Newly created rows have no earlier entries to replace.
+        """
+        pks = [pk for pk in pks if pk is not None]
+        if not pks:
+            return
+        using = using or router.db_for_write(cls)
+        entries = cls.objects.using(using)
+        now = timezone.now()
+        if not created:
+            for chunk in _chunks(pks):
+                entries.filter(collection=collection, object_id__in=chunk).delete()
+        entries.bulk_create(
+            [cls(collection=collection, object_id=pk, deleted=deleted, changed_at=now) for pk in pks],
+            batch_size=500,
+        )
+
+
+class VersionedQuerySet(models.QuerySet):
+    """
+    QuerySet that bumps the model's collection version stamps on bulk writes
+    and, for synced models, records them in the change log, in the same
+    transaction as the write.
+    """
+
+    def _bump_versions(self):
+        CollectionVersion.bump(*self.model.version_collections, using=self.db)
+
+    def _sync_collection(self):
+        return getattr(self.model, "sync_collection", None)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        pin_to_primary()
+        with transaction.atomic(using=self.db, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if objs:
+                self._bump_versions()
+                if self._sync_collection():
+                    ChangeLogEntry.record(
+                        self._sync_collection(), [obj.pk for obj in objs], created=True, using=self.db,
+                    )
+        return objs
+
+    def update(self, **kwargs):
+        pin_to_primary()
+        with transaction.atomic(using=self.db, savepoint=False):
+            if not self._sync_collection():
+                rows = super().update(**kwargs)
+            else:
+                pks = list(self.values_list("pk", flat=True))
+                rows = super().update(**kwargs)
+                ChangeLogEntry.record(self._sync_collection(), pks, using=self.db)
+            if rows:
+                self._bump_versions()
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        pin_to_primary()
+        with transaction.atomic(using=self.db, savepoint=False):
+            if not self._sync_collection():
+                result = super().delete()
+            else:
+                pks = list(self.values_list("pk", flat=True))
+                result = super().delete()
+                ChangeLogEntry.record(self._sync_collection(), pks, deleted=True, using=self.db)
+            if result[0]:
+                self._bump_versions()
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class VersionedModel(models.Model):
+    """
+    Abstract model that bumps its collection version stamps on save and
+    delete, in the same transaction as the write, and pins the remaining
+    reads of the current context to the primary. version_collections
+    lists the stamps a write invalidates; writes to models with a
+    sync_collection are also recorded in the change log under that name.
+    """
+    version_collections = ()
+    sync_collection = None
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        created = self._state.adding and self.pk is None
+        pin_to_primary()
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+            if self.sync_collection is not None:
+                ChangeLogEntry.record(self.sync_collection, [self.pk], created=created, using=using)
+            CollectionVersion.bump(*self.version_collections, using=using)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        pk = self.pk
+        pin_to_primary()
+        with transaction.atomic(using=using, savepoint=False):
+            result = super().delete(*args, **kwargs)
+            if self.sync_collection is not None:
+                ChangeLogEntry.record(self.sync_collection, [pk], deleted=True, using=using)
+            CollectionVersion.bump(*self.version_collections, using=using)
+        return result
+
+
+class MedicationQuerySet(VersionedQuerySet):
+    def with_adherence_counts(self):
+        """
+        Annotate each medication with its total and taken dose counts
+        using a single grouped query.
+        """
+        return self.annotate(
+            total_doses=models.Count("doselog"),
+            taken_doses=models.Count("doselog", filter=models.Q(doselog__was_taken=True)),
+        )
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        _queue_enrichment([obj.pk for obj in objs if obj.pk is not None], self.db)
+        return objs
+
+    def update(self, **kwargs):
+        if "name" not in kwargs:
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list("pk", flat=True))
+            rows = super().update(**kwargs, **EMPTY_INFO)
+            search.index_medications(pks, self.db)
+        _queue_enrichment(pks, self.db)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list("pk", flat=True))
+            search.unindex_medications(pks, self.db)
+            _record_cascaded_deletes(pks, self.db)
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+EMPTY_INFO = {
+    "info_brand_name": "",
+    "info_manufacturer": "",
+    "info_substance": "",
+    "info_error": "",
+    "info_fetched_at": None,
+}
+
+
+def _record_cascaded_deletes(medication_ids, using):
+    """
+    Record tombstones for the dose logs and notes that deleting the given
+    medications will cascade to.
+    """
+    for model in (DoseLog, DoctorNote):
+        pks = model._base_manager.using(using).filter(medication_id__in=medication_ids).values_list("pk", flat=True)
+        ChangeLogEntry.record(model.sync_collection, list(pks), deleted=True, using=using)
+
+
+def _queue_enrichment(pks, using):
+    """
+    Fetch and store drug info for the given medications once the current
+    transaction commits.
+    """
+    if pks:
+        from .enrichment import schedule_enrichment
+
+        transaction.on_commit(lambda: schedule_enrichment(pks, using), using=using)
+
+
+class MedicationManager(models.Manager.from_queryset(MedicationQuerySet)):
+    """
+    Default manager hiding medications that are waiting to be purged.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class Medication(VersionedModel):
     """
     Represents a prescribed medication with dosage and daily schedule.
     """
     name = models.CharField(max_length=100)
     dosage_mg = models.PositiveIntegerField()
     prescribed_per_day = models.PositiveIntegerField(help_text="Expected number of doses per day")
+    deleted_at = models.DateTimeField(
+        null=True, blank=True, db_index=True, editable=False,
+        help_text="Set when the medication is hidden; its history is purged in the background.",
+    )
+    # Drug label data stored by the enrichment worker (see enrichment.py).
+    info_brand_name = models.CharField(max_length=255, blank=True, editable=False)
+    info_manufacturer = models.CharField(max_length=255, blank=True, editable=False)
+    info_substance = models.CharField(max_length=255, blank=True, editable=False)
+    info_error = models.CharField(max_length=255, blank=True, editable=False)
+    info_fetched_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
+
+    objects = MedicationManager()
+    all_objects = MedicationQuerySet.as_manager()
+
+    # Deleting a medication cascades to its logs and notes.
+    version_collections = ("medication", "doselog", "doctornote")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Notes are indexed with the medication name; see save().
+        instance._loaded_name = instance.__dict__.get("name")
+        return instance
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(Medication, instance=self)
+        update_fields = kwargs.get("update_fields")
+        adding = self._state.adding
+        renamed = (
+            not adding
+            and (update_fields is None or "name" in update_fields)
+            and getattr(self, "_loaded_name", None) != self.name
+        )
+        if not renamed:
+            super().save(*args, **kwargs)
+        else:
+            # Stored drug info describes the old name.
+            for field, value in EMPTY_INFO.items():
+                setattr(self, field, value)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, *EMPTY_INFO}
+            with transaction.atomic(using=using):
+                super().save(*args, **kwargs)
+                search.index_medications([self.pk], using)
+        self._loaded_name = self.name
+        if adding or renamed:
+            _queue_enrichment([self.pk], using)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(Medication, instance=self)
+        with transaction.atomic(using=using):
+            search.unindex_medications([self.pk], using)
+            _record_cascaded_deletes([self.pk], using)
+            return super().delete(*args, **kwargs)
+
+    def hide(self):
+        """
+        Hide the medication straight away and purge it, with its dose logs
+        and notes, in batches once the transaction commits.
+        """
+        from .purge import schedule_purge
+
+        self.deleted_at = timezone.now()
+        self.save(update_fields=["deleted_at"])
+        using = self._state.db
+        transaction.on_commit(lambda: schedule_purge(self.pk, using), using=using)
 
     def clean(self):
         if self.dosage_mg is not None and self.dosage_mg <= 0:
@@ -22,42 +373,310 @@ class Medication(models.Model):
     def __str__(self):
         return f"{self.name} ({self.dosage_mg}mg)"
 
+    @timed("medication.adherence_rate")
     def adherence_rate(self):
-        logs = self.doselog_set.all()
-        if not logs.exists():
+        total = getattr(self, "total_doses", None)
+        taken = getattr(self, "taken_doses", None)
+        if total is None or taken is None:
+            try:
+                counter = self.adherence_counter
+            except AdherenceCounter.DoesNotExist:
+                return 0.0
+            total, taken = counter.total, counter.taken
+        if not total:
             return 0.0
-        taken = logs.filter(was_taken=True).count()
-        return round((taken / logs.count()) * 100, 2)
+        return round((taken / total) * 100, 2)
 
     def expected_doses(self, days: int) -> int:
         if days < 0 or self.prescribed_per_day <= 0:
             raise ValueError("Days and schedule must be positive.")
         return days * self.prescribed_per_day
 
+    @timed("medication.adherence_rate_over_period")
     def adherence_rate_over_period(self, start_date: _date, end_date: _date) -> float:
         if start_date > end_date:
             raise ValueError("start_date must be before or equal to end_date")
 
-        logs = self.doselog_set.filter(
-            taken_at__date__gte=start_date,
-            taken_at__date__lte=end_date
-        )
         days = (end_date - start_date).days + 1
         expected = self.expected_doses(days)
 
         if expected == 0:
             return 0.0
 
-        taken = logs.filter(was_taken=True).count()
+        if timezone.get_current_timezone_name() == timezone.get_default_timezone_name():
+            taken = self.daily_rollups.filter(
+                day__gte=start_date,
+                day__lte=end_date
+            ).aggregate(taken=models.Sum("taken"))["taken"] or 0
+        else:
+            # Rollup days are bucketed in the default time zone.
+            start, end = day_range(start_date, end_date)
+            taken = self.doselog_set.filter(
+                taken_at__gte=start,
+                taken_at__lt=end,
+                was_taken=True
+            ).count()
         adherence = (taken / expected) * 100
         return round(adherence, 2)
 
+    def stored_info(self, fresh=False):
+        """
+        Drug info stored by the enrichment worker, an {"error": ...} dict
+        if the last lookup found no label, or None if it was never fetched.
+        With fresh, a "no results" answer older than
+        DRUG_INFO_NEGATIVE_CACHE_TTL counts as never fetched, as it does in
+        the drug info cache.
+        """
+        if self.info_fetched_at is None:
+            return None
+        if self.info_error:
+            negative_ttl = timedelta(seconds=settings.DRUG_INFO_NEGATIVE_CACHE_TTL)
+            if fresh and self.info_fetched_at < timezone.now() - negative_ttl:
+                return None
+            return {"error": self.info_error}
+        return {
+            "brand_name": self.info_brand_name,
+            "manufacturer": self.info_manufacturer,
+            "substance": self.info_substance,
+        }
+
+    def store_info(self, info, using=None):
+        """
+        Persist a DrugInfoService result. Transient errors are not stored,
+        and nothing is written if the medication was renamed meanwhile.
+        The medication collection version is bumped only when the served
+        drug_info changes, not when the same answer is fetched again.
+        Returns whether the info was stored.
+        """
+        error = info.get("error") if isinstance(info, dict) else "Invalid drug info"
+        if error and error != NO_RESULTS_ERROR:
+            return False
+        values = {**EMPTY_INFO, "info_fetched_at": timezone.now()}
+        if error:
+            values["info_error"] = error
+        else:
+            values.update(
+                info_brand_name=str(info.get("brand_name", ""))[:255],
+                info_manufacturer=str(info.get("manufacturer", ""))[:255],
+                info_substance=str(info.get("substance", ""))[:255],
+            )
+        using = using or router.db_for_write(Medication, instance=self)
+        # The base manager skips the version bump of the dose log and note
+        # collections, which do not include drug info.
+        pin_to_primary()
+        with transaction.atomic(using=using):
+            rows = Medication._base_manager.using(using).filter(pk=self.pk, name=self.name)
+            current = rows.select_for_update().values(*EMPTY_INFO).first()
+            if current is None:
+                return False
+            rows.update(**values)
+            if current["info_fetched_at"] is None or any(
+                current[field] != values[field] for field in EMPTY_INFO if field != "info_fetched_at"
+            ):
+                CollectionVersion.bump("medication", using=using)
+        for field, value in values.items():
+            setattr(self, field, value)
+        return True
+
     def fetch_external_info(self):
-        service = DrugInfoService()
-        return service.fetch_external_info(self.name)
+        """
+        Stored drug info when there is some, otherwise a live lookup whose
+        result is stored for next time.
+        """
+        stored = self.stored_info(fresh=True)
+        if stored is not None:
+            return stored
+        info = DrugInfoService().fetch_external_info(self.name)
+        self.store_info(info)
+        return info
 
 
-class DoseLog(models.Model):
+class AdherenceCounter(models.Model):
+    """
+    Denormalized taken/total dose counts for a medication, kept in step
+    with its dose logs so adherence can be read without scanning them.
+    """
+    medication = models.OneToOneField(
+        Medication, on_delete=models.CASCADE, primary_key=True, related_name="adherence_counter"
+    )
+    taken = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.medication_id}: {self.taken}/{self.total}"
+
+
+class DailyDoseRollup(models.Model):
+    """
+    Taken and missed dose counts for a medication on one calendar day
+    (in the default time zone), kept in step with its dose logs.
+    """
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name="daily_rollups")
+    day = models.DateField()
+    taken = models.IntegerField(default=0)
+    missed = models.IntegerField(default=0)
+    # Last time a dose log write touched this day; lets the missed-dose
+    # detector re-check days it has already processed.
+    changed_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["medication", "day"], name="unique_rollup_per_medication_day"),
+        ]
+
+    def __str__(self):
+        return f"{self.medication_id} on {self.day}: {self.taken} taken, {self.missed} missed"
+
+
+class MissedDoseWatermark(models.Model):
+    """
+    Last day the missed-dose detector has checked for a medication, and
+    when it did so.
+    """
+    medication = models.OneToOneField(
+        Medication, on_delete=models.CASCADE, primary_key=True, related_name="missed_dose_watermark"
+    )
+    day = models.DateField()
+    scanned_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.medication_id} checked through {self.day}"
+
+
+class MissedDoseAlert(VersionedModel):
+    """
+    A day on which a medication was taken fewer times than prescribed or
+    had doses logged as missed.
+    """
+    medication = models.ForeignKey(Medication, on_delete=models.CASCADE, related_name="missed_dose_alerts")
+    day = models.DateField()
+    expected = models.IntegerField()
+    taken = models.IntegerField()
+    missed = models.IntegerField()
+    detected_at = models.DateTimeField()
+
+    objects = VersionedQuerySet.as_manager()
+
+    version_collections = ("missed_dose_alert",)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["medication", "day"], name="unique_alert_per_medication_day"),
+        ]
+        indexes = [
+            models.Index(fields=["day", "id"], name="alert_day_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.medication_id} on {self.day}: {self.taken}/{self.expected} taken, {self.missed} missed"
+
+
+TRACKED_DOSE_FIELDS = {"medication", "medication_id", "taken_at", "was_taken"}
+
+
+def _dose_state(log):
+    return log.medication_id, log.taken_at, log.was_taken
+
+
+def rollup_day(taken_at):
+    """
+    Return the calendar day a dose belongs to in the default time zone.
+    """
+    if timezone.is_naive(taken_at):
+        return taken_at.date()
+    return timezone.localtime(taken_at, timezone.get_default_timezone()).date()
+
+
+def _dose_states(queryset):
+    return list(queryset.values_list("medication_id", "taken_at", "was_taken"))
+
+
+def _apply_dose_changes(using, added=(), removed=()):
+    """
+    Apply the effect of added and removed dose log states to the
+    adherence counters and daily rollups. States are
+    (medication_id, taken_at, was_taken).
+    """
+    totals = {}
+    days = {}
+    for sign, states in ((1, added), (-1, removed)):
+        for medication_id, taken_at, was_taken in states:
+            taken, total = totals.get(medication_id, (0, 0))
+            totals[medication_id] = (taken + sign * int(was_taken), total + sign)
+            key = (medication_id, rollup_day(taken_at))
+            taken, missed = days.get(key, (0, 0))
+            days[key] = (taken + sign * int(was_taken), missed + sign * int(not was_taken))
+
+    totals = {pk: delta for pk, delta in totals.items() if delta != (0, 0)}
+    if totals:
+        counters = AdherenceCounter.objects.using(using)
+        counters.bulk_create(
+            [AdherenceCounter(medication_id=pk) for pk in totals], ignore_conflicts=True
+        )
+        for pk, (taken, total) in totals.items():
+            counters.filter(pk=pk).update(
+                taken=models.F("taken") + taken, total=models.F("total") + total
+            )
+
+    days = {key: delta for key, delta in days.items() if delta != (0, 0)}
+    if days:
+        now = timezone.now()
+        rollups = DailyDoseRollup.objects.using(using)
+        rollups.bulk_create(
+            [DailyDoseRollup(medication_id=pk, day=day) for pk, day in days], ignore_conflicts=True
+        )
+        for (pk, day), (taken, missed) in days.items():
+            rollups.filter(medication_id=pk, day=day).update(
+                taken=models.F("taken") + taken, missed=models.F("missed") + missed, changed_at=now,
+            )
+
+
+def _chunks(items, size=500):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class DoseLogQuerySet(VersionedQuerySet):
+    """
+    QuerySet that keeps the adherence counters and daily rollups in sync
+    on bulk writes.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            _apply_dose_changes(self.db, added=[_dose_state(obj) for obj in objs])
+        return objs
+
+    def update(self, **kwargs):
+        if not TRACKED_DOSE_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            before = list(
+                self.select_for_update().values_list("pk", "medication_id", "taken_at", "was_taken")
+            )
+            rows = super().update(**kwargs)
+            base = self.model._base_manager.using(self.db)
+            added = []
+            for chunk in _chunks([row[0] for row in before]):
+                added.extend(_dose_states(base.filter(pk__in=chunk)))
+            _apply_dose_changes(self.db, added=added, removed=[row[1:] for row in before])
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            removed = _dose_states(self.select_for_update())
+            result = super().delete()
+            _apply_dose_changes(self.db, removed=removed)
+        return result
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class DoseLog(VersionedModel):
     """
     Records the administration of a medication dose.
     """
@@ -65,8 +684,40 @@ class DoseLog(models.Model):
     taken_at = models.DateTimeField()
     was_taken = models.BooleanField(default=True)
 
+    objects = DoseLogQuerySet.as_manager()
+
+    version_collections = ("doselog",)
+    sync_collection = "doselog"
+
     class Meta:
         ordering = ["-taken_at"]
+        indexes = [
+            models.Index(fields=["medication", "taken_at"], name="doselog_med_taken_at_idx"),
+            models.Index(fields=["taken_at", "id"], name="doselog_taken_at_id_idx"),
+        ]
+
+    def _stored_state(self, using):
+        if self._state.adding or self.pk is None:
+            return []
+        return _dose_states(DoseLog._base_manager.using(using).select_for_update().filter(pk=self.pk))
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(DoseLog, instance=self)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and not TRACKED_DOSE_FIELDS.intersection(update_fields):
+            return super().save(*args, **kwargs)
+        with transaction.atomic(using=using):
+            removed = self._stored_state(using)
+            super().save(*args, **kwargs)
+            _apply_dose_changes(using, added=[_dose_state(self)], removed=removed)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(DoseLog, instance=self)
+        with transaction.atomic(using=using):
+            removed = self._stored_state(using)
+            result = super().delete(*args, **kwargs)
+            _apply_dose_changes(using, removed=removed)
+        return result
 
     def clean(self):
         if self.taken_at and self.taken_at > timezone.now():
@@ -78,13 +729,90 @@ class DoseLog(models.Model):
         return f"{self.medication.name} at {when} - {status}"
 
 
-class DoctorNote(models.Model):
+class DoctorNoteQuerySet(VersionedQuerySet):
+    """
+    QuerySet that keeps the note search index in sync on bulk writes.
+    """
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            search.index_notes([obj.pk for obj in objs if obj.pk is not None], self.db)
+        return objs
+
+    def update(self, **kwargs):
+        if not {"note", "medication", "medication_id"}.intersection(kwargs):
+            return super().update(**kwargs)
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list("pk", flat=True))
+            rows = super().update(**kwargs)
+            search.index_notes(pks, self.db)
+        return rows
+
+    update.alters_data = True
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            search.unindex_notes(list(self.values_list("pk", flat=True)), self.db)
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class DoctorNote(VersionedModel):
     """
     Represents a note from a doctor associated with a medication.
     """
     medication = models.ForeignKey(Medication, on_delete=models.CASCADE)
     note = models.TextField()
     created_at = models.DateField()
+    # Maintained on PostgreSQL only; see search.py.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = DoctorNoteQuerySet.as_manager()
+
+    version_collections = ("doctornote",)
+    sync_collection = "doctornote"
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(DoctorNote, instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            search.index_notes([self.pk], using)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(DoctorNote, instance=self)
+        with transaction.atomic(using=using):
+            search.unindex_notes([self.pk], using)
+            return super().delete(*args, **kwargs)
+
+    def __str__(self):
+        return f"Note for {self.medication.name} ({self.created_at})"
+
+
+class DrugLabel(models.Model):
+    """
+    Drug label imported from an OpenFDA bulk download. DrugInfoService
+    looks names up here before calling the live API.
+    """
+    set_id = models.CharField(max_length=64)
+    brand_name = models.CharField(max_length=255)
+    brand_name_key = models.CharField(max_length=255, db_index=True, help_text="Normalized brand name")
+    manufacturer = models.CharField(max_length=255, blank=True)
+    substance = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["set_id", "brand_name_key"], name="unique_label_brand"),
+        ]
+
+    def as_info(self):
+        return {
+            "brand_name": self.brand_name,
+            "manufacturer": self.manufacturer or "Unknown",
+            "substance": self.substance or "Unknown",
+        }
 
     def __str__(self):
-        return f"Note for {self.medication.name} ({self.created_at})"
\ No newline at end of file
+        return f"{self.brand_name} ({self.manufacturer or 'Unknown'})"
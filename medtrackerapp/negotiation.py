@@ -0,0 +1,20 @@
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+
+
+class FallbackContentNegotiation(DefaultContentNegotiation):
+    """
+    Use the first renderer (of those matching ?format=, if given) when the
+    Accept header matches none of them, instead of answering 406. Meant
+    for views like the dose log export whose formats are all downloads.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            format_query_param = self.settings.URL_FORMAT_OVERRIDE
+            format = format_suffix or request.query_params.get(format_query_param)
+            if format:
+                renderers = self.filter_renderers(renderers, format)
+            return renderers[0], renderers[0].media_type
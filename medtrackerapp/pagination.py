@@ -0,0 +1,187 @@
+import base64
+import json
+from collections import OrderedDict
+from urllib import parse
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on a unique tuple of ordering fields.
+
+    Each page is fetched with a range condition on the ordering key of the
+    last (or first) row seen instead of an OFFSET, so deep pages cost the
+    same as the first one. Cursors are opaque, url-safe strings.
+    The view may override the ordering through get_keyset_ordering().
+    """
+
+    ordering = ("-id",)
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_ordering(self, view):
+        get_keyset_ordering = getattr(view, "get_keyset_ordering", None)
+        if get_keyset_ordering is not None:
+            return tuple(get_keyset_ordering())
+        return tuple(self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.model = queryset.model
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(view)
+        position, reverse = self.decode_cursor(request)
+
+        ordering = self._reversed(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        payload = {"p": [_dump(value) for value in position]}
+        if reverse:
+            payload["r"] = 1
+        token = base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(parse.unquote(token).encode()))
+            values = payload["p"]
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = tuple(
+                self._field(name).to_python(value) for name, value in zip(self._names(), values)
+            )
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(payload.get("r"))
+
+    def _names(self):
+        return [name.lstrip("-") for name in self.ordering]
+
+    def _field(self, name):
+        return self.model._meta.get_field(name)
+
+    def _position(self, row):
+        if isinstance(row, dict):
+            return tuple(row[name] for name in self._names())
+        return tuple(getattr(row, self._field(name).attname) for name in self._names())
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(name[1:] if name.startswith("-") else f"-{name}" for name in ordering)
+
+    @staticmethod
+    def _after(ordering, position):
+        """
+        Build the condition selecting rows strictly after position in
+        ordering, led by a plain range on the first key so that an index on
+        the ordering columns can be used.
+        """
+        names = [name.lstrip("-") for name in ordering]
+        ops = ["lt" if name.startswith("-") else "gt" for name in ordering]
+        condition = Q()
+        for i in range(len(names)):
+            term = Q(**{f"{names[i]}__{ops[i]}": position[i]})
+            for j in range(i):
+                term &= Q(**{names[j]: position[j]})
+            condition |= term
+        lead = Q(**{f"{names[0]}__{ops[0]}e": position[0]})
+        return lead & condition
+
+
+class SearchResultsPagination(PageNumberPagination):
+    """
+    Page-number pagination for ranked search results, where clients jump
+    between the first few pages rather than walking the whole set.
+    """
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+def _dump(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
@@ -0,0 +1,101 @@
+"""
+Background removal of hidden medications.
+
+Medication.hide() marks a medication as deleted; its dose logs, notes,
+rollups, missed-dose alerts and counter are then deleted here in bounded batches, each in its
+own short transaction, so neither the request nor any single lock scales
+with the amount of history. Interrupted purges are picked up again by the
+purge_medications management command.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from . import search
+from .models import (
+    AdherenceCounter, ChangeLogEntry, CollectionVersion, DailyDoseRollup, DoctorNote, DoseLog, Medication,
+    MissedDoseAlert,
+)
+
+
+logger = logging.getLogger(__name__)
+
+_purging = set()
+_purging_lock = threading.Lock()
+
+
+def _delete_in_batches(queryset, batch_size, before_delete=None):
+    """
+    Delete the rows of queryset batch_size primary keys at a time and
+    return how many were deleted. queryset should come from the base
+    manager: the counter and rollup bookkeeping of the default managers is
+    pointless for a medication that is going away.
+    """
+    model, using = queryset.model, queryset.db
+    deleted = 0
+    while True:
+        with transaction.atomic(using=using):
+            pks = list(queryset.values_list("pk", flat=True)[:batch_size])
+            if not pks:
+                return deleted
+            if before_delete is not None:
+                before_delete(pks, using)
+            model._base_manager.using(using).filter(pk__in=pks).delete()
+            if getattr(model, "sync_collection", None):
+                ChangeLogEntry.record(model.sync_collection, pks, deleted=True, using=using)
+            if getattr(model, "version_collections", ()):
+                CollectionVersion.bump(*model.version_collections, using=using)
+        deleted += len(pks)
+
+
+def purge_medication(pk, batch_size=None, using="default"):
+    """
+    Delete a hidden medication and everything that references it. Returns
+    the number of dose logs and notes deleted, or None if the medication
+    is unknown or not hidden.
+    """
+    batch_size = batch_size or settings.MEDICATION_PURGE_BATCH_SIZE
+    if not Medication.all_objects.using(using).filter(pk=pk, deleted_at__isnull=False).exists():
+        return None
+
+    logs = _delete_in_batches(DoseLog._base_manager.using(using).filter(medication_id=pk), batch_size)
+    notes = _delete_in_batches(
+        DoctorNote._base_manager.using(using).filter(medication_id=pk), batch_size, search.unindex_notes,
+    )
+    _delete_in_batches(DailyDoseRollup._base_manager.using(using).filter(medication_id=pk), batch_size)
+    _delete_in_batches(MissedDoseAlert._base_manager.using(using).filter(medication_id=pk), batch_size)
+    with transaction.atomic(using=using):
+        AdherenceCounter.objects.using(using).filter(medication_id=pk).delete()
+        # Nothing is left to cascade to.
+        Medication.all_objects.using(using).filter(pk=pk).delete()
+    return logs + notes
+
+
+def schedule_purge(pk, using="default"):
+    """
+    Purge a hidden medication on a background thread, or inline when
+    MEDICATION_PURGE_ASYNC is off. Returns the thread, if one was started.
+    """
+    if not settings.MEDICATION_PURGE_ASYNC:
+        purge_medication(pk, using=using)
+        return None
+    with _purging_lock:
+        if (using, pk) in _purging:
+            return None
+        _purging.add((using, pk))
+    thread = threading.Thread(target=_purge_in_background, args=(pk, using), daemon=True)
+    thread.start()
+    return thread
+
+
+def _purge_in_background(pk, using):
+    try:
+        purge_medication(pk, using=using)
+    except Exception:
+        logger.exception("Purging medication %s failed; purge_medications will retry it.", pk)
+    finally:
+        with _purging_lock:
+            _purging.discard((using, pk))
+        connections.close_all()
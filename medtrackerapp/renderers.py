@@ -0,0 +1,87 @@
+import csv
+import json
+
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils import encoders
+
+
+class _Echo:
+    """
+    File-like object whose write() hands the line straight back, so
+    csv.writer can be used to format rows one at a time.
+    """
+
+    def write(self, value):
+        return value
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON. Streaming views write rows directly; this
+    renderer only handles ordinary (e.g. error) responses.
+    """
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        return "".join(self.line(row) for row in rows).encode(self.charset)
+
+    @staticmethod
+    def line(row):
+        return json.dumps(row, separators=(",", ":"), ensure_ascii=False) + "\n"
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Comma-separated values. Streaming views write rows directly; this
+    renderer only handles ordinary (e.g. error) responses.
+    """
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        rows = data if isinstance(data, list) else [data]
+        header = list(rows[0].keys()) if rows else []
+        writer = self.writer()
+        lines = [writer.writerow(header)] + [writer.writerow([row.get(key) for key in header]) for row in rows]
+        return "".join(lines).encode(self.charset)
+
+    @staticmethod
+    def writer():
+        return csv.writer(_Echo())
+
+
+_drf_default = encoders.JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding through orjson. Indented output and anything
+    orjson cannot encode fall back to the stdlib renderer.
+
+    The output is not byte-for-byte that of JSONRenderer: some floats are
+    spelled differently (0.00001 rather than 1e-05, 1e16 rather than
+    1e+16; the values are equal), and NaN and infinities render as null
+    where JSONRenderer raises ValueError.
+    """
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_drf_default, option=self.options)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same strict javascript subset escaping as JSONRenderer.
+        return ret.replace("\u2028".encode(), b"\\u2028").replace("\u2029".encode(), b"\\u2029")
@@ -0,0 +1,151 @@
+"""
+Full-text search over doctor notes and their medication name.
+
+PostgreSQL stores a weighted tsvector in DoctorNote.search_vector (GIN
+indexed) and queries it with django.contrib.postgres; SQLite keeps an FTS5
+table whose rowid is the note id. Both are created by migration 0009 and
+kept in step by DoctorNote and Medication writes. Other databases fall
+back to an unranked icontains match.
+"""
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Value
+
+
+NOTE_TABLE = "medtrackerapp_doctornote"
+MEDICATION_TABLE = "medtrackerapp_medication"
+FTS_TABLE = "medtrackerapp_doctornote_fts"
+TS_CONFIG = "simple"
+
+# Note text weighs more than the medication name.
+FTS_WEIGHTS = "2.0, 1.0"
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def backend(using):
+    vendor = connections[using].vendor
+    return vendor if vendor in ("postgresql", "sqlite") else None
+
+
+def note_document(medication_model):
+    """
+    The weighted search vector of a note: its text (A) and its
+    medication's name (B).
+    """
+    name = Subquery(medication_model._base_manager.filter(pk=OuterRef("medication_id")).values("name")[:1])
+    return SearchVector("note", weight="A", config=TS_CONFIG) + SearchVector(name, weight="B", config=TS_CONFIG)
+
+
+def _execute(using, sql, params):
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _in(ids):
+    return ", ".join(["%s"] * len(ids))
+
+
+def _update_vectors(using, **lookup):
+    from .models import DoctorNote, Medication
+
+    DoctorNote._base_manager.using(using).filter(**lookup).update(search_vector=note_document(Medication))
+
+
+def index_notes(ids, using):
+    """
+    (Re)index the notes with the given ids.
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    if backend(using) == "postgresql":
+        _update_vectors(using, pk__in=ids)
+    elif backend(using) == "sqlite":
+        _execute(using, (
+            f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, note, medication) "
+            f"SELECT n.id, n.note, m.name FROM {NOTE_TABLE} n JOIN {MEDICATION_TABLE} m ON m.id = n.medication_id "
+            f"WHERE n.id IN ({_in(ids)})"
+        ), ids)
+
+
+def unindex_notes(ids, using):
+    """
+    Drop the notes with the given ids from the index, before they are deleted.
+    """
+    ids = list(ids)
+    if ids and backend(using) == "sqlite":
+        _execute(using, f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({_in(ids)})", ids)
+
+
+def index_medications(ids, using):
+    """
+    Reindex every note of the given medications, after a rename.
+    """
+    ids = list(ids)
+    if not ids:
+        return
+    if backend(using) == "postgresql":
+        _update_vectors(using, medication_id__in=ids)
+    elif backend(using) == "sqlite":
+        unindex_medications(ids, using)
+        _execute(using, (
+            f"INSERT INTO {FTS_TABLE} (rowid, note, medication) "
+            f"SELECT n.id, n.note, m.name FROM {NOTE_TABLE} n JOIN {MEDICATION_TABLE} m ON m.id = n.medication_id "
+            f"WHERE n.medication_id IN ({_in(ids)})"
+        ), ids)
+
+
+def unindex_medications(ids, using):
+    """
+    Drop every note of the given medications from the index, before the
+    medications (and, by cascade, their notes) are deleted.
+    """
+    ids = list(ids)
+    if ids and backend(using) == "sqlite":
+        _execute(using, (
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+            f"(SELECT id FROM {NOTE_TABLE} WHERE medication_id IN ({_in(ids)}))"
+        ), ids)
+
+
+def fts_query(text):
+    """
+    Turn free text into an FTS5 query matching every word, each quoted so
+    that operators in the input are taken literally.
+    """
+    return " ".join('"%s"' % token for token in TOKEN.findall(text))
+
+
+def search_notes(queryset, text):
+    """
+    Filter a DoctorNote queryset to notes matching every word of text in
+    the note or medication name, annotated with 'rank' and ordered best
+    match first.
+    """
+    using = queryset.db
+    if backend(using) == "postgresql":
+        query = SearchQuery(text, config=TS_CONFIG)
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F("search_vector"), query),
+        ).order_by("-rank", "-id")
+
+    if backend(using) == "sqlite":
+        query = fts_query(text)
+        if not query:
+            return queryset.none()
+        # The ORM cannot join the FTS5 table, so it is joined here once
+        # for both the match and the bm25() rank.
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = "{NOTE_TABLE}"."id"', f"{FTS_TABLE} MATCH %s"],
+            params=[query],
+            select={"rank": f"-bm25({FTS_TABLE}, {FTS_WEIGHTS})"},
+        ).order_by("-rank", "-id")
+
+    condition = Q()
+    for word in TOKEN.findall(text):
+        condition &= Q(note__icontains=word) | Q(medication__name__icontains=word)
+    return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField())).order_by("-id")
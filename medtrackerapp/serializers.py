@@ -1,17 +1,38 @@
+from django.db import models
 from rest_framework import serializers
-from .models import Medication, DoseLog, DoctorNote
+from .models import Medication, DoseLog, DoctorNote, MissedDoseAlert
 from django.utils import timezone
 
-class MedicationSerializer(serializers.ModelSerializer):
+
+class SparseFieldsSerializerMixin:
+    """
+    Drop every field not listed in the 'fields' context entry (a set of
+    field names, or None for all of them), so excluded method fields are
+    never computed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get("fields")
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class MedicationSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     adherence = serializers.SerializerMethodField()
+    drug_info = serializers.SerializerMethodField()
 
     class Meta:
         model = Medication
-        fields = ["id", "name", "dosage_mg", "prescribed_per_day", "adherence"]
+        fields = ["id", "name", "dosage_mg", "prescribed_per_day", "adherence", "drug_info"]
 
     def get_adherence(self, obj):
         return obj.adherence_rate()
 
+    def get_drug_info(self, obj):
+        return obj.stored_info()
+
     def validate_dosage_mg(self, value):
         if value <= 0:
             raise serializers.ValidationError("Dosage must be positive.")
@@ -23,18 +44,38 @@ class MedicationSerializer(serializers.ModelSerializer):
         return value
 
 
-class DoseLogSerializer(serializers.ModelSerializer):
+class DoseLogSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = DoseLog
         fields = ["id", "medication", "taken_at", "was_taken"]
 
     def validate_taken_at(self, value):
-        if value > timezone.now():
+        now = self.context.get("now") or timezone.now()
+        if value > now:
             raise serializers.ValidationError("Date cannot be in the future.")
         return value
 
 
-class DoctorNoteSerializer(serializers.ModelSerializer):
+class DoseLogBulkItemSerializer(DoseLogSerializer):
+    """
+    Validates one row of a bulk upload. Medication ids are checked against
+    the 'medication_ids' set in the context instead of one query per row.
+    """
+    medication = serializers.IntegerField(source="medication_id", min_value=1, max_value=models.BigIntegerField.MAX_BIGINT)
+
+    def validate_medication(self, value):
+        if value not in self.context["medication_ids"]:
+            raise serializers.ValidationError(f'Invalid pk "{value}" - object does not exist.')
+        return value
+
+
+class DoctorNoteSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = DoctorNote
-        fields = '__all__'
\ No newline at end of file
+        exclude = ["search_vector"]
+
+
+class MissedDoseAlertSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MissedDoseAlert
+        fields = ["id", "medication", "day", "expected", "taken", "missed", "detected_at"]
@@ -1,13 +1,199 @@
+import asyncio
+import hashlib
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
 import requests
+from django.conf import settings
+from django.core.cache import caches
+from requests.adapters import HTTPAdapter
+
+from .metrics import timed
+
+
+NO_RESULTS_ERROR = "No results found for this medication."
+CIRCUIT_OPEN_ERROR = "Circuit open: the drug information service is unavailable, try again later."
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# (cache alias, cache key) pairs with a background refresh running.
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+class CircuitBreaker:
+    """
+    Rolling-window circuit breaker.
+
+    The breaker opens once at least min_calls of the last window calls
+    were recorded and the share of failures reaches threshold. While open,
+    allow() returns False for reset_timeout seconds; after that a single
+    trial call is let through, and its outcome closes or re-opens the
+    breaker.
+    """
+
+    def __init__(self, window=20, min_calls=5, threshold=0.5, reset_timeout=30.0):
+        self.window = window
+        self.min_calls = min_calls
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self._results = deque(maxlen=window)
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self._trial_running = True
+            return True
+
+    def record(self, success: bool):
+        with self._lock:
+            if self._trial_running:
+                self._trial_running = False
+                self._results.clear()
+                self._opened_at = None if success else time.monotonic()
+                return
+            self._results.append(success)
+            failures = self._results.count(False)
+            if len(self._results) >= self.min_calls and failures / len(self._results) >= self.threshold:
+                self._opened_at = time.monotonic()
 
 
 class DrugInfoService:
     """
     Wrapper around the OpenFDA Drug Label API.
+
+    Requests share one pooled requests.Session, are retried with jittered
+    exponential backoff on 429/5xx responses and connection errors, and
+    go through a process-wide circuit breaker that fails fast with the
+    usual error shape while OpenFDA is unhealthy.
+
+    Names found in the imported DrugLabel index (see the
+    import_drug_labels command) are answered locally without any network
+    call when DRUG_INFO_LOCAL_INDEX is enabled. Other lookups are cached in
+    the Django cache named by DRUG_INFO_CACHE_ALIAS,
+    keyed on the normalized drug name. Successful lookups live for
+    DRUG_INFO_CACHE_TTL seconds and "no results" answers for
+    DRUG_INFO_NEGATIVE_CACHE_TTL; other errors are not cached. Once expired,
+    an entry is still served for DRUG_INFO_STALE_TTL seconds while it is
+    refreshed in the background.
     """
 
     BASE_URL = "https://api.fda.gov/drug/label.json"
+    CACHE_KEY_PREFIX = "druginfo:"
+
+    _stats = {"local_hits": 0, "hits": 0, "stale_hits": 0, "misses": 0}
+    _stats_lock = threading.Lock()
+
+    _session = None
+    _breaker = None
+    _client_lock = threading.Lock()
+
+    @classmethod
+    def get_session(cls):
+        with cls._client_lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.DRUG_INFO_POOL_SIZE,
+                    pool_maxsize=settings.DRUG_INFO_POOL_SIZE,
+                    max_retries=0,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                cls._session = session
+            return cls._session
+
+    @classmethod
+    def get_breaker(cls):
+        with cls._client_lock:
+            if cls._breaker is None:
+                cls._breaker = CircuitBreaker(
+                    window=settings.DRUG_INFO_BREAKER_WINDOW,
+                    min_calls=settings.DRUG_INFO_BREAKER_MIN_CALLS,
+                    threshold=settings.DRUG_INFO_BREAKER_THRESHOLD,
+                    reset_timeout=settings.DRUG_INFO_BREAKER_RESET_TIMEOUT,
+                )
+            return cls._breaker
+
+    @classmethod
+    def reset_client(cls):
+        with cls._client_lock:
+            if cls._session is not None:
+                cls._session.close()
+            cls._session = None
+            cls._breaker = None
 
+    @classmethod
+    def cache_stats(cls):
+        with cls._stats_lock:
+            return dict(cls._stats)
+
+    @classmethod
+    def reset_cache_stats(cls):
+        with cls._stats_lock:
+            for name in cls._stats:
+                cls._stats[name] = 0
+
+    @classmethod
+    def _count(cls, name):
+        with cls._stats_lock:
+            cls._stats[name] += 1
+
+    @staticmethod
+    def normalize_name(drug_name: str) -> str:
+        return " ".join(drug_name.split()).lower()
+
+    def cache_key(self, drug_name: str) -> str:
+        digest = hashlib.sha1(self.normalize_name(drug_name).encode()).hexdigest()
+        return f"{self.CACHE_KEY_PREFIX}{digest}"
+
+    @property
+    def cache(self):
+        return caches[settings.DRUG_INFO_CACHE_ALIAS]
+
+    def _local_query(self, drug_names):
+        """
+        Return the DrugLabel queryset matching drug_names (or None when the
+        local index is disabled) and a map from normalized key to names.
+        """
+        if not settings.DRUG_INFO_LOCAL_INDEX:
+            return None, {}
+        from .models import DrugLabel
+
+        keys = {}
+        for name in drug_names:
+            keys.setdefault(self.normalize_name(name), []).append(name)
+        return DrugLabel.objects.filter(brand_name_key__in=list(keys)).order_by("pk"), keys
+
+    def _local_lookup(self, drug_names):
+        """
+        Look names up in the local DrugLabel index, returning a dict of the
+        names that were found.
+        """
+        labels, keys = self._local_query(drug_names)
+        if labels is None:
+            return {}
+        found = {}
+        for label in labels:
+            for name in keys[label.brand_name_key]:
+                found.setdefault(name, label.as_info())
+        return found
+
+    @timed("drug_info.fetch_external_info")
     def fetch_external_info(self, drug_name: str):
         """
         Retrieve drug label information for a given medication name.
@@ -15,30 +201,408 @@ class DrugInfoService:
         if not drug_name:
             return {"error": "drug_name is required"}
 
-        params = {"search": f"openfda.brand_name:{drug_name.lower()}", "limit": 1}
+        entry = self.cache.get(self.cache_key(drug_name))
+        if entry is not None:
+            if entry["expires_at"] > time.time():
+                self._count("hits")
+            else:
+                self._count("stale_hits")
+                self._schedule_refresh(drug_name)
+            return entry["data"]
+
+        local = self._local_lookup([drug_name])
+        if local:
+            self._count("local_hits")
+            return local[drug_name]
 
+        self._count("misses")
+        return self._fetch_and_store(drug_name)
+
+    def _fetch_and_store(self, drug_name: str):
+        data = self._fetch(drug_name)
+        entry = self._cache_entry(data)
+        if entry is not None:
+            self.cache.set(self.cache_key(drug_name), *entry)
+        return data
+
+    @staticmethod
+    def _cache_entry(data):
+        """
+        Return the (value, timeout) to cache for a lookup result, or None
+        if it should not be cached.
+        """
+        if not data.get("error"):
+            ttl = settings.DRUG_INFO_CACHE_TTL
+        elif data["error"] == NO_RESULTS_ERROR:
+            ttl = settings.DRUG_INFO_NEGATIVE_CACHE_TTL
+        else:
+            return None
+        return {"data": data, "expires_at": time.time() + ttl}, ttl + settings.DRUG_INFO_STALE_TTL
+
+    def _schedule_refresh(self, drug_name: str):
+        key = (settings.DRUG_INFO_CACHE_ALIAS, self.cache_key(drug_name))
+        with _refreshing_lock:
+            if key in _refreshing:
+                return None
+            _refreshing.add(key)
+        thread = threading.Thread(target=self._refresh, args=(drug_name, key), daemon=True)
+        thread.start()
+        return thread
+
+    def _refresh(self, drug_name: str, key):
         try:
-            resp = requests.get(self.BASE_URL, params=params, timeout=10)
+            self._fetch_and_store(drug_name)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    def _fetch(self, drug_name: str):
+        data = self._search(self._brand_search(drug_name), limit=1)
+        return self._parse_result(data, drug_name)
 
+    def _brand_search(self, drug_name: str) -> str:
+        return f"openfda.brand_name:{self.normalize_name(drug_name)}"
+
+    def _parse_result(self, data, drug_name: str):
+        """
+        Turn the payload of a single-name search into the info dict,
+        passing error dicts through.
+        """
+        if data.get("error"):
+            return data
+        try:
+            return self._parse(data, drug_name)
+        except Exception as e:
+            return {"error": f"Connection Error: {str(e)}"}
+
+    def _search(self, search: str, limit: int):
+        """
+        Run one label search through the circuit breaker. Returns the
+        decoded payload, or an error dict in the usual shape.
+        """
+        breaker = self.get_breaker()
+        if not breaker.allow():
+            return {"error": CIRCUIT_OPEN_ERROR}
+
+        try:
+            resp = self._get({"search": search, "limit": limit})
+        except Exception as e:
+            breaker.record(False)
+            return {"error": f"Connection Error: {str(e)}"}
+        return self._decode(resp, breaker)
+
+    @staticmethod
+    def _decode(resp, breaker):
+        """
+        Record a response with the breaker and decode its payload, or
+        return an error dict in the usual shape.
+        """
+        breaker.record(resp.status_code < 500 and resp.status_code != 429)
+        try:
             if resp.status_code != 200:
                 return {"error": f"HTTP Error: {resp.status_code}"}
-
             data = resp.json()
-            results = data.get("results")
-            if not results:
-                return {"error": "No results found for this medication."}
+            if not isinstance(data, dict):
+                raise ValueError("Unexpected response payload.")
+            return data
+        except Exception as e:
+
+            return {"error": f"Connection Error: {str(e)}"}
+
+    def fetch_many(self, drug_names, limiter=None):
+        """
+        Retrieve drug label information for several medication names at
+        once, returning a dict keyed by the given names. Names are
+        answered from the cache, then from the local label index; the rest
+        are resolved with combined OR-searches where possible and otherwise
+        with individual lookups on a bounded thread pool. A limiter, if
+        given, is charged one unit per name that goes upstream.
+        """
+        results = {}
+        by_key = {}
+        for name in drug_names:
+            if not name:
+                results[name] = {"error": "drug_name is required"}
+            else:
+                by_key.setdefault(self.cache_key(name), []).append(name)
+
+        entries = self.cache.get_many(list(by_key))
+        uncached = {}
+        for key, names in by_key.items():
+            entry = entries.get(key)
+            if entry is None:
+                uncached[key] = names
+                continue
+            if entry["expires_at"] > time.time():
+                self._count("hits")
+            else:
+                self._count("stale_hits")
+                self._schedule_refresh(names[0])
+            results.update((name, entry["data"]) for name in names)
+
+        local = self._local_lookup([names[0] for names in uncached.values()])
+        pending = []
+        for key, names in uncached.items():
+            found = local.get(names[0])
+            if found is not None:
+                self._count("local_hits")
+                results.update((name, found) for name in names)
+            else:
+                self._count("misses")
+                pending.append(names[0])
+
+        if limiter is not None and pending:
+            limiter.acquire(len(pending))
+        resolved = self._combined_lookup(pending)
+        leftovers = [name for name in pending if name not in resolved]
+        if leftovers:
+            workers = min(settings.DRUG_INFO_BATCH_CONCURRENCY, len(leftovers))
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                resolved.update(zip(leftovers, pool.map(self._fetch_and_store, leftovers)))
+
+        for names in uncached.values():
+            if names[0] in resolved:
+                results.update((name, resolved[names[0]]) for name in names)
+        return results
+
+    def _combined_lookup(self, drug_names):
+        """
+        Resolve names with OR-searches of up to DRUG_INFO_BATCH_SEARCH_SIZE
+        brand names each. Names without an unambiguous match are left out
+        of the result so the caller can look them up one by one.
+        """
+        resolved = {}
+        size = settings.DRUG_INFO_BATCH_SEARCH_SIZE
+        for start in range(0, len(drug_names), size):
+            chunk = drug_names[start:start + size]
+            if len(chunk) < 2:
+                continue
+            terms = [self.normalize_name(name).replace('"', "") for name in chunk]
+            search = " ".join(f'openfda.brand_name:"{term}"' for term in terms)
+            data = self._search(search, limit=min(1000, len(chunk) * 4))
+
+            if data.get("error") == "HTTP Error: 404":
+                # OpenFDA answers 404 when nothing matches any of the terms.
+                found = {name: {"error": NO_RESULTS_ERROR} for name in chunk}
+            elif data.get("error"):
+                continue
+            else:
+                records = {}
+                for record in data.get("results") or []:
+                    if not isinstance(record, dict):
+                        continue
+                    openfda = record.get("openfda") if isinstance(record.get("openfda"), dict) else {}
+                    brands = list(openfda.get("brand_name") or []) + list(record.get("drug_brand_name") or [])
+                    for brand in brands:
+                        records.setdefault(self.normalize_name(str(brand)), record)
+                found = {
+                    name: self._parse({"results": [records[term]]}, name)
+                    for name, term in zip(chunk, terms) if term in records
+                }
+
+            for name, result in found.items():
+                entry = self._cache_entry(result)
+                if entry is not None:
+                    self.cache.set(self.cache_key(name), *entry)
+            resolved.update(found)
+        return resolved
+
+    def _get(self, params):
+        """
+        GET the label endpoint, retrying 429/5xx responses and connection
+        errors up to DRUG_INFO_MAX_RETRIES times, all within
+        DRUG_INFO_TOTAL_TIMEOUT seconds.
+        """
+        session = self.get_session()
+        deadline = time.monotonic() + settings.DRUG_INFO_TOTAL_TIMEOUT
+        attempt = 0
+        while True:
+            try:
+                resp = session.get(self.BASE_URL, params=params, timeout=self._timeouts(deadline))
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self._retry_delay(attempt, deadline)
+                if delay is None:
+                    raise
+            else:
+                if resp.status_code not in RETRY_STATUS_CODES:
+                    return resp
+                delay = self._retry_delay(attempt, deadline, resp.headers.get("Retry-After"))
+                if delay is None:
+                    return resp
+            time.sleep(delay)
+            attempt += 1
+
+    @staticmethod
+    def _timeouts(deadline):
+        """
+        The (connect, read) timeouts for the next attempt, shrunk to the
+        time left before deadline.
+        """
+        # Never hand the HTTP client a zero or negative timeout.
+        remaining = max(deadline - time.monotonic(), 0.01)
+        return min(settings.DRUG_INFO_CONNECT_TIMEOUT, remaining), min(settings.DRUG_INFO_READ_TIMEOUT, remaining)
+
+    def _retry_delay(self, attempt, deadline, retry_after=None):
+        """
+        Seconds to wait before retrying a failed attempt, or None when the
+        retries or the time budget are used up.
+        """
+        if attempt >= settings.DRUG_INFO_MAX_RETRIES:
+            return None
+        delay = self._backoff(attempt, retry_after)
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    @staticmethod
+    def _backoff(attempt, retry_after=None):
+        cap = settings.DRUG_INFO_RETRY_BACKOFF_MAX
+        if retry_after is not None:
+            try:
+                return min(max(float(retry_after), 0.0), cap)
+            except ValueError:
+                pass
+        delay = settings.DRUG_INFO_RETRY_BACKOFF * (2 ** attempt)
+        return min(cap, random.uniform(0, delay))
+
+    @staticmethod
+    def _parse(data, drug_name):
+        results = data.get("results")
+        if not results:
+            return {"error": NO_RESULTS_ERROR}
 
-            record = results[0]
+        record = results[0]
 
-            return {
-                "brand_name": record.get("drug_brand_name", [drug_name])[0] if isinstance(record.get("drug_brand_name"),
-                                                                                          list) else drug_name,
-                "manufacturer": record.get("manufacturer_name", ["Unknown"])[0] if isinstance(
-                    record.get("manufacturer_name"), list) else "Unknown",
-                "substance": record.get("substance_name", ["Unknown"])[0] if isinstance(record.get("substance_name"),
-                                                                                        list) else "Unknown",
-            }
+        return {
+            "brand_name": record.get("drug_brand_name", [drug_name])[0] if isinstance(record.get("drug_brand_name"),
+                                                                                      list) else drug_name,
+            "manufacturer": record.get("manufacturer_name", ["Unknown"])[0] if isinstance(
+                record.get("manufacturer_name"), list) else "Unknown",
+            "substance": record.get("substance_name", ["Unknown"])[0] if isinstance(record.get("substance_name"),
+                                                                                    list) else "Unknown",
+        }
 
+
+class AsyncDrugInfoService(DrugInfoService):
+    """
+    asyncio flavour of DrugInfoService built on httpx, for ASGI deployments.
+
+    It shares the cache, statistics and circuit breaker of the sync
+    service. Concurrent lookups for the same normalized drug name within
+    an event loop are coalesced into a single upstream call.
+    """
+
+    _clients = weakref.WeakKeyDictionary()
+    _inflight = weakref.WeakKeyDictionary()
+
+    @classmethod
+    async def get_client(cls):
+        """
+        The httpx client of the running event loop. It is closed when the
+        loop shuts down its async generators, as asyncio.run and asgiref
+        do before closing a loop.
+        """
+        loop = asyncio.get_running_loop()
+        entry = cls._clients.get(loop)
+        if entry is None:
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(settings.DRUG_INFO_READ_TIMEOUT, connect=settings.DRUG_INFO_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=settings.DRUG_INFO_POOL_SIZE),
+            )
+            closer = cls._close_on_shutdown(client)
+            entry = cls._clients[loop] = (client, closer)
+            # Starting the generator registers it with the loop.
+            await closer.__anext__()
+        return entry[0]
+
+    @staticmethod
+    async def _close_on_shutdown(client):
+        try:
+            yield
+        finally:
+            await client.aclose()
+
+    @timed("drug_info.async_fetch_external_info")
+    async def fetch_external_info(self, drug_name: str):
+        """
+        Retrieve drug label information for a given medication name.
+        """
+        if not drug_name:
+            return {"error": "drug_name is required"}
+
+        entry = await self.cache.aget(self.cache_key(drug_name))
+        if entry is not None:
+            if entry["expires_at"] > time.time():
+                self._count("hits")
+            else:
+                self._count("stale_hits")
+                self._coalesced(drug_name)
+            return entry["data"]
+
+        labels, _keys = self._local_query([drug_name])
+        if labels is not None:
+            label = await labels.afirst()
+            if label is not None:
+                self._count("local_hits")
+                return label.as_info()
+
+        self._count("misses")
+        return await asyncio.shield(self._coalesced(drug_name))
+
+    def _coalesced(self, drug_name: str):
+        """
+        Return the in-flight lookup task for drug_name, starting one if
+        none is running in this event loop.
+        """
+        inflight = self._inflight.setdefault(asyncio.get_running_loop(), {})
+        key = self.cache_key(drug_name)
+        task = inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_store(drug_name))
+            inflight[key] = task
+            task.add_done_callback(lambda _: inflight.pop(key, None))
+        return task
+
+    async def _fetch_and_store(self, drug_name: str):
+        data = await self._fetch(drug_name)
+        entry = self._cache_entry(data)
+        if entry is not None:
+            await self.cache.aset(self.cache_key(drug_name), *entry)
+        return data
+
+    async def _fetch(self, drug_name: str):
+        data = await self._search(self._brand_search(drug_name), limit=1)
+        return self._parse_result(data, drug_name)
+
+    async def _search(self, search: str, limit: int):
+        breaker = self.get_breaker()
+        if not breaker.allow():
+            return {"error": CIRCUIT_OPEN_ERROR}
+
+        try:
+            resp = await self._get({"search": search, "limit": limit})
         except Exception as e:
+            breaker.record(False)
+            return {"error": f"Connection Error: {str(e)}"}
+        return self._decode(resp, breaker)
 
-            return {"error": f"Connection Error: {str(e)}"}
\ No newline at end of file
+    async def _get(self, params):
+        client = await self.get_client()
+        deadline = time.monotonic() + settings.DRUG_INFO_TOTAL_TIMEOUT
+        attempt = 0
+        while True:
+            connect, read = self._timeouts(deadline)
+            try:
+                resp = await client.get(self.BASE_URL, params=params, timeout=httpx.Timeout(read, connect=connect))
+            except httpx.TransportError:
+                delay = self._retry_delay(attempt, deadline)
+                if delay is None:
+                    raise
+            else:
+                if resp.status_code not in RETRY_STATUS_CODES:
+                    return resp
+                delay = self._retry_delay(attempt, deadline, resp.headers.get("Retry-After"))
+                if delay is None:
+                    return resp
+            await asyncio.sleep(delay)
+            attempt += 1
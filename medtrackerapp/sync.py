@@ -0,0 +1,113 @@
+"""
+Delta sync for dose logs and doctor notes.
+
+Every write to a synced model leaves a ChangeLogEntry (a tombstone for
+deletes) whose id orders it in a single change sequence. A sync token
+holds the last id a client has seen and when it was issued; the next
+sync returns the entries after it. Ids are assigned before commit, so a
+slow transaction can commit an id below one already handed out: entries
+changed within SYNC_OVERLAP_SECONDS of the token are sent again to cover
+them, paged like new entries: while the overlap fills whole pages the
+token keeps its position and issue time and records the last entry
+resent. Clients apply changes idempotently, so repeats are harmless.
+Tokens are signed, so clients cannot move the issue time (and with it the
+overlap window) back. Rows of hidden medications are reported as deleted.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .models import ChangeLogEntry, DoctorNote, DoseLog, _chunks
+from .serializers import DoctorNoteSerializer, DoseLogSerializer
+
+
+# Response key: (change log collection, model, serializer).
+COLLECTIONS = {
+    "logs": ("doselog", DoseLog, DoseLogSerializer),
+    "notes": ("doctornote", DoctorNote, DoctorNoteSerializer),
+}
+
+TOKEN_SALT = "medtrackerapp.sync"
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def encode_token(position, issued_at, resent=0):
+    payload = {"s": position, "t": issued_at.timestamp()}
+    if resent:
+        payload["r"] = resent
+    return signing.dumps(payload, salt=TOKEN_SALT)
+
+
+def decode_token(token):
+    """
+    Return the (position, issued_at, resent) triple of a sync token, resent
+    being the last overlap entry already sent again (0 for none).
+    """
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+        position = int(payload["s"])
+        issued_at = datetime.fromtimestamp(float(payload["t"]), tz=dt_timezone.utc)
+        resent = int(payload.get("r", 0))
+    except (signing.BadSignature, TypeError, ValueError, KeyError, AttributeError, OverflowError):
+        raise InvalidToken(token)
+    if position < 0 or not 0 <= resent <= position:
+        raise InvalidToken(token)
+    return position, issued_at, resent
+
+
+def changes_since(token=None, limit=None, context=None):
+    """
+    Rows created, changed or deleted since token (everything when None),
+    at most limit change log entries at a time. Returns a dict with the
+    next token, whether more changes are waiting, and per collection the
+    serialized changed rows and the deleted ids.
+    """
+    limit = limit or settings.SYNC_PAGE_SIZE
+    position, issued_at, resent = decode_token(token) if token else (0, None, 0)
+    # Taken before reading so the next token overlaps this read.
+    now = timezone.now()
+
+    entries = []
+    if issued_at is not None:
+        overlap = timedelta(seconds=settings.SYNC_OVERLAP_SECONDS)
+        entries = list(ChangeLogEntry.objects.filter(
+            id__gt=resent, id__lte=position, changed_at__gte=issued_at - overlap,
+        ).order_by("id")[:limit + 1])
+    if len(entries) > limit:
+        # The overlap alone fills the page: resume it from the next token.
+        entries = entries[:limit]
+        next_token, has_more = encode_token(position, issued_at, entries[-1].id), True
+    else:
+        budget = limit - len(entries)
+        new = list(ChangeLogEntry.objects.filter(id__gt=position).order_by("id")[:budget + 1])
+        has_more = len(new) > budget
+        new = new[:budget]
+        next_token = encode_token(new[-1].id if new else position, now)
+        entries += new
+
+    latest = {}
+    for entry in entries:
+        latest[entry.collection, entry.object_id] = entry.deleted
+
+    result = {"token": next_token, "has_more": has_more}
+    for key, (collection, model, serializer_class) in COLLECTIONS.items():
+        changed = [pk for (name, pk), deleted in latest.items() if name == collection and not deleted]
+        deleted = [pk for (name, pk), deleted in latest.items() if name == collection and deleted]
+        rows = []
+        for chunk in _chunks(sorted(changed)):
+            rows.extend(
+                model._base_manager.filter(pk__in=chunk, medication__deleted_at__isnull=True).order_by("pk")
+            )
+        # Rows deleted after their entry was read, or hidden with their
+        # medication, count as deleted.
+        deleted = sorted(set(deleted) | (set(changed) - {row.pk for row in rows}))
+        result[key] = {
+            "changed": serializer_class(rows, many=True, context=context or {}).data,
+            "deleted": deleted,
+        }
+    return result
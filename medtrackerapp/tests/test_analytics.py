@@ -0,0 +1,102 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.urls import reverse
+from django.utils import timezone
+from datetime import date, datetime, timedelta
+from medtrackerapp.models import Medication, DoseLog
+from medtrackerapp.analytics import adherence_series, bucket_count, bucket_ranges
+import zoneinfo
+
+
+UTC = zoneinfo.ZoneInfo("UTC")
+WARSAW = zoneinfo.ZoneInfo("Europe/Warsaw")
+
+
+class AdherenceSeriesTests(APITestCase):
+
+    def setUp(self):
+        self.daily = Medication.objects.create(name="Daily", dosage_mg=10, prescribed_per_day=1)
+        self.twice = Medication.objects.create(name="Twice", dosage_mg=10, prescribed_per_day=2)
+        self.url = reverse("analytics-adherence")
+
+    def log(self, medication, when, was_taken=True):
+        DoseLog.objects.create(medication=medication, taken_at=when, was_taken=was_taken)
+
+    def test_bucket_ranges_are_clipped(self):
+        ranges = list(bucket_ranges(date(2025, 1, 30), date(2025, 3, 2), "month"))
+        self.assertEqual(ranges, [
+            (date(2025, 1, 1), date(2025, 1, 30), date(2025, 1, 31)),
+            (date(2025, 2, 1), date(2025, 2, 1), date(2025, 2, 28)),
+            (date(2025, 3, 1), date(2025, 3, 1), date(2025, 3, 2)),
+        ])
+        weeks = list(bucket_ranges(date(2025, 1, 1), date(2025, 1, 14), "week"))
+        self.assertEqual([start for start, _, _ in weeks], [date(2024, 12, 30), date(2025, 1, 6), date(2025, 1, 13)])
+
+    def test_bucket_count_matches_bucket_ranges(self):
+        for start, end in ((date(2025, 1, 30), date(2025, 3, 2)), (date(2024, 12, 31), date(2025, 1, 1))):
+            for bucket in ("day", "week", "month"):
+                self.assertEqual(bucket_count(start, end, bucket), len(list(bucket_ranges(start, end, bucket))))
+        self.assertEqual(bucket_count(date.min, date.max, "day"), date.max.toordinal())
+
+    def test_buckets_reach_the_last_date(self):
+        for bucket in ("day", "week", "month"):
+            ranges = list(bucket_ranges(date(9999, 12, 1), date.max, bucket))
+            self.assertEqual(len(ranges), bucket_count(date(9999, 12, 1), date.max, bucket))
+            self.assertEqual(ranges[-1][2], date.max)
+
+        response = self.client.get(f"{self.url}?start=9999-01-01&end=9999-12-31&bucket=month")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"][0]["buckets"]), 12)
+
+    def test_daily_series_matches_period_adherence(self):
+        for day in range(1, 6):
+            self.log(self.twice, datetime(2025, 3, day, 9, tzinfo=UTC))
+            self.log(self.twice, datetime(2025, 3, day, 21, tzinfo=UTC), was_taken=day % 2 == 0)
+            self.log(self.daily, datetime(2025, 3, day, 9, tzinfo=UTC), was_taken=day != 3)
+
+        with self.assertNumQueries(2):
+            results = adherence_series(Medication.objects.all(), date(2025, 3, 1), date(2025, 3, 5), "day", UTC)
+        for entry in results:
+            medication = Medication.objects.get(pk=entry["medication_id"])
+            for point in entry["buckets"]:
+                self.assertEqual(
+                    point["adherence"],
+                    medication.adherence_rate_over_period(point["start"], point["end"]),
+                )
+
+    def test_week_buckets_respect_time_zone(self):
+        # 23:30 UTC on Sunday is already Monday in Warsaw.
+        self.log(self.daily, datetime(2025, 1, 12, 23, 30, tzinfo=UTC))
+        self.log(self.daily, datetime(2025, 1, 8, 12, tzinfo=UTC))
+
+        utc = adherence_series(Medication.objects.filter(pk=self.daily.pk), date(2025, 1, 6), date(2025, 1, 19), "week", UTC)
+        warsaw = adherence_series(Medication.objects.filter(pk=self.daily.pk), date(2025, 1, 6), date(2025, 1, 19), "week", WARSAW)
+        self.assertEqual([point["taken"] for point in utc[0]["buckets"]], [2, 0])
+        self.assertEqual([point["taken"] for point in warsaw[0]["buckets"]], [1, 1])
+        self.assertEqual(warsaw[0]["buckets"][1]["expected"], 7)
+        self.assertEqual(warsaw[0]["buckets"][1]["adherence"], 14.29)
+
+    def test_endpoint_monthly_report(self):
+        self.log(self.twice, timezone.make_aware(datetime(2025, 2, 10, 8)))
+        response = self.client.get(f"{self.url}?start=2025-02-01&end=2025-03-15&bucket=month&tz=Europe/Warsaw&medication={self.twice.pk}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["tz"], "Europe/Warsaw")
+        self.assertEqual(len(response.data["results"]), 1)
+        february, march = response.data["results"][0]["buckets"]
+        self.assertEqual((february["taken"], february["expected"], february["adherence"]), (1, 56, 1.79))
+        self.assertEqual((march["start"], march["end"], march["expected"]), (date(2025, 3, 1), date(2025, 3, 15), 30))
+
+    def test_endpoint_validates_parameters(self):
+        for query in (
+            "start=2025-01-01",
+            "start=2025-02-01&end=2025-01-01",
+            "start=2025-01-01&end=2025-01-31&bucket=year",
+            "start=2025-01-01&end=2025-01-31&tz=Mars/Olympus",
+            "start=2000-01-01&end=2025-01-31",
+            "start=0001-01-01&end=9999-12-31",
+            "start=2025-01-01&end=2025-01-31&medication=x",
+            "start=2025-01-01&end=2025-01-31&medication=1,99999999999999999999",
+        ):
+            response = self.client.get(f"{self.url}?{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+            self.assertIn("error", response.data)
@@ -0,0 +1,89 @@
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from medtrackerapp.db_routers import PIN_COOKIE, ReplicaRouter, _read_replica, use_replicas
+from medtrackerapp.models import Medication
+
+
+@override_settings(READ_REPLICAS=["replica"], READ_REPLICA_STICKY_SECONDS=10)
+class ReplicaRoutingTests(APITestCase):
+    """
+    The 'replica' SQLite database stands in for a replica; nothing
+    replicates to it, which makes the routing visible.
+    """
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.primary = Medication.objects.create(name="OnPrimary", dosage_mg=10, prescribed_per_day=1)
+        Medication.objects.using("replica").create(name="OnReplica", dosage_mg=10, prescribed_per_day=1)
+
+    def names(self):
+        response = self.client.get(reverse("medication-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item["name"] for item in response.data]
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.names(), ["OnReplica"])
+        response = self.client.get(reverse("analytics-adherence"), {"start": "2025-01-01", "end": "2025-01-02"})
+        self.assertEqual([row["name"] for row in response.data["results"]], ["OnReplica"])
+
+    def test_writes_go_to_primary_and_pin_reads(self):
+        response = self.client.post(
+            reverse("medication-list"), {"name": "Created", "dosage_mg": 5, "prescribed_per_day": 1}, format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.cookies[PIN_COOKIE]["max-age"], 10)
+        self.assertTrue(Medication.objects.using("default").filter(name="Created").exists())
+        self.assertFalse(Medication.objects.using("replica").filter(name="Created").exists())
+
+        # Read-your-writes while the cookie lives...
+        self.assertEqual(self.names(), ["OnPrimary", "Created"])
+        # ...and back to the replica once it has expired.
+        del self.client.cookies[PIN_COOKIE]
+        self.assertEqual(self.names(), ["OnReplica"])
+
+    async def test_async_requests_route_like_sync_ones(self):
+        response = await self.async_client.get(reverse("medication-list"))
+        self.assertEqual([item["name"] for item in json.loads(response.content)], ["OnReplica"])
+
+    def test_failed_writes_do_not_pin(self):
+        response = self.client.post(reverse("medication-list"), {"name": "Bad", "dosage_mg": 0}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+class ReplicaRouterTests(TestCase):
+
+    def allow_replicas(self):
+        token = use_replicas()
+        self.addCleanup(_read_replica.reset, token)
+
+    def test_reads_outside_requests_use_primary(self):
+        router = ReplicaRouter()
+        with self.settings(READ_REPLICAS=["replica"]):
+            self.assertEqual(router.db_for_read(Medication), "default")
+            self.allow_replicas()
+            self.assertEqual(router.db_for_read(Medication), "replica")
+            # Asking where a write would go does not pin...
+            self.assertEqual(router.db_for_write(Medication), "default")
+            self.assertEqual(router.db_for_read(Medication), "replica")
+            # ...writing does.
+            Medication.objects.create(name="Written", dosage_mg=10, prescribed_per_day=1)
+            self.assertEqual(router.db_for_read(Medication), "default")
+
+    def test_one_replica_per_context(self):
+        router = ReplicaRouter()
+        with self.settings(READ_REPLICAS=["replica1", "replica2", "replica3"]):
+            self.allow_replicas()
+            chosen = {router.db_for_read(Medication) for _ in range(50)}
+        self.assertEqual(len(chosen), 1)
+
+    def test_no_replicas_configured(self):
+        router = ReplicaRouter()
+        with self.settings(READ_REPLICAS=[]):
+            self.allow_replicas()
+            self.assertEqual(router.db_for_read(Medication), "default")
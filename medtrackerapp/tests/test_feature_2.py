@@ -3,6 +3,9 @@ from rest_framework import status
 from django.urls import reverse
 from medtrackerapp.models import Medication, DoctorNote
 from django.utils import timezone
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest import skipUnless
 
 
 class DoctorNoteTests(APITestCase):
@@ -51,4 +54,95 @@ class DoctorNoteTests(APITestCase):
         data = {"note": "Updated"}
         response = self.client.put(detail_url, data)
 
-        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class DoctorNoteSearchTests(APITestCase):
+
+    def setUp(self):
+        self.aspirin = Medication.objects.create(name="Aspirin", dosage_mg=100, prescribed_per_day=1)
+        self.ibuprofen = Medication.objects.create(name="Ibuprofen", dosage_mg=200, prescribed_per_day=2)
+        today = timezone.now().date()
+        self.food = DoctorNote.objects.create(medication=self.aspirin, note="Take with food", created_at=today)
+        self.food_twice = DoctorNote.objects.create(
+            medication=self.ibuprofen, note="Food first. Always food before the dose.", created_at=today
+        )
+        self.dizzy = DoctorNote.objects.create(medication=self.ibuprofen, note="Report dizziness", created_at=today)
+        self.list_url = reverse("doctornote-list")
+
+    def search(self, query, **params):
+        response = self.client.get(self.list_url, {"q": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def ids(self, query):
+        return [item["id"] for item in self.search(query).data["results"]]
+
+    def test_search_is_ranked_and_paginated(self):
+        response = self.search("food")
+        self.assertEqual(response.data["count"], 2)
+        self.assertIsNone(response.data["next"])
+        self.assertEqual([item["id"] for item in response.data["results"]], [self.food_twice.pk, self.food.pk])
+
+        response = self.search("food", page_size=1)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertIsNotNone(response.data["next"])
+
+        with self.settings(FAST_READ_PATH=True):
+            fast = self.search("food").content
+        self.assertEqual(fast, self.search("food").content)
+
+    def test_search_matches_medication_name_and_all_words(self):
+        self.assertEqual(self.ids("aspirin"), [self.food.pk])
+        self.assertEqual(self.ids("ibuprofen dizziness"), [self.dizzy.pk])
+        self.assertEqual(self.ids("aspirin dizziness"), [])
+        self.assertEqual(self.ids('food" OR "dizziness'), [])
+
+    def test_index_follows_creates_deletes_and_renames(self):
+        self.client.post(self.list_url, {"medication": self.aspirin.pk, "note": "Mild headache", "created_at": "2025-01-01"})
+        self.assertEqual(len(self.ids("headache")), 1)
+
+        self.food.delete()
+        DoctorNote.objects.filter(pk=self.dizzy.pk).delete()
+        self.assertEqual(self.ids("food"), [self.food_twice.pk])
+        self.assertEqual(self.ids("dizziness"), [])
+
+        self.ibuprofen.name = "Nurofen"
+        self.ibuprofen.save()
+        self.assertEqual(self.ids("nurofen"), [self.food_twice.pk])
+        Medication.objects.filter(pk=self.aspirin.pk).update(name="Polopiryna")
+        self.assertEqual(len(self.ids("polopiryna")), 1)
+        self.assertEqual(self.ids("ibuprofen"), [])
+
+        DoctorNote.objects.bulk_create([
+            DoctorNote(medication=self.ibuprofen, note="Bulk food note", created_at=timezone.now().date())
+        ])
+        self.assertEqual(len(self.ids("food")), 2)
+
+        self.ibuprofen.delete()
+        self.assertEqual(self.ids("food"), [])
+
+    def searches(self, marker):
+        with CaptureQueriesContext(connection) as captured:
+            self.search("food")
+        searches = [query["sql"] for query in captured.captured_queries if marker in query["sql"]]
+        self.assertEqual(len(searches), 2)  # count and page
+        for sql in searches:
+            self.assertEqual(sql.count(marker), 1)
+        return searches
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite FTS5 index")
+    def test_search_joins_the_index_once(self):
+        for sql in self.searches("medtrackerapp_doctornote_fts MATCH"):
+            self.assertNotIn("(SELECT", sql)
+
+    @skipUnless(connection.vendor == "postgresql", "PostgreSQL tsvector index")
+    def test_search_matches_the_stored_vector(self):
+        for sql in self.searches("@@"):
+            self.assertIn('"search_vector" @@', sql)
+            # The stored vector is used, not rebuilt from the note text.
+            self.assertNotIn("to_tsvector", sql)
+
+    def test_plain_list_stays_unpaginated(self):
+        response = self.client.get(self.list_url, {"q": " "})
+        self.assertEqual(len(response.data), 3)
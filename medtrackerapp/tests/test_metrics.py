@@ -0,0 +1,90 @@
+import asyncio
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework.test import APITestCase
+
+from medtrackerapp import metrics
+from medtrackerapp.models import Medication, DoseLog
+from medtrackerapp.services import DrugInfoService
+
+
+class HistogramTests(TestCase):
+
+    def test_render_is_cumulative(self):
+        histogram = metrics.Histogram("test_seconds", "Test.", ("view",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, "a")
+        lines = histogram.render()
+        self.assertIn('test_seconds_bucket{view="a",le="0.1"} 2', lines)
+        self.assertIn('test_seconds_bucket{view="a",le="1.0"} 3', lines)
+        self.assertIn('test_seconds_bucket{view="a",le="+Inf"} 4', lines)
+        self.assertIn('test_seconds_count{view="a"} 4', lines)
+        self.assertIn('test_seconds_sum{view="a"} 3.65', lines)
+
+    def test_label_values_are_escaped(self):
+        counter = metrics.Counter("test_total", "Test.", ("name",))
+        counter.inc('say "hi"\n')
+        self.assertIn('test_total{name="say \\"hi\\"\\n"} 1', counter.render())
+
+    def test_timed_records_calls_and_errors(self):
+        metrics.reset()
+
+        @metrics.timed("test.fail")
+        def fail():
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            fail()
+        self.assertEqual(metrics.FUNCTION_LATENCY._values[("test.fail",)][1], 1)
+        self.assertEqual(metrics.FUNCTION_ERRORS._values[("test.fail",)], 1)
+
+    def test_timed_awaits_coroutines(self):
+        metrics.reset()
+
+        @metrics.timed("test.async")
+        async def fetch():
+            await asyncio.sleep(0.01)
+            return 1
+
+        self.assertEqual(asyncio.run(fetch()), 1)
+        _, calls, total = metrics.FUNCTION_LATENCY._values[("test.async",)]
+        self.assertEqual(calls, 1)
+        self.assertGreaterEqual(total, 0.01)
+
+
+class MetricsEndpointTests(APITestCase):
+
+    def setUp(self):
+        metrics.reset()
+        med = Medication.objects.create(name="Aspirin", dosage_mg=100, prescribed_per_day=2)
+        DoseLog.objects.create(medication=med, taken_at=timezone.now() - timedelta(hours=1))
+
+    def test_requests_are_recorded_by_view(self):
+        self.client.get(reverse("medication-list"))
+        self.client.get(reverse("medication-list"))
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        body = response.content.decode()
+        self.assertIn(
+            'medtracker_request_duration_seconds_count{view="medication-list",method="GET",status="200"} 2', body
+        )
+        # Version stamps and the medications.
+        self.assertIn('medtracker_request_queries_sum{view="medication-list",method="GET"} 4', body)
+        self.assertIn('medtracker_function_duration_seconds_count{function="medication.adherence_rate"} 2', body)
+        for result in DrugInfoService.cache_stats():
+            self.assertIn(f'medtracker_drug_info_cache_total{{result="{result}"}}', body)
+
+    async def test_async_requests_are_recorded(self):
+        response = await self.async_client.get(reverse("medication-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(("medication-list", "GET", "200"), metrics.REQUEST_LATENCY._values)
+        self.assertEqual(metrics.REQUEST_QUERIES._values[("medication-list", "GET")][2], 2)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_middleware_can_be_disabled(self):
+        self.client.get(reverse("medication-list"))
+        self.assertEqual(metrics.REQUEST_LATENCY._values, {})
@@ -0,0 +1,110 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from datetime import date, datetime, timedelta
+from io import StringIO
+from medtrackerapp.models import Medication, DoseLog, MissedDoseAlert, MissedDoseWatermark
+from medtrackerapp.missed_doses import detect
+from medtrackerapp.purge import purge_medication
+
+
+@override_settings(MISSED_DOSE_REOPEN_OVERLAP=0)
+class MissedDoseDetectorTests(APITestCase):
+
+    def setUp(self):
+        self.med = Medication.objects.create(name="Twice", dosage_mg=10, prescribed_per_day=2)
+        self.other = Medication.objects.create(name="Never logged", dosage_mg=10, prescribed_per_day=1)
+        # Jan 1: complete, Jan 2: one dose short, Jan 3: a missed dose,
+        # Jan 4: nothing logged, Jan 5: complete.
+        for day, taken, missed in ((1, 2, 0), (2, 1, 0), (3, 2, 1), (5, 2, 0)):
+            for i in range(taken + missed):
+                self.log(day, was_taken=i < taken, hour=8 + i)
+
+    def log(self, day, was_taken=True, hour=8):
+        DoseLog.objects.create(
+            medication=self.med, taken_at=timezone.make_aware(datetime(2025, 1, day, hour)), was_taken=was_taken,
+        )
+
+    def alerts(self):
+        return {
+            alert.day.day: (alert.taken, alert.missed)
+            for alert in MissedDoseAlert.objects.filter(medication=self.med)
+        }
+
+    def test_first_run_starts_at_the_first_logged_day(self):
+        self.assertEqual(detect(date(2025, 1, 5)), (2, 5, 3, 0))
+        self.assertEqual(self.alerts(), {2: (1, 0), 3: (2, 1), 4: (0, 0)})
+        self.assertEqual(MissedDoseWatermark.objects.get(medication=self.med).day, date(2025, 1, 5))
+        self.assertFalse(MissedDoseAlert.objects.filter(medication=self.other).exists())
+
+    def test_later_runs_only_check_new_and_reopened_days(self):
+        detect(date(2025, 1, 5))
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(detect(date(2025, 1, 5)), (2, 0, 0, 0))
+        self.assertFalse(any("medtrackerapp_doselog" in query["sql"] for query in captured.captured_queries))
+
+        # Backdated logs reopen just the days they touch.
+        self.log(2, hour=20)
+        self.log(4)
+        self.assertEqual(detect(date(2025, 1, 5)), (2, 2, 1, 1))
+        self.assertEqual(self.alerts(), {3: (2, 1), 4: (1, 0)})
+
+        self.assertEqual(detect(date(2025, 1, 7)), (2, 2, 2, 0))
+        self.assertEqual(set(self.alerts()), {3, 4, 6, 7})
+
+    def test_deleted_logs_reopen_their_day(self):
+        detect(date(2025, 1, 5))
+        DoseLog.objects.filter(taken_at__date=date(2025, 1, 1)).first().delete()
+        self.assertEqual(detect(date(2025, 1, 5)), (2, 1, 1, 0))
+        self.assertEqual(self.alerts()[1], (1, 0))
+
+    def test_command(self):
+        out = StringIO()
+        call_command("detect_missed_doses", "--through", "2025-01-05", "--medication", str(self.med.pk), stdout=out)
+        self.assertIn("Checked 5 days across 1 medications: 3 alerts raised or updated, 0 resolved.", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("detect_missed_doses", "--through", "2025-13-01", stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command("detect_missed_doses", "--through", str(timezone.localdate()), stdout=StringIO())
+
+    def test_alerts_endpoint_walks_cursor_pages(self):
+        detect(date(2025, 1, 7))
+        url = reverse("alert-list") + f"?medication={self.med.pk}&page_size=2"
+        days = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            days.extend(item["day"] for item in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(days, ["2025-01-07", "2025-01-06", "2025-01-04", "2025-01-03", "2025-01-02"])
+
+        for medication in ("abc", "99999999999999999999"):
+            response = self.client.get(reverse("alert-list") + f"?medication={medication}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("error", response.data)
+
+        self.med.hide()
+        self.assertEqual(self.client.get(reverse("alert-list")).data["results"], [])
+
+    def test_hide_and_purge_invalidate_the_alerts_list(self):
+        detect(date(2025, 1, 7))
+        url = reverse("alert-list")
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks():
+            self.med.hide()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [])
+
+        etag = response["ETag"]
+        purge_medication(self.med.pk)
+        self.assertFalse(MissedDoseAlert.objects.filter(medication_id=self.med.pk).exists())
+        self.assertNotEqual(self.client.get(url)["ETag"], etag)
@@ -1,9 +1,18 @@
-from django.test import TestCase
-from medtrackerapp.models import Medication, DoseLog
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from medtrackerapp.models import Medication, DoseLog, DoctorNote, AdherenceCounter, DailyDoseRollup, day_range
+from medtrackerapp import enrichment, purge
+from medtrackerapp.services import DrugInfoService, NO_RESULTS_ERROR
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from datetime import timedelta, date as _date
 from django.core.exceptions import ValidationError
-from unittest.mock import patch
+from unittest.mock import ANY, patch
+from io import StringIO
+import random
+import zoneinfo
 
 
 class MedicationModelTests(TestCase):
@@ -33,6 +42,18 @@ class MedicationModelTests(TestCase):
         adherence = med.adherence_rate()
         self.assertAlmostEqual(adherence, 50.0, places=2)
 
+    def test_adherence_rate_uses_annotated_counts(self):
+        med = Medication.objects.create(name="Annotated", dosage_mg=50, prescribed_per_day=2)
+        now = timezone.now()
+        DoseLog.objects.create(medication=med, taken_at=now - timedelta(hours=1))
+        DoseLog.objects.create(medication=med, taken_at=now - timedelta(hours=2), was_taken=False)
+        DoseLog.objects.create(medication=med, taken_at=now - timedelta(hours=3), was_taken=False)
+        annotated = Medication.objects.with_adherence_counts().get(pk=med.pk)
+        with self.assertNumQueries(0):
+            adherence = annotated.adherence_rate()
+        self.assertEqual(adherence, med.adherence_rate())
+        self.assertAlmostEqual(adherence, 33.33, places=2)
+
     def test_invalid_dosage_raises_error(self):
         med_zero = Medication(name="ZeroDose", dosage_mg=0, prescribed_per_day=1)
         with self.assertRaises(ValidationError) as cm:
@@ -90,3 +111,327 @@ class DoseLogModelTests(TestCase):
         with self.assertRaises(ValidationError) as cm:
             dose.full_clean()
         self.assertIn('taken_at', cm.exception.message_dict)
+
+
+class AdherenceCounterTests(TestCase):
+
+    def setUp(self):
+        self.med = Medication.objects.create(name="Counted", dosage_mg=10, prescribed_per_day=2)
+        self.other = Medication.objects.create(name="Other", dosage_mg=10, prescribed_per_day=1)
+        self.when = timezone.now() - timedelta(hours=1)
+
+    def counts(self, med):
+        counter = AdherenceCounter.objects.filter(medication=med).first()
+        return (counter.taken, counter.total) if counter else (0, 0)
+
+    def test_create_and_delete_update_counters(self):
+        log = DoseLog.objects.create(medication=self.med, taken_at=self.when)
+        DoseLog.objects.create(medication=self.med, taken_at=self.when, was_taken=False)
+        self.assertEqual(self.counts(self.med), (1, 2))
+        log.delete()
+        self.assertEqual(self.counts(self.med), (0, 1))
+
+    def test_was_taken_flip_and_medication_change(self):
+        log = DoseLog.objects.create(medication=self.med, taken_at=self.when)
+        log.was_taken = False
+        log.save()
+        self.assertEqual(self.counts(self.med), (0, 1))
+        log.medication = self.other
+        log.was_taken = True
+        log.save()
+        self.assertEqual(self.counts(self.med), (0, 0))
+        self.assertEqual(self.counts(self.other), (1, 1))
+
+    def test_bulk_paths_update_counters(self):
+        DoseLog.objects.bulk_create(
+            [DoseLog(medication=self.med, taken_at=self.when, was_taken=i % 2 == 0) for i in range(4)]
+        )
+        self.assertEqual(self.counts(self.med), (2, 4))
+        DoseLog.objects.filter(medication=self.med).update(was_taken=True)
+        self.assertEqual(self.counts(self.med), (4, 4))
+        DoseLog.objects.filter(medication=self.med)[:1].get().delete()
+        DoseLog.objects.filter(medication=self.med).update(medication=self.other)
+        self.assertEqual(self.counts(self.other), (3, 3))
+        DoseLog.objects.filter(medication=self.other).delete()
+        self.assertEqual(self.counts(self.other), (0, 0))
+        self.assertEqual(self.med.adherence_rate(), 0.0)
+
+    def test_adherence_rate_reads_counter(self):
+        DoseLog.objects.create(medication=self.med, taken_at=self.when)
+        DoseLog.objects.create(medication=self.med, taken_at=self.when, was_taken=False)
+        med = Medication.objects.select_related("adherence_counter").get(pk=self.med.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(med.adherence_rate(), 50.0)
+
+    def test_rebuild_command_repairs_drift(self):
+        DoseLog.objects.create(medication=self.med, taken_at=self.when)
+        AdherenceCounter.objects.filter(medication=self.med).update(taken=7, total=9)
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_adherence_counters", "--verify", stdout=StringIO())
+
+        out = StringIO()
+        call_command("rebuild_adherence_counters", stdout=out)
+        self.assertIn("1 were out of sync", out.getvalue())
+        self.assertEqual(self.counts(self.med), (1, 1))
+        call_command("rebuild_adherence_counters", "--verify", stdout=StringIO())
+
+
+class DailyDoseRollupTests(TestCase):
+
+    def setUp(self):
+        self.med = Medication.objects.create(name="Rolled", dosage_mg=10, prescribed_per_day=2)
+        rng = random.Random(7)
+        base = timezone.make_aware(timezone.datetime(2025, 1, 1))
+        self.logs = [
+            DoseLog.objects.create(
+                medication=self.med,
+                taken_at=base + timedelta(minutes=rng.randrange(0, 60 * 24 * 20)),
+                was_taken=rng.random() < 0.7,
+            )
+            for _ in range(60)
+        ]
+        DoseLog.objects.create(medication=self.med, taken_at=timezone.make_aware(timezone.datetime(2025, 1, 5)))
+        DoseLog.objects.create(
+            medication=self.med, taken_at=timezone.make_aware(timezone.datetime(2025, 1, 5, 23, 59, 59, 999999))
+        )
+
+    def scanned_rate(self, start, end):
+        taken = self.med.doselog_set.filter(
+            taken_at__date__gte=start, taken_at__date__lte=end, was_taken=True
+        ).count()
+        return round(taken / self.med.expected_doses((end - start).days + 1) * 100, 2)
+
+    def test_rollup_matches_log_scan_for_any_range(self):
+        first = _date(2024, 12, 30)
+        for offset in range(0, 25, 3):
+            for length in (0, 1, 4, 30):
+                start = first + timedelta(days=offset)
+                end = start + timedelta(days=length)
+                self.assertEqual(self.med.adherence_rate_over_period(start, end), self.scanned_rate(start, end))
+
+    def test_rollups_follow_updates_and_deletes(self):
+        for log in self.logs[:10]:
+            log.taken_at -= timedelta(days=3)
+            log.was_taken = not log.was_taken
+            log.save()
+        DoseLog.objects.filter(pk__in=[log.pk for log in self.logs[10:20]]).delete()
+        start, end = _date(2024, 12, 25), _date(2025, 1, 25)
+        self.assertEqual(self.med.adherence_rate_over_period(start, end), self.scanned_rate(start, end))
+
+    def test_period_adherence_sums_rollups_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.med.adherence_rate_over_period(_date(2025, 1, 1), _date(2025, 12, 31))
+
+    def test_period_adherence_in_other_active_timezone(self):
+        start, end = _date(2025, 1, 5), _date(2025, 1, 5)
+        with timezone.override(zoneinfo.ZoneInfo("America/New_York")):
+            expected = self.scanned_rate(start, end)
+            self.assertEqual(self.med.adherence_rate_over_period(start, end), expected)
+
+    def test_backfill_command_rebuilds_rollups(self):
+        expected = sorted(DailyDoseRollup.objects.values_list("medication_id", "day", "taken", "missed"))
+        DailyDoseRollup.objects.all().delete()
+        call_command("backfill_daily_rollups", stdout=StringIO())
+        rebuilt = sorted(
+            DailyDoseRollup.objects.exclude(taken=0, missed=0).values_list("medication_id", "day", "taken", "missed")
+        )
+        self.assertEqual(rebuilt, [row for row in expected if row[2] or row[3]])
+        self.assertFalse(DailyDoseRollup.objects.filter(changed_at__isnull=True).exists())
+
+
+class DoseLogDateRangeTests(TestCase):
+
+    def setUp(self):
+        self.med = Medication.objects.create(name="Indexed", dosage_mg=10, prescribed_per_day=1)
+        self.other = Medication.objects.create(name="Unrelated", dosage_mg=10, prescribed_per_day=1)
+        base = timezone.make_aware(timezone.datetime(2025, 3, 29))
+        for hours in range(0, 24 * 4, 5):
+            DoseLog.objects.create(medication=self.med, taken_at=base + timedelta(hours=hours))
+            DoseLog.objects.create(medication=self.other, taken_at=base + timedelta(hours=hours))
+
+    def plan(self, queryset):
+        with transaction.atomic():
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            return queryset.explain()
+
+    def test_day_range_matches_date_lookup_across_timezones(self):
+        start, end = _date(2025, 3, 30), _date(2025, 3, 31)
+        for name in ("UTC", "Europe/Warsaw", "America/New_York"):
+            with timezone.override(zoneinfo.ZoneInfo(name)):
+                lower, upper = day_range(start, end)
+                by_range = set(DoseLog.objects.filter(taken_at__gte=lower, taken_at__lt=upper).values_list("pk", flat=True))
+                by_date = set(DoseLog.objects.filter(
+                    taken_at__date__gte=start, taken_at__date__lte=end
+                ).values_list("pk", flat=True))
+                self.assertEqual(by_range, by_date, name)
+
+    def test_day_range_clamps_extreme_dates(self):
+        for name in ("UTC", "Europe/Warsaw", "America/New_York"):
+            with timezone.override(zoneinfo.ZoneInfo(name)):
+                lower, upper = day_range(_date.min, _date.max)
+                self.assertEqual(
+                    DoseLog.objects.filter(taken_at__gte=lower, taken_at__lt=upper).count(), DoseLog.objects.count()
+                )
+
+    def test_medication_range_uses_composite_index(self):
+        lower, upper = day_range(_date(2025, 3, 30), _date(2025, 3, 30))
+        plan = self.plan(DoseLog.objects.filter(medication=self.med, taken_at__gte=lower, taken_at__lt=upper))
+        self.assertIn("doselog_med_taken_at_idx", plan)
+
+    def test_global_range_uses_taken_at_index(self):
+        lower, upper = day_range(_date(2025, 3, 30), _date(2025, 3, 30))
+        plan = self.plan(DoseLog.objects.filter(taken_at__gte=lower, taken_at__lt=upper).order_by("taken_at"))
+        self.assertIn("doselog_taken_at_id_idx", plan)
+
+
+@override_settings(MEDICATION_PURGE_ASYNC=False, MEDICATION_PURGE_BATCH_SIZE=3)
+class MedicationPurgeTests(TestCase):
+
+    def setUp(self):
+        self.med = Medication.objects.create(name="Purged", dosage_mg=10, prescribed_per_day=1)
+        self.kept = Medication.objects.create(name="Kept", dosage_mg=10, prescribed_per_day=1)
+        now = timezone.now()
+        for med in (self.med, self.kept):
+            DoseLog.objects.bulk_create([
+                DoseLog(medication=med, taken_at=now - timedelta(days=i), was_taken=i % 3 != 0) for i in range(8)
+            ])
+            DoctorNote.objects.bulk_create([
+                DoctorNote(medication=med, note=f"Note {i}", created_at=now.date()) for i in range(4)
+            ])
+
+    def test_hide_hides_immediately_and_purges_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.med.hide()
+        self.assertFalse(Medication.objects.filter(pk=self.med.pk).exists())
+        self.assertTrue(Medication.all_objects.filter(pk=self.med.pk).exists())
+        self.assertEqual(DoseLog.objects.filter(medication_id=self.med.pk).count(), 8)
+
+        with CaptureQueriesContext(connection) as captured:
+            for callback in callbacks:
+                callback()
+        batches = [
+            query["sql"] for query in captured.captured_queries
+            if query["sql"].startswith('DELETE FROM "medtrackerapp_doselog" WHERE "medtrackerapp_doselog"."id" IN')
+        ]
+        self.assertEqual(len(batches), 3)  # 3 + 3 + 2 logs
+        self.assertFalse(Medication.all_objects.filter(pk=self.med.pk).exists())
+        for model in (DoseLog, DoctorNote, DailyDoseRollup, AdherenceCounter):
+            self.assertFalse(model.objects.filter(medication_id=self.med.pk).exists())
+        self.assertEqual(DoseLog.objects.filter(medication=self.kept).count(), 8)
+        self.assertEqual(DoctorNote.objects.filter(medication=self.kept).count(), 4)
+        call_command("rebuild_adherence_counters", "--verify", stdout=StringIO())
+
+    def test_purge_ignores_visible_medications(self):
+        self.assertIsNone(purge.purge_medication(self.kept.pk))
+        self.assertTrue(Medication.objects.filter(pk=self.kept.pk).exists())
+
+    def test_command_resumes_unfinished_purges(self):
+        Medication.objects.filter(pk=self.med.pk).update(deleted_at=timezone.now())
+        out = StringIO()
+        call_command("purge_medications", stdout=out)
+        self.assertIn("Purged 1 medications (12 dose logs and notes)", out.getvalue())
+        self.assertEqual(Medication.all_objects.count(), 1)
+
+    @override_settings(MEDICATION_PURGE_ASYNC=True)
+    def test_background_purges_are_deduplicated(self):
+        with patch.object(purge, "purge_medication") as purge_medication, \
+                patch.object(purge.threading, "Thread") as thread:
+            self.assertIsNotNone(purge.schedule_purge(self.med.pk))
+            self.assertIsNone(purge.schedule_purge(self.med.pk))
+            thread.assert_called_once()
+            purge._purge_in_background(self.med.pk, "default")
+        purge_medication.assert_called_once_with(self.med.pk, using="default")
+        self.assertEqual(purge._purging, set())
+
+
+@override_settings(DRUG_INFO_ENRICH_ASYNC=False)
+class MedicationDrugInfoTests(TestCase):
+    INFO = {"brand_name": "Aspirin", "manufacturer": "Bayer", "substance": "ASPIRIN"}
+
+    def fetch_many(self, names, limiter=None):
+        return {name: self.INFO if name.startswith("Asp") else {"error": NO_RESULTS_ERROR} for name in names}
+
+    def test_created_medications_are_enriched_after_commit(self):
+        with patch.object(DrugInfoService, "fetch_many", side_effect=self.fetch_many) as fetch_many, \
+                self.captureOnCommitCallbacks(execute=True):
+            med = Medication.objects.create(name="Aspirin", dosage_mg=100, prescribed_per_day=1)
+            Medication.objects.bulk_create([Medication(name="Unknown", dosage_mg=5, prescribed_per_day=1)])
+        self.assertEqual(fetch_many.call_count, 2)
+        med.refresh_from_db()
+        self.assertEqual(med.stored_info(), self.INFO)
+        self.assertEqual(Medication.objects.get(name="Unknown").stored_info(), {"error": NO_RESULTS_ERROR})
+
+        # Stored info is served without a lookup.
+        with patch.object(DrugInfoService, "fetch_external_info") as fetch_external_info:
+            self.assertEqual(med.fetch_external_info(), self.INFO)
+        fetch_external_info.assert_not_called()
+
+    def test_rename_clears_info_and_requeues(self):
+        with patch.object(DrugInfoService, "fetch_many", side_effect=self.fetch_many), \
+                self.captureOnCommitCallbacks(execute=True):
+            med = Medication.objects.create(name="Aspirin", dosage_mg=100, prescribed_per_day=1)
+        with self.captureOnCommitCallbacks() as callbacks:
+            med.name = "Paracetamol"
+            med.save()
+        self.assertIsNone(Medication.objects.get(pk=med.pk).stored_info())
+        with patch.object(DrugInfoService, "fetch_many", side_effect=self.fetch_many) as fetch_many:
+            for callback in callbacks:
+                callback()
+        fetch_many.assert_called_once_with(["Paracetamol"], limiter=ANY)
+        self.assertEqual(Medication.objects.get(pk=med.pk).stored_info(), {"error": NO_RESULTS_ERROR})
+
+        with self.captureOnCommitCallbacks():
+            Medication.objects.filter(pk=med.pk).update(name="Aspirin Forte")
+        self.assertIsNone(Medication.objects.get(pk=med.pk).stored_info())
+
+    def test_transient_errors_and_stale_names_are_not_stored(self):
+        with self.settings(DRUG_INFO_ENRICH_ON_WRITE=False):
+            med = Medication.objects.create(name="Aspirin", dosage_mg=100, prescribed_per_day=1)
+        self.assertFalse(med.store_info({"error": "HTTP Error: 503"}))
+        Medication.objects.filter(pk=med.pk).update(name="Renamed")
+        self.assertFalse(med.store_info(self.INFO))
+        self.assertIsNone(Medication.objects.get(pk=med.pk).stored_info())
+
+    @override_settings(DRUG_INFO_ENRICH_ON_WRITE=False, DRUG_INFO_NEGATIVE_CACHE_TTL=300)
+    def test_no_results_expire_on_the_negative_ttl(self):
+        med = Medication.objects.create(name="Unknown", dosage_mg=5, prescribed_per_day=1)
+        med.store_info({"error": NO_RESULTS_ERROR})
+        self.assertEqual(med.stored_info(fresh=True), {"error": NO_RESULTS_ERROR})
+        self.assertFalse(enrichment.stale().exists())
+
+        Medication.objects.filter(pk=med.pk).update(info_fetched_at=timezone.now() - timedelta(minutes=10))
+        med.refresh_from_db()
+        self.assertEqual(med.stored_info(), {"error": NO_RESULTS_ERROR})
+        self.assertIsNone(med.stored_info(fresh=True))
+        self.assertEqual(list(enrichment.stale()), [med])
+        with patch.object(DrugInfoService, "fetch_external_info", return_value=self.INFO) as fetch_external_info:
+            self.assertEqual(med.fetch_external_info(), self.INFO)
+        fetch_external_info.assert_called_once_with("Unknown")
+
+    @override_settings(DRUG_INFO_ENRICH_ON_WRITE=False)
+    def test_command_refreshes_missing_and_stale_info(self):
+        fresh = Medication.objects.create(name="Aspirin", dosage_mg=100, prescribed_per_day=1)
+        fresh.store_info(self.INFO)
+        old = Medication.objects.create(name="Aspirin Old", dosage_mg=100, prescribed_per_day=1)
+        old.store_info(self.INFO)
+        Medication.objects.filter(pk=old.pk).update(info_fetched_at=timezone.now() - timedelta(days=30))
+        Medication.objects.create(name="Asp New", dosage_mg=100, prescribed_per_day=1)
+
+        out = StringIO()
+        with patch.object(DrugInfoService, "fetch_many", side_effect=self.fetch_many) as fetch_many:
+            call_command("refresh_drug_info", "--batch-size", "1", "--rate", "0", stdout=out)
+        self.assertIn("Stored drug info for 2 of 2 medications.", out.getvalue())
+        self.assertEqual(sorted(call.args[0][0] for call in fetch_many.call_args_list), ["Asp New", "Aspirin Old"])
+        self.assertFalse(enrichment.stale().exists())
+
+    def test_rate_limiter_spaces_acquisitions(self):
+        limiter = enrichment.RateLimiter(10)
+        with patch.object(enrichment.time, "sleep") as sleep, \
+                patch.object(enrichment.time, "monotonic", return_value=100.0):
+            limiter.acquire()
+            limiter.acquire(2)
+            limiter.acquire()
+        self.assertEqual([round(call.args[0], 2) for call in sleep.call_args_list], [0.1, 0.3])
@@ -1,7 +1,25 @@
-from django.test import TestCase
-from medtrackerapp.services import DrugInfoService
-from medtrackerapp.models import Medication
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from unittest.mock import Mock, patch
+from medtrackerapp.services import DrugInfoService, AsyncDrugInfoService, CircuitBreaker
+from medtrackerapp.views import medication_info
+from django.test import AsyncRequestFactory
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import json
+import threading
+import time
+from medtrackerapp.models import Medication, DrugLabel
+from medtrackerapp.management.commands.import_drug_labels import iter_array_items
+from django.core.management import call_command
+from io import StringIO
+import gzip
+import os
+import tempfile
+import zipfile
 from rest_framework import status
+from django.urls import reverse
+import requests
 import requests_mock
 
 
@@ -14,9 +32,13 @@ MOCK_SUCCESS_DATA = {
 }
 
 
+@override_settings(DRUG_INFO_MAX_RETRIES=2, DRUG_INFO_RETRY_BACKOFF=0)
 class DrugInfoServiceTests(TestCase):
 
     def setUp(self):
+        DrugInfoService.reset_client()
+        cache.clear()
+        DrugInfoService.reset_cache_stats()
         self.service = DrugInfoService()
         self.medication = Medication(name="TestDrug", dosage_mg=100, prescribed_per_day=1)
 
@@ -34,7 +56,7 @@ class DrugInfoServiceTests(TestCase):
             result = self.service.fetch_external_info(self.medication.name)
             self.assertIn('error', result)
             self.assertIn('HTTP Error', result['error'])
-            self.assertEqual(m.call_count, 1)
+            self.assertEqual(m.call_count, 3)
 
     def test_fetch_external_info_connection_error(self):
         with requests_mock.Mocker() as m:
@@ -43,3 +65,427 @@ class DrugInfoServiceTests(TestCase):
             self.assertIn('error', result)
             self.assertIn('Connection Error', result['error'])
             self.assertEqual(m.call_count, 1)
+
+    def test_fetch_external_info_retries_connection_errors(self):
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, exc=requests.ConnectionError("refused"))
+            result = self.service.fetch_external_info(self.medication.name)
+            self.assertIn('Connection Error', result['error'])
+            self.assertEqual(m.call_count, 3)
+
+    def test_fetch_external_info_retries_then_succeeds(self):
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, [
+                {"status_code": status.HTTP_503_SERVICE_UNAVAILABLE},
+                {"status_code": status.HTTP_200_OK, "json": MOCK_SUCCESS_DATA},
+            ])
+            result = self.service.fetch_external_info(self.medication.name)
+            self.assertEqual(result.get("brand_name"), "Test Brand")
+            self.assertEqual(m.call_count, 2)
+
+    def test_fetch_external_info_honours_retry_after(self):
+        with requests_mock.Mocker() as m, patch("medtrackerapp.services.time.sleep") as sleep:
+            m.get(DrugInfoService.BASE_URL, [
+                {"status_code": status.HTTP_429_TOO_MANY_REQUESTS, "headers": {"Retry-After": "1"}},
+                {"status_code": status.HTTP_200_OK, "json": MOCK_SUCCESS_DATA},
+            ])
+            self.service.fetch_external_info(self.medication.name)
+            sleep.assert_called_once_with(1.0)
+
+    @override_settings(DRUG_INFO_TOTAL_TIMEOUT=4)
+    def test_retries_stop_once_the_time_budget_is_spent(self):
+        clock = iter([100.0, 100.0, 100.0, 103.5, 103.5])
+        with requests_mock.Mocker() as m, patch("medtrackerapp.services.time.sleep") as sleep, \
+                patch("medtrackerapp.services.time.monotonic", side_effect=lambda: next(clock)):
+            m.get(DrugInfoService.BASE_URL, [
+                {"status_code": status.HTTP_429_TOO_MANY_REQUESTS, "headers": {"Retry-After": "1"}},
+                {"status_code": status.HTTP_429_TOO_MANY_REQUESTS, "headers": {"Retry-After": "1"}},
+            ])
+            result = self.service._search("openfda.brand_name:testdrug", limit=1)
+            self.assertEqual(result, {"error": "HTTP Error: 429"})
+            self.assertEqual(m.call_count, 2)
+            sleep.assert_called_once_with(1.0)
+            # The second attempt only gets the half second left.
+            self.assertEqual(m.request_history[1].timeout, (0.5, 0.5))
+
+    def test_fetch_external_info_does_not_retry_client_errors(self):
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, status_code=status.HTTP_404_NOT_FOUND)
+            self.service.fetch_external_info(self.medication.name)
+            self.assertEqual(m.call_count, 1)
+
+    def test_requests_share_one_session_with_split_timeouts(self):
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, json=MOCK_SUCCESS_DATA)
+            self.service.fetch_external_info("First")
+            DrugInfoService().fetch_external_info("Second")
+            self.assertIs(DrugInfoService.get_session(), DrugInfoService.get_session())
+            self.assertEqual(m.request_history[0].timeout, (3.05, 5.0))
+
+
+class DrugInfoCacheTests(TestCase):
+
+    def setUp(self):
+        DrugInfoService.reset_client()
+        cache.clear()
+        DrugInfoService.reset_cache_stats()
+        self.service = DrugInfoService()
+
+    def test_success_is_cached_by_normalized_name(self):
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, json=MOCK_SUCCESS_DATA)
+            first = self.service.fetch_external_info("TestDrug")
+            second = self.service.fetch_external_info("  testdrug ")
+            self.assertEqual(first, second)
+            self.assertEqual(m.call_count, 1)
+        self.assertEqual(DrugInfoService.cache_stats(), {"local_hits": 0, "hits": 1, "stale_hits": 0, "misses": 1})
+
+    def test_upstream_query_uses_normalized_name(self):
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, json=MOCK_SUCCESS_DATA)
+            self.service.fetch_external_info("  Test \t Drug ")
+            self.assertEqual(m.last_request.qs["search"], ["openfda.brand_name:test drug"])
+
+    def test_no_results_is_cached_negatively(self):
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, json={"results": []})
+            self.service.fetch_external_info("Unknown")
+            result = self.service.fetch_external_info("Unknown")
+            self.assertIn("No results", result["error"])
+            self.assertEqual(m.call_count, 1)
+
+    @override_settings(DRUG_INFO_NEGATIVE_CACHE_TTL=0, DRUG_INFO_STALE_TTL=0)
+    def test_negative_entries_expire_on_their_own_ttl(self):
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, json={"results": []})
+            self.service.fetch_external_info("Unknown")
+            self.service.fetch_external_info("Unknown")
+            self.assertEqual(m.call_count, 2)
+
+    @override_settings(DRUG_INFO_MAX_RETRIES=0)
+    def test_errors_are_not_cached(self):
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            self.service.fetch_external_info("TestDrug")
+            self.service.fetch_external_info("TestDrug")
+            self.assertEqual(m.call_count, 2)
+        self.assertEqual(DrugInfoService.cache_stats()["misses"], 2)
+
+    @override_settings(DRUG_INFO_CACHE_TTL=0, DRUG_INFO_STALE_TTL=60)
+    def test_expired_entry_is_served_while_refreshing(self):
+        refreshed = {"results": [{"drug_brand_name": ["New Brand"]}]}
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, [{"json": MOCK_SUCCESS_DATA}, {"json": refreshed}])
+            self.service.fetch_external_info("TestDrug")
+            with patch.object(DrugInfoService, "_schedule_refresh", autospec=True) as schedule:
+                stale = self.service.fetch_external_info("TestDrug")
+            self.assertEqual(stale["brand_name"], "Test Brand")
+            schedule.assert_called_once_with(self.service, "TestDrug")
+
+            self.service._schedule_refresh("TestDrug").join()
+            self.assertEqual(m.call_count, 2)
+        entry = cache.get(self.service.cache_key("TestDrug"))
+        self.assertEqual(entry["data"]["brand_name"], "New Brand")
+        self.assertEqual(DrugInfoService.cache_stats()["stale_hits"], 1)
+
+
+@override_settings(
+    DRUG_INFO_MAX_RETRIES=0,
+    DRUG_INFO_BREAKER_WINDOW=4,
+    DRUG_INFO_BREAKER_MIN_CALLS=4,
+    DRUG_INFO_BREAKER_THRESHOLD=0.5,
+    DRUG_INFO_BREAKER_RESET_TIMEOUT=60,
+)
+class CircuitBreakerTests(TestCase):
+
+    def setUp(self):
+        DrugInfoService.reset_client()
+        cache.clear()
+        self.service = DrugInfoService()
+
+    def test_breaker_opens_and_fails_fast(self):
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+            for _ in range(4):
+                self.service.fetch_external_info("Flaky")
+            self.assertTrue(DrugInfoService.get_breaker().is_open)
+
+            result = self.service.fetch_external_info("Flaky")
+            self.assertIn("Circuit open", result["error"])
+            self.assertEqual(m.call_count, 4)
+
+    def test_open_breaker_returns_502_from_view(self):
+        medication = Medication.objects.create(name="Flaky", dosage_mg=1, prescribed_per_day=1)
+        breaker = DrugInfoService.get_breaker()
+        for _ in range(4):
+            breaker.record(False)
+        with requests_mock.Mocker() as m:
+            response = self.client.get(reverse("medication-get-external-info", kwargs={"pk": medication.pk}))
+            self.assertEqual(m.call_count, 0)
+        self.assertEqual(response.status_code, status.HTTP_502_BAD_GATEWAY)
+        self.assertIn("Circuit open", response.json()["error"])
+
+    def test_half_open_trial_closes_or_reopens(self):
+        breaker = CircuitBreaker(window=2, min_calls=2, threshold=0.5, reset_timeout=0)
+        breaker.record(False)
+        breaker.record(False)
+        self.assertTrue(breaker.is_open)
+
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record(False)
+        self.assertTrue(breaker.is_open)
+
+        self.assertTrue(breaker.allow())
+        breaker.record(True)
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow())
+
+
+class StubOpenFDA:
+    """
+    Minimal local stand-in for the OpenFDA label endpoint that counts hits
+    and answers after a short delay.
+    """
+
+    def __init__(self, payload, status_code=200, delay=0.2):
+        stub = self
+        self.hits = 0
+        self.lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with stub.lock:
+                    stub.hits += 1
+                time.sleep(delay)
+                body = json.dumps(payload).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/drug/label.json"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@override_settings(DRUG_INFO_MAX_RETRIES=0)
+class AsyncDrugInfoServiceTests(TestCase):
+
+    def setUp(self):
+        DrugInfoService.reset_client()
+        cache.clear()
+        DrugInfoService.reset_cache_stats()
+
+    async def test_concurrent_lookups_share_one_upstream_call(self):
+        with StubOpenFDA(MOCK_SUCCESS_DATA) as stub, patch.object(AsyncDrugInfoService, "BASE_URL", stub.url):
+            service = AsyncDrugInfoService()
+            results = await asyncio.gather(*(service.fetch_external_info("TestDrug") for _ in range(5)))
+            again = await service.fetch_external_info("testdrug")
+        self.assertEqual(stub.hits, 1)
+        self.assertTrue(all(result["brand_name"] == "Test Brand" for result in results))
+        self.assertEqual(again, results[0])
+        self.assertEqual(DrugInfoService.cache_stats(), {"local_hits": 0, "hits": 1, "stale_hits": 0, "misses": 5})
+
+    async def test_http_error_keeps_error_shape(self):
+        with StubOpenFDA({}, status_code=503, delay=0) as stub, patch.object(AsyncDrugInfoService, "BASE_URL", stub.url):
+            result = await AsyncDrugInfoService().fetch_external_info("TestDrug")
+        self.assertEqual(result, {"error": "HTTP Error: 503"})
+
+    def test_client_is_closed_with_its_event_loop(self):
+        async def clients():
+            return await AsyncDrugInfoService.get_client(), await AsyncDrugInfoService.get_client()
+
+        first, second = asyncio.run(clients())
+        self.assertIs(first, second)
+        self.assertTrue(first.is_closed)
+
+    async def test_async_view(self):
+        medication = await Medication.objects.acreate(name="TestDrug", dosage_mg=1, prescribed_per_day=1)
+        factory = AsyncRequestFactory()
+        with StubOpenFDA(MOCK_SUCCESS_DATA, delay=0) as stub, patch.object(AsyncDrugInfoService, "BASE_URL", stub.url):
+            response = await medication_info(factory.get("/"), pk=medication.pk)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content)["manufacturer"], "Test Mfgr")
+
+        missing = await medication_info(factory.get("/"), pk=medication.pk + 100)
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+
+def label(brand, manufacturer):
+    return {
+        "openfda": {"brand_name": [brand]},
+        "drug_brand_name": [brand],
+        "manufacturer_name": [manufacturer],
+        "substance_name": ["Unknown"],
+    }
+
+
+@override_settings(DRUG_INFO_MAX_RETRIES=0)
+class DrugInfoBatchTests(TestCase):
+
+    def setUp(self):
+        DrugInfoService.reset_client()
+        cache.clear()
+        self.service = DrugInfoService()
+
+    def test_combined_search_resolves_all_names_in_one_call(self):
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, json={"results": [label("Advil", "Pfizer"), label("Tylenol", "J&J")]})
+            results = self.service.fetch_many(["Tylenol", "advil", "Advil"])
+            self.assertEqual(m.call_count, 1)
+            self.assertIn('openfda.brand_name:"tylenol" openfda.brand_name:"advil"', m.last_request.qs["search"][0])
+        self.assertEqual(results["Tylenol"]["manufacturer"], "J&J")
+        self.assertEqual(results["advil"]["manufacturer"], "Pfizer")
+        self.assertEqual(results["Advil"], results["advil"])
+        self.assertEqual(self.service.fetch_external_info("Tylenol")["manufacturer"], "J&J")
+
+    def test_unmatched_names_fall_back_to_single_lookups(self):
+        def respond(request, context):
+            if " " in request.qs["search"][0]:
+                return {"results": [label("Advil", "Pfizer")]}
+            return {"results": [label("Obscure", "Small Co")]}
+
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, json=respond)
+            results = self.service.fetch_many(["Advil", "Obscure"])
+            self.assertEqual(m.call_count, 2)
+        self.assertEqual(results["Obscure"]["manufacturer"], "Small Co")
+
+    def test_no_matches_and_cached_names(self):
+        self.service.fetch_many([])
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, status_code=status.HTTP_404_NOT_FOUND, json={"error": {}})
+            results = self.service.fetch_many(["Nothing", "Nada"])
+            self.assertEqual(m.call_count, 1)
+            self.service.fetch_many(["Nada", "Nothing"])
+            self.assertEqual(m.call_count, 1)
+        self.assertIn("No results", results["Nada"]["error"])
+
+    def test_limiter_is_charged_for_upstream_lookups_only(self):
+        limiter = Mock()
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, json={"results": [label("Advil", "Pfizer"), label("Tylenol", "J&J")]})
+            self.service.fetch_many(["Advil", "advil", "Tylenol"], limiter=limiter)
+            self.service.fetch_many(["Advil", "Tylenol"], limiter=limiter)
+        limiter.acquire.assert_called_once_with(2)
+
+    def test_batch_endpoint_keys_results_by_medication_id(self):
+        advil = Medication.objects.create(name="Advil", dosage_mg=200, prescribed_per_day=2)
+        tylenol = Medication.objects.create(name="Tylenol", dosage_mg=500, prescribed_per_day=2)
+        url = reverse("medication-batch-external-info")
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, json={"results": [label("Advil", "Pfizer"), label("Tylenol", "J&J")]})
+            response = self.client.get(f"{url}?ids={advil.pk},{tylenol.pk},999")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[str(advil.pk)]["manufacturer"], "Pfizer")
+        self.assertEqual(response.data[str(tylenol.pk)]["manufacturer"], "J&J")
+        self.assertEqual(response.data["999"], {"error": "Medication not found."})
+        self.assertEqual(Medication.objects.get(pk=advil.pk).stored_info()["manufacturer"], "Pfizer")
+
+        for ids in ("a,b", f"{advil.pk},99999999999999999999", "0"):
+            self.assertEqual(self.client.get(f"{url}?ids={ids}").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+BULK_DOCUMENT = {
+    "meta": {"disclaimer": "results may vary", "results": {"skip": 0, "limit": 3, "total": 3}},
+    "results": [
+        {"set_id": "a1", "openfda": {"brand_name": ["Advil", "Advil Liqui-Gels"],
+                                     "manufacturer_name": ["Pfizer"], "substance_name": ["IBUPROFEN"]}},
+        {"set_id": "b2", "openfda": {}},
+        {"set_id": "c3", "openfda": {"brand_name": ["Tylenol"], "manufacturer_name": ["J&J"]}},
+    ],
+}
+
+
+class DrugLabelIndexTests(TestCase):
+
+    def setUp(self):
+        DrugInfoService.reset_client()
+        cache.clear()
+        DrugInfoService.reset_cache_stats()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def write(self, name, opener=open):
+        path = os.path.join(self.tmp.name, name)
+        with opener(path, "wt", encoding="utf-8") as f:
+            json.dump(BULK_DOCUMENT, f, indent=1)
+        return path
+
+    def test_iter_array_items_across_small_reads(self):
+        text = json.dumps(BULK_DOCUMENT, indent=2)
+        for read_size in (1, 5, 64, 100000):
+            items = list(iter_array_items(StringIO(text), read_size))
+            self.assertEqual(items, BULK_DOCUMENT["results"])
+
+    def test_import_plain_gzip_and_zip(self):
+        plain = self.write("labels.json")
+        gzipped = self.write("labels.json.gz", opener=gzip.open)
+        archive = os.path.join(self.tmp.name, "labels.zip")
+        with zipfile.ZipFile(archive, "w") as z:
+            z.write(plain, "drug-label-0001-of-0001.json")
+
+        for path in (plain, gzipped, archive):
+            out = StringIO()
+            call_command("import_drug_labels", path, "--read-size", "7", "--batch-size", "2", stdout=out)
+            self.assertIn("Imported 3 labels from 3 records", out.getvalue())
+        self.assertEqual(DrugLabel.objects.count(), 3)
+        label = DrugLabel.objects.get(brand_name_key="advil liqui-gels")
+        self.assertEqual((label.manufacturer, label.substance), ("Pfizer", "IBUPROFEN"))
+
+    def test_service_answers_from_local_index_without_network(self):
+        call_command("import_drug_labels", self.write("labels.json"), stdout=StringIO())
+        service = DrugInfoService()
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, json=MOCK_SUCCESS_DATA)
+            local = service.fetch_external_info(" ADVIL ")
+            batch = service.fetch_many(["tylenol", "Advil"])
+            self.assertEqual(m.call_count, 0)
+            remote = service.fetch_external_info("Elsewhere")
+            self.assertEqual(m.call_count, 1)
+        self.assertEqual(local, {"brand_name": "Advil", "manufacturer": "Pfizer", "substance": "IBUPROFEN"})
+        self.assertEqual(batch["tylenol"]["substance"], "Unknown")
+        self.assertEqual(remote["brand_name"], "Test Brand")
+        self.assertEqual(DrugInfoService.cache_stats()["local_hits"], 3)
+
+    @override_settings(DRUG_INFO_LOCAL_INDEX=False)
+    def test_local_index_can_be_disabled(self):
+        call_command("import_drug_labels", self.write("labels.json"), stdout=StringIO())
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, json=MOCK_SUCCESS_DATA)
+            DrugInfoService().fetch_external_info("Advil")
+            self.assertEqual(m.call_count, 1)
+
+    def test_failed_replace_keeps_previous_labels(self):
+        call_command("import_drug_labels", self.write("labels.json"), stdout=StringIO())
+        broken = os.path.join(self.tmp.name, "broken.json")
+        with open(broken, "w", encoding="utf-8") as f:
+            f.write('{"results": [{"openfda": {"brand_name": ["New"]}}, {"openfda": ')
+        with self.assertRaises(ValueError):
+            call_command("import_drug_labels", broken, "--replace", "--batch-size", "1", stdout=StringIO())
+        self.assertEqual(DrugLabel.objects.count(), 3)
+        self.assertFalse(DrugLabel.objects.filter(brand_name_key="new").exists())
+
+    def test_cached_names_skip_the_local_index(self):
+        call_command("import_drug_labels", self.write("labels.json"), stdout=StringIO())
+        service = DrugInfoService()
+        with requests_mock.Mocker() as m:
+            m.get(DrugInfoService.BASE_URL, json=MOCK_SUCCESS_DATA)
+            service.fetch_external_info("Elsewhere")
+            with self.assertNumQueries(0):
+                service.fetch_external_info("Elsewhere")
+                service.fetch_many(["Elsewhere", "elsewhere "])
+        self.assertEqual(DrugInfoService.cache_stats()["hits"], 2)
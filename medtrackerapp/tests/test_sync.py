@@ -0,0 +1,118 @@
+from rest_framework.test import APITestCase
+from rest_framework import status
+from django.core import signing
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from medtrackerapp.models import ChangeLogEntry, Medication, DoseLog, DoctorNote
+from medtrackerapp.sync import encode_token
+import base64
+
+
+@override_settings(SYNC_OVERLAP_SECONDS=0, MEDICATION_PURGE_ASYNC=False, DRUG_INFO_ENRICH_ON_WRITE=False)
+class SyncTests(APITestCase):
+
+    def setUp(self):
+        self.url = reverse("sync-list")
+        self.med = Medication.objects.create(name="Aspirin", dosage_mg=100, prescribed_per_day=2)
+        now = timezone.now()
+        self.logs = DoseLog.objects.bulk_create([
+            DoseLog(medication=self.med, taken_at=now - timedelta(hours=i)) for i in range(1, 4)
+        ])
+        self.note = DoctorNote.objects.create(medication=self.med, note="Take with food", created_at=now.date())
+
+    def sync(self, token=None):
+        response = self.client.get(self.url, {"since": token} if token else {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def ids(self, data, key):
+        return sorted(item["id"] for item in data[key]["changed"]), data[key]["deleted"]
+
+    def test_full_sync_then_nothing_new(self):
+        data = self.sync()
+        self.assertFalse(data["has_more"])
+        self.assertEqual(self.ids(data, "logs"), (sorted(log.pk for log in self.logs), []))
+        self.assertEqual(data["notes"]["changed"][0]["note"], "Take with food")
+
+        again = self.sync(data["token"])
+        self.assertEqual(self.ids(again, "logs"), ([], []))
+        self.assertEqual(self.ids(again, "notes"), ([], []))
+
+    def test_changes_and_tombstones_since_token(self):
+        token = self.sync()["token"]
+        created = DoseLog.objects.create(medication=self.med, taken_at=timezone.now())
+        DoseLog.objects.filter(pk=self.logs[0].pk).update(was_taken=False)
+        deleted = self.logs[1].pk
+        self.logs[1].delete()
+        DoctorNote.objects.filter(pk=self.note.pk).delete()
+
+        data = self.sync(token)
+        self.assertEqual(self.ids(data, "logs"), (sorted([created.pk, self.logs[0].pk]), [deleted]))
+        self.assertFalse([item for item in data["logs"]["changed"] if item["id"] == self.logs[0].pk][0]["was_taken"])
+        self.assertEqual(self.ids(data, "notes"), ([], [self.note.pk]))
+        # One entry per row, however often it changes.
+        self.assertEqual(ChangeLogEntry.objects.filter(collection="doselog", object_id=self.logs[0].pk).count(), 1)
+
+    def test_pages_until_caught_up(self):
+        seen, token = [], None
+        with self.settings(SYNC_PAGE_SIZE=2):
+            while True:
+                data = self.sync(token)
+                seen += self.ids(data, "logs")[0] + self.ids(data, "notes")[0]
+                token = data["token"]
+                if not data["has_more"]:
+                    break
+        self.assertEqual(len(seen), 4)
+
+    def test_purged_medication_leaves_tombstones(self):
+        token = self.sync()["token"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.med.hide()
+        data = self.sync(token)
+        self.assertEqual(self.ids(data, "logs"), ([], sorted(log.pk for log in self.logs)))
+        self.assertEqual(self.ids(data, "notes"), ([], [self.note.pk]))
+
+    def test_late_commits_are_resent_within_the_overlap(self):
+        token = self.sync()["token"]
+        # An entry whose transaction committed after the token was issued.
+        ChangeLogEntry.objects.filter(collection="doctornote").update(changed_at=timezone.now())
+        with self.settings(SYNC_OVERLAP_SECONDS=30):
+            self.assertEqual(self.ids(self.sync(token), "notes"), ([self.note.pk], []))
+
+    def test_overlap_is_paged(self):
+        token = self.sync()["token"]
+        # All four entries committed late, plus one new entry.
+        ChangeLogEntry.objects.update(changed_at=timezone.now())
+        created = DoseLog.objects.create(medication=self.med, taken_at=timezone.now())
+        seen, pages = [], 0
+        with self.settings(SYNC_OVERLAP_SECONDS=30, SYNC_PAGE_SIZE=3):
+            while True:
+                data = self.sync(token)
+                seen += self.ids(data, "logs")[0] + self.ids(data, "notes")[0]
+                token, pages = data["token"], pages + 1
+                if not data["has_more"]:
+                    break
+        self.assertEqual(pages, 2)
+        self.assertEqual(sorted(seen), sorted([log.pk for log in self.logs] + [created.pk, self.note.pk]))
+
+    def test_hidden_medications_rows_are_deleted(self):
+        token = self.sync()["token"]
+        other = Medication.objects.create(name="Other", dosage_mg=5, prescribed_per_day=1)
+        kept = DoseLog.objects.create(medication=other, taken_at=timezone.now())
+        DoseLog.objects.filter(pk=self.logs[0].pk).update(was_taken=False)
+        with self.captureOnCommitCallbacks():
+            self.med.hide()
+        data = self.sync(token)
+        self.assertEqual(self.ids(data, "logs"), ([kept.pk], [self.logs[0].pk]))
+        self.assertEqual(self.sync()["notes"]["changed"], [])
+
+    def test_invalid_token(self):
+        unsigned = base64.urlsafe_b64encode(b'{"s":0,"t":0}').decode()
+        other_salt = signing.dumps({"s": 0, "t": 0})
+        invalid = (encode_token(-1, timezone.now()), encode_token(1, timezone.now(), resent=2))
+        for token in ("not-a-token", unsigned, other_salt, *invalid):
+            response = self.client.get(self.url, {"since": token})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("error", response.data)
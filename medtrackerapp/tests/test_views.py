@@ -1,11 +1,25 @@
 from rest_framework.test import APITestCase
-from medtrackerapp.models import Medication, DoseLog
+from django.test import override_settings
+from medtrackerapp.models import Medication, DoseLog, DoctorNote
 from django.urls import reverse
 from rest_framework import status
 from unittest.mock import patch
 from datetime import date, timedelta
 from django.utils import timezone
-from django.db import IntegrityError
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from rest_framework.renderers import JSONRenderer
+from medtrackerapp.renderers import ORJSONRenderer
+from medtrackerapp.serializers import DoseLogSerializer, DoctorNoteSerializer
+from decimal import Decimal
+from django.core.management.base import CommandError
+from io import StringIO
+import csv
+import json
+import os
+import tempfile
+import zoneinfo
 
 
 class MedicationViewTests(APITestCase):
@@ -20,6 +34,29 @@ class MedicationViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
 
+    def test_list_medications_query_count_is_constant(self):
+        now = timezone.now()
+        for i in range(10):
+            med = Medication.objects.create(name=f"Med{i}", dosage_mg=10, prescribed_per_day=1)
+            DoseLog.objects.create(medication=med, taken_at=now - timedelta(hours=1))
+            DoseLog.objects.create(medication=med, taken_at=now - timedelta(hours=2), was_taken=False)
+
+        # Version stamps, then the medications.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 11)
+        adherence = {item["name"]: item["adherence"] for item in response.data}
+        self.assertEqual(adherence["Aspirin"], 0.0)
+        self.assertEqual(adherence["Med3"], 50.0)
+
+    def test_retrieve_medication_query_count(self):
+        DoseLog.objects.create(medication=self.med, taken_at=timezone.now() - timedelta(hours=1))
+        with self.assertNumQueries(2):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["adherence"], 100.0)
+
     def test_create_medication_valid(self):
         data = {"name": "Ibuprofen", "dosage_mg": 200, "prescribed_per_day": 3}
         response = self.client.post(self.list_url, data, format="json")
@@ -44,6 +81,16 @@ class MedicationViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Medication.objects.count(), 0)
 
+    @override_settings(MEDICATION_PURGE_ASYNC=False)
+    def test_delete_medication_purges_history_after_commit(self):
+        DoseLog.objects.create(medication=self.med, taken_at=timezone.now() - timedelta(hours=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(self.detail_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(Medication.all_objects.exists())
+        self.assertFalse(DoseLog.objects.exists())
+
     def test_delete_non_existent_medication(self):
         non_existent_url = reverse("medication-detail", kwargs={"pk": 999})
         response = self.client.delete(non_existent_url)
@@ -128,10 +175,452 @@ class DoseLogViewTests(APITestCase):
         response = self.client.get(f"{filter_url}?start={start_date}&end={end_date}")
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_filter_doselogs_by_date_day_boundaries(self):
+        edges = [
+            timezone.make_aware(timezone.datetime(2025, 11, 20, 23, 59, 59, 999999)),
+            timezone.make_aware(timezone.datetime(2025, 11, 21, 0, 0)),
+            timezone.make_aware(timezone.datetime(2025, 11, 22, 23, 59, 59, 999999)),
+            timezone.make_aware(timezone.datetime(2025, 11, 23, 0, 0)),
+        ]
+        for taken_at in edges:
+            DoseLog.objects.create(medication=self.med, taken_at=taken_at)
+
+        filter_url = reverse("doselog-filter-by-date")
+        response = self.client.get(f"{filter_url}?start=2025-11-21&end=2025-11-22")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_filter_and_export_accept_extreme_dates(self):
+        DoseLog.objects.create(medication=self.med, taken_at=timezone.now() - timedelta(hours=1))
+        query = "?start=0001-01-01&end=9999-12-31"
+        response = self.client.get(reverse("doselog-filter-by-date") + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        response = self.client.get(reverse("doselog-export") + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(list(response.streaming_content)), 1)
+
+    def test_hidden_medications_rows_are_not_listed(self):
+        hidden = Medication.objects.create(name="Hidden", dosage_mg=10, prescribed_per_day=1)
+        kept = DoseLog.objects.create(medication=self.med, taken_at=timezone.now() - timedelta(hours=1))
+        DoseLog.objects.create(medication=hidden, taken_at=timezone.now() - timedelta(hours=1))
+        DoctorNote.objects.create(medication=hidden, note="Hidden note", created_at=timezone.now().date())
+        etag = self.client.get(self.list_url)["ETag"]
+        hidden.hide()
+
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["id"] for item in response.data["results"]], [kept.pk])
+        response = self.client.get(reverse("doselog-filter-by-date") + "?start=0001-01-01&end=9999-12-31")
+        self.assertEqual([item["id"] for item in response.data["results"]], [kept.pk])
+        response = self.client.get(reverse("doselog-export"))
+        self.assertEqual([json.loads(line)["id"] for line in response.streaming_content], [kept.pk])
+        self.assertEqual(self.client.get(reverse("doctornote-list")).data, [])
 
     def test_filter_doselogs_by_date_invalid_params(self):
         filter_url = reverse("doselog-filter-by-date")
         response = self.client.get(f"{filter_url}?start=2025-01-01")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertIn("error", response.data)
\ No newline at end of file
+        self.assertIn("error", response.data)
+
+    def test_filter_doselogs_walks_cursor_pages(self):
+        base = timezone.make_aware(timezone.datetime(2025, 11, 20, 8))
+        created = [
+            DoseLog.objects.create(medication=self.med, taken_at=base + timedelta(hours=i // 2)).pk
+            for i in range(7)
+        ]
+        url = reverse("doselog-filter-by-date") + "?start=2025-11-20&end=2025-11-20&page_size=3"
+
+        seen, pages = [], []
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            seen.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+        self.assertEqual(seen, created)
+        self.assertEqual([len(page["results"]) for page in pages], [3, 3, 1])
+
+        response = self.client.get(pages[-1]["previous"])
+        self.assertEqual([item["id"] for item in response.data["results"]], created[3:6])
+
+    def test_list_doselogs_is_paginated_newest_first(self):
+        now = timezone.now()
+        for hours in (3, 1, 2):
+            DoseLog.objects.create(medication=self.med, taken_at=now - timedelta(hours=hours))
+        response = self.client.get(f"{self.list_url}?page_size=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["previous"])
+        first = response.data["results"]
+        second = self.client.get(response.data["next"]).data["results"]
+        times = [item["taken_at"] for item in first + second]
+        self.assertEqual(times, sorted(times, reverse=True))
+        self.assertEqual(len(times), 3)
+
+    def test_list_doselogs_invalid_cursor(self):
+        response = self.client.get(f"{self.list_url}?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_export_streams_ndjson(self):
+        other = Medication.objects.create(name="Other", dosage_mg=5, prescribed_per_day=1)
+        first = DoseLog.objects.create(medication=self.med, taken_at=timezone.make_aware(timezone.datetime(2025, 11, 21, 10)))
+        DoseLog.objects.create(medication=self.med, taken_at=timezone.make_aware(timezone.datetime(2025, 11, 25, 10)))
+        DoseLog.objects.create(medication=other, taken_at=timezone.make_aware(timezone.datetime(2025, 11, 21, 11)))
+
+        url = reverse("doselog-export")
+        response = self.client.get(f"{url}?start=2025-11-20&end=2025-11-22&medication={self.med.pk}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        detail = self.client.get(reverse("doselog-detail", kwargs={"pk": first.pk}))
+        self.assertEqual(json.loads(lines[0]), detail.json())
+
+    def test_export_streams_csv(self):
+        for day in (20, 21):
+            DoseLog.objects.create(
+                medication=self.med, taken_at=timezone.make_aware(timezone.datetime(2025, 11, day, 10)), was_taken=False
+            )
+        response = self.client.get(reverse("doselog-export") + "?format=csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.reader(b"".join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ["id", "medication", "taken_at", "was_taken"])
+        self.assertEqual([row[2] for row in rows[1:]], ["2025-11-20T10:00:00Z", "2025-11-21T10:00:00Z"])
+        self.assertEqual({row[3] for row in rows[1:]}, {"False"})
+
+    def test_export_falls_back_to_ndjson_for_other_accept_headers(self):
+        DoseLog.objects.create(medication=self.med, taken_at=timezone.now() - timedelta(hours=1))
+        url = reverse("doselog-export")
+        response = self.client.get(url, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        response = self.client.get(f"{url}?format=csv", HTTP_ACCEPT="application/json")
+        self.assertEqual(response["Content-Type"], "text/csv")
+        response = self.client.get(url, HTTP_ACCEPT="text/csv")
+        self.assertEqual(response["Content-Type"], "text/csv")
+
+    def test_export_invalid_filters(self):
+        url = reverse("doselog-export")
+        response = self.client.get(f"{url}?start=2025-11-20")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", json.loads(response.content))
+        for medication in ("abc", "0", "99999999999999999999"):
+            response = self.client.get(f"{url}?medication={medication}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_reports_out_of_range_medication_ids(self):
+        taken_at = (timezone.now() - timedelta(hours=1)).isoformat()
+        payload = [
+            {"medication": 10 ** 30, "taken_at": taken_at},
+            {"medication": -1, "taken_at": taken_at},
+            {"medication": self.med.pk, "taken_at": taken_at},
+        ]
+        response = self.client.post(reverse("doselog-bulk-create"), payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [0, 1])
+        self.assertTrue(all("medication" in error["errors"] for error in response.data["errors"]))
+        self.assertEqual(len(response.data["created"]), 1)
+
+    def test_bulk_create_reports_row_errors(self):
+        day = timezone.make_aware(timezone.datetime(2025, 11, 20, 8))
+        payload = [
+            {"medication": self.med.pk, "taken_at": day.isoformat(), "was_taken": True},
+            {"medication": 999, "taken_at": day.isoformat()},
+            {"medication": self.med.pk, "taken_at": (timezone.now() + timedelta(days=1)).isoformat()},
+            "not an object",
+            {"medication": self.med.pk, "taken_at": (day + timedelta(hours=1)).isoformat(), "was_taken": False},
+        ]
+        url = reverse("doselog-bulk-create")
+        # One medication lookup, then a transaction holding two batched
+        # inserts, the version bump, one change log insert and the counter
+        # and rollup updates.
+        with self.assertNumQueries(11):
+            response = self.client.post(f"{url}?batch_size=1", payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([error["index"] for error in response.data["errors"]], [1, 2, 3])
+        self.assertIn("medication", response.data["errors"][0]["errors"])
+        self.assertIn("taken_at", response.data["errors"][1]["errors"])
+        self.assertEqual(len(response.data["created"]), 2)
+        self.assertTrue(all(item["id"] for item in response.data["created"]))
+        self.assertEqual(DoseLog.objects.count(), 2)
+        self.assertEqual(self.med.adherence_rate(), 50.0)
+
+    def test_bulk_create_accepts_ndjson(self):
+        now = timezone.now()
+        body = "\n".join(
+            json.dumps({"medication": self.med.pk, "taken_at": (now - timedelta(hours=i)).isoformat()})
+            for i in range(1, 4)
+        ) + "\n"
+        response = self.client.post(reverse("doselog-bulk-create"), body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["errors"], [])
+        self.assertEqual(DoseLog.objects.count(), 3)
+
+    def test_bulk_create_rejects_non_list(self):
+        response = self.client.post(reverse("doselog-bulk-create"), {"medication": self.med.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("error", response.data)
+
+
+@override_settings(DRUG_INFO_ENRICH_ON_WRITE=False)
+class ConditionalGetTests(APITestCase):
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.med = Medication.objects.create(name="Aspirin", dosage_mg=100, prescribed_per_day=2)
+            DoseLog.objects.create(medication=self.med, taken_at=timezone.now() - timedelta(hours=1))
+
+    def assertNotModified(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", response)
+        # Only the version stamps are read.
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached["ETag"], response["ETag"])
+        return response["ETag"]
+
+    def test_medication_list_and_detail_are_not_modified(self):
+        self.assertNotModified(reverse("medication-list"))
+        self.assertNotModified(reverse("medication-detail", kwargs={"pk": self.med.pk}))
+
+    def test_dose_log_write_invalidates_medications(self):
+        url = reverse("medication-list")
+        etag = self.assertNotModified(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            DoseLog.objects.create(medication=self.med, taken_at=timezone.now(), was_taken=False)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data[0]["adherence"], 50.0)
+
+    def test_dose_log_endpoints_are_not_modified_until_bulk_update(self):
+        list_url = reverse("doselog-list")
+        filter_url = reverse("doselog-filter-by-date") + f"?start={date.today()}&end={date.today()}"
+        etags = [self.assertNotModified(list_url), self.assertNotModified(filter_url)]
+        self.assertNotEqual(*etags)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DoseLog.objects.filter(medication=self.med).update(was_taken=False)
+        response = self.client.get(list_url, HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_notes_follow_medication_renames(self):
+        url = reverse("doctornote-list")
+        etag = self.assertNotModified(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Medication.objects.filter(pk=self.med.pk).update(name="Aspirin Forte")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_rolled_back_writes_do_not_bump_versions(self):
+        url = reverse("medication-list")
+        etag = self.assertNotModified(url)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Medication.objects.create(name="Ibuprofen", dosage_mg=200, prescribed_per_day=1)
+            Medication.objects.create(name="Broken", dosage_mg=None, prescribed_per_day=1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_stored_drug_info_invalidates_medications(self):
+        url = reverse("medication-list")
+        etag = self.assertNotModified(url)
+        info = {"brand_name": "Aspirin", "manufacturer": "Bayer", "substance": "ASPIRIN"}
+        with patch("medtrackerapp.models.DrugInfoService.fetch_external_info", return_value=info):
+            self.client.get(reverse("medication-get-external-info", kwargs={"pk": self.med.pk}))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]["drug_info"], info)
+
+        # Fetching the same answer again changes nothing that is served.
+        self.assertTrue(Medication.objects.get(pk=self.med.pk).store_info(info))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_responses_vary_on_accept(self):
+        response = self.client.get(reverse("medication-list"))
+        self.assertIn("Accept", response["Vary"])
+
+
+class BenchCommandTests(APITestCase):
+
+    def test_bench_reports_every_endpoint_and_rolls_back(self):
+        args = ["--medications", "5", "--logs-per-medication", "4", "--notes-per-medication", "1", "--requests", "3"]
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.json")
+            out = StringIO()
+            call_command("bench", *args, "--output", baseline, stdout=out)
+            report = json.loads(out.getvalue())
+            self.assertEqual(Medication.objects.count(), 0)
+            self.assertEqual(set(report["endpoints"]), {
+                "medication-list", "medication-detail", "medication-expected-doses",
+                "doselog-list", "doselog-filter", "note-search", "medication-info",
+            })
+            self.assertEqual(report["endpoints"]["medication-detail"]["requests"], 3)
+
+            with open(baseline) as handle:
+                saved = json.load(handle)
+            for result in saved["endpoints"].values():
+                result["queries_max"] = 0
+            with open(baseline, "w") as handle:
+                json.dump(saved, handle)
+            with self.assertRaises(CommandError):
+                call_command("bench", *args, "--baseline", baseline, stdout=StringIO())
+
+    def test_bench_refuses_a_non_test_database(self):
+        with patch.dict(connection.settings_dict, {"NAME": "medtracker_db"}):
+            with self.assertRaisesMessage(CommandError, "--allow-existing-db"):
+                call_command("bench", stdout=StringIO())
+        self.assertEqual(Medication.objects.count(), 0)
+
+
+class SparseFieldsTests(APITestCase):
+
+    def setUp(self):
+        self.med = Medication.objects.create(name="Aspirin", dosage_mg=100, prescribed_per_day=2)
+        DoseLog.objects.create(medication=self.med, taken_at=timezone.now() - timedelta(hours=1))
+
+    def test_medication_fields_skip_adherence(self):
+        url = reverse("medication-list") + "?fields=id,name"
+        with patch.object(Medication, "adherence_rate") as adherence_rate, \
+                CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{"id": self.med.pk, "name": "Aspirin"}])
+        adherence_rate.assert_not_called()
+        sql = captured.captured_queries[-1]["sql"]
+        self.assertNotIn("adherencecounter", sql)
+        self.assertNotIn("dosage_mg", sql)
+
+    def test_medication_omit_and_detail(self):
+        url = reverse("medication-detail", kwargs={"pk": self.med.pk}) + "?omit=dosage_mg,prescribed_per_day"
+        response = self.client.get(url)
+        self.assertEqual(response.data, {"id": self.med.pk, "name": "Aspirin", "adherence": 100.0, "drug_info": None})
+
+    def test_adherence_only_loads_its_counter_in_one_query(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("medication-list") + "?fields=adherence")
+        self.assertEqual(response.data, [{"adherence": 100.0}])
+
+    def test_dose_log_filter_fields_keep_pagination(self):
+        for hours in (2, 3):
+            DoseLog.objects.create(medication=self.med, taken_at=timezone.now() - timedelta(hours=hours))
+        today = timezone.localdate()
+        url = reverse("doselog-filter-by-date") + f"?start={today - timedelta(days=1)}&end={today}&fields=id&page_size=2"
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(list(response.data["results"][0]), ["id"])
+        response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_note_fields(self):
+        DoctorNote.objects.create(medication=self.med, note="Take with food", created_at=date.today())
+        response = self.client.get(reverse("doctornote-list") + "?fields=note&search=Asp")
+        self.assertEqual(response.data, [{"note": "Take with food"}])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(reverse("medication-list") + "?fields=id,secret")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Unknown field(s) in 'fields': secret."})
+
+    def test_empty_field_selection_is_rejected(self):
+        for query in ("?fields=", "?fields=,", "?omit=id,name,dosage_mg,prescribed_per_day,adherence,drug_info"):
+            response = self.client.get(reverse("medication-list") + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, query)
+            self.assertIn("error", response.data)
+
+    def test_fields_are_ignored_on_writes(self):
+        response = self.client.post(
+            reverse("medication-list") + "?fields=id",
+            {"name": "Ibuprofen", "dosage_mg": 200, "prescribed_per_day": 1},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("dosage_mg", response.data)
+
+
+class FastReadPathTests(APITestCase):
+
+    def setUp(self):
+        self.med = Medication.objects.create(name="Aspirin", dosage_mg=100, prescribed_per_day=2)
+        base = timezone.make_aware(timezone.datetime(2025, 11, 20, 8, 30, 15, 123456))
+        for i in range(5):
+            DoseLog.objects.create(medication=self.med, taken_at=base + timedelta(hours=i), was_taken=i % 2 == 0)
+        DoctorNote.objects.create(medication=self.med, note="Zażywać po jedzeniu\u2028\u2029 \"cytat\"", created_at=date(2025, 11, 20))
+        DoctorNote.objects.create(medication=self.med, note="Second", created_at=date(2025, 11, 21))
+
+    def assertSameBytes(self, url):
+        with self.settings(FAST_READ_PATH=False):
+            expected = self.client.get(url)
+        with self.settings(FAST_READ_PATH=True), \
+                patch.object(DoseLogSerializer, "to_representation") as log_serializer, \
+                patch.object(DoctorNoteSerializer, "to_representation") as note_serializer:
+            fast = self.client.get(url)
+        log_serializer.assert_not_called()
+        note_serializer.assert_not_called()
+        self.assertEqual(fast.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content, expected.content)
+
+    def test_dose_log_list_and_filter_are_byte_identical(self):
+        self.assertSameBytes(reverse("doselog-list"))
+        self.assertSameBytes(reverse("doselog-list") + "?page_size=2")
+        filter_url = reverse("doselog-filter-by-date") + "?start=2025-11-20&end=2025-11-20&page_size=2"
+        self.assertSameBytes(filter_url)
+        self.assertSameBytes(filter_url + "&fields=taken_at")
+        with timezone.override(zoneinfo.ZoneInfo("America/New_York")):
+            self.assertSameBytes(filter_url)
+
+    def test_note_list_and_search_are_byte_identical(self):
+        self.assertSameBytes(reverse("doctornote-list"))
+        self.assertSameBytes(reverse("doctornote-list") + "?search=Asp&omit=note")
+
+    def test_fast_path_walks_cursor_pages(self):
+        url = reverse("doselog-list") + "?page_size=2"
+        seen = []
+        with self.settings(FAST_READ_PATH=True):
+            while url:
+                response = self.client.get(url)
+                seen.extend(item["id"] for item in response.json()["results"])
+                url = response.json()["next"]
+        self.assertEqual(seen, list(DoseLog.objects.order_by("-taken_at", "-id").values_list("id", flat=True)))
+
+    def test_orjson_renderer_matches_json_renderer(self):
+        data = {
+            "text": "ąę\u2028\u2029 \"q\"",
+            "number": 12.5,
+            "decimal": Decimal("1.10"),
+            "when": timezone.make_aware(timezone.datetime(2025, 1, 2, 3, 4, 5, 678000), zoneinfo.ZoneInfo("UTC")),
+            "day": date(2025, 1, 2),
+            "nested": [{"a": None, "b": True}],
+            1: "int key",
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(
+            ORJSONRenderer().render(data, "application/json; indent=2"),
+            JSONRenderer().render(data, "application/json; indent=2"),
+        )
+
+    def test_orjson_renderer_differences(self):
+        data = {"small": 1e-05, "large": 1e16}
+        self.assertEqual(ORJSONRenderer().render(data), b'{"small":0.00001,"large":1e16}')
+        self.assertEqual(JSONRenderer().render(data), b'{"small":1e-05,"large":1e+16}')
+        self.assertEqual(json.loads(ORJSONRenderer().render(data)), json.loads(JSONRenderer().render(data)))
+
+        for value in (float("nan"), float("inf")):
+            self.assertEqual(ORJSONRenderer().render({"value": value}), b'{"value":null}')
+            with self.assertRaises(ValueError):
+                JSONRenderer().render({"value": value})
+
+    def test_orjson_parser_errors(self):
+        response = self.client.post(reverse("medication-list"), data=b'{"name": NaN}', content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("JSON parse error", response.data["detail"])
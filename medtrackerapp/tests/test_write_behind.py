@@ -0,0 +1,126 @@
+from rest_framework.test import APITransactionTestCase
+from rest_framework import status
+from django.db import IntegrityError
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from concurrent.futures import Future
+from unittest.mock import patch
+import threading
+from medtrackerapp import metrics, write_behind
+from medtrackerapp.models import AdherenceCounter, ChangeLogEntry, DoseLog, Medication
+from medtrackerapp.write_behind import DoseLogBatcher, QueueFull
+
+
+@override_settings(DRUG_INFO_ENRICH_ON_WRITE=False)
+class DoseLogBatcherTests(TransactionTestCase):
+
+    def setUp(self):
+        self.med = Medication.objects.create(name="Aspirin", dosage_mg=100, prescribed_per_day=2)
+        metrics.reset()
+
+    def log(self, minutes=1, medication_id=None):
+        return DoseLog(
+            medication_id=medication_id or self.med.pk, taken_at=timezone.now() - timedelta(minutes=minutes),
+        )
+
+    def test_concurrent_writers_share_batches(self):
+        batcher = DoseLogBatcher(batch_size=50, max_delay=0.05).start()
+        self.addCleanup(batcher.stop)
+        futures, lock = [], threading.Lock()
+
+        def writer():
+            mine = [batcher.submit(self.log(minutes)) for minutes in range(1, 26)]
+            for future in mine:
+                future.result(timeout=10)
+            with lock:
+                futures.extend(mine)
+
+        threads = [threading.Thread(target=writer) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(futures), 200)
+        self.assertEqual(len({future.result().pk for future in futures}), 200)
+        self.assertEqual(DoseLog.objects.count(), 200)
+        self.assertEqual(AdherenceCounter.objects.get(medication=self.med).total, 200)
+        self.assertEqual(ChangeLogEntry.objects.filter(collection="doselog").count(), 200)
+        _, batches, rows = metrics.WRITE_BEHIND_BATCH_ROWS._values[()]
+        self.assertEqual(rows, 200)
+        self.assertLess(batches, 200)
+
+    def test_bad_row_only_fails_its_own_future(self):
+        batcher = DoseLogBatcher(batch_size=10, max_delay=0.05)
+        good, bad = batcher.submit(self.log()), batcher.submit(self.log(medication_id=999))
+        self.addCleanup(batcher.stop)
+        with self.assertLogs("medtrackerapp.write_behind", "WARNING"):
+            batcher.start()
+            self.assertIsNotNone(good.result(timeout=10).pk)
+            with self.assertRaises(IntegrityError):
+                bad.result(timeout=10)
+        self.assertEqual(list(DoseLog.objects.values_list("medication_id", flat=True)), [self.med.pk])
+
+    def test_full_buffer_pushes_back(self):
+        batcher = DoseLogBatcher(max_queue=2)
+        batcher.submit(self.log())
+        batcher.submit(self.log())
+        with self.assertRaises(QueueFull):
+            batcher.submit(self.log())
+
+        # Stopping drains what was accepted.
+        batcher.start().stop(timeout=10)
+        self.assertEqual(DoseLog.objects.count(), 2)
+
+
+@override_settings(DOSELOG_WRITE_BEHIND=True, DRUG_INFO_ENRICH_ON_WRITE=False)
+class WriteBehindViewTests(APITransactionTestCase):
+
+    def setUp(self):
+        self.med = Medication.objects.create(name="Aspirin", dosage_mg=100, prescribed_per_day=2)
+        self.url = reverse("doselog-list")
+        self.payload = {"medication": self.med.pk, "taken_at": (timezone.now() - timedelta(hours=1)).isoformat()}
+        self.addCleanup(write_behind.shutdown)
+
+    def test_create_is_acknowledged_after_commit(self):
+        response = self.client.post(self.url, self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(DoseLog.objects.filter(pk=response.data["id"], medication=self.med).exists())
+
+        response = self.client.post(self.url, {"medication": self.med.pk}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_full_buffer_returns_503(self):
+        full = DoseLogBatcher(max_queue=1)
+        full.submit(DoseLog(medication=self.med, taken_at=timezone.now()))
+        with patch.object(write_behind, "get_batcher", return_value=full):
+            response = self.client.post(self.url, self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertIn("error", response.data)
+        self.assertFalse(DoseLog.objects.exists())
+
+    def test_queued_log_is_withdrawn_after_the_timeout(self):
+        idle = DoseLogBatcher()
+        with patch.object(write_behind, "get_batcher", return_value=idle), \
+                self.settings(DOSELOG_WRITE_BEHIND_TIMEOUT=0.01):
+            response = self.client.post(self.url, self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn("error", response.data)
+
+        # The withdrawn log is skipped when the batcher gets to it.
+        idle.start().stop(timeout=10)
+        self.assertFalse(DoseLog.objects.exists())
+
+    def test_committing_log_is_waited_for_after_the_timeout(self):
+        log = DoseLog.objects.create(medication=self.med, taken_at=timezone.now() - timedelta(hours=1))
+        future = Future()
+        future.set_running_or_notify_cancel()
+        threading.Timer(0.1, future.set_result, [log]).start()
+        with patch.object(DoseLogBatcher, "submit", return_value=future), \
+                self.settings(DOSELOG_WRITE_BEHIND_TIMEOUT=0.01):
+            response = self.client.post(self.url, self.payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["id"], log.pk)
@@ -1,13 +1,27 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MedicationViewSet, DoseLogViewSet, DoctorNoteViewSet
+from .views import (
+    MedicationViewSet, DoseLogViewSet, DoctorNoteViewSet, AnalyticsViewSet, MissedDoseAlertViewSet, SyncViewSet,
+    medication_info, metrics_view,
+)
 
 router = DefaultRouter()
 router.register("medications", MedicationViewSet, basename="medication")
 router.register("logs", DoseLogViewSet, basename="doselog")
 
 router.register("notes", DoctorNoteViewSet, basename="doctornote")
+router.register("alerts", MissedDoseAlertViewSet, basename="alert")
+router.register("sync", SyncViewSet, basename="sync")
+router.register("analytics", AnalyticsViewSet, basename="analytics")
 
 urlpatterns = [
+    path("metrics/", metrics_view, name="metrics"),
+]
+
+if settings.DRUG_INFO_ASYNC_VIEW:
+    urlpatterns.append(path("medications/<int:pk>/info/", medication_info, name="medication-info-async"))
+
+urlpatterns += [
     path("", include(router.urls)),
 ]
\ No newline at end of file
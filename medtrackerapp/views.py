@@ -1,15 +1,211 @@
-from rest_framework import viewsets, status
+import hashlib
+import zoneinfo
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import BigIntegerField
+from django.http import HttpResponse, StreamingHttpResponse, JsonResponse, HttpResponseNotAllowed
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
 from rest_framework.response import Response
 from django.utils.dateparse import parse_date
-from .models import Medication, DoseLog, DoctorNote
-from .serializers import MedicationSerializer, DoseLogSerializer, DoctorNoteSerializer
+from .models import Medication, DoseLog, DoctorNote, MissedDoseAlert, CollectionVersion, day_range
+from .serializers import (
+    MedicationSerializer, DoseLogSerializer, DoseLogBulkItemSerializer, DoctorNoteSerializer, MissedDoseAlertSerializer,
+)
+from .pagination import KeysetPagination, SearchResultsPagination
+from .search import search_notes
+from .sync import InvalidToken, changes_since
+from .renderers import NDJSONRenderer, CSVRenderer
+from .negotiation import FallbackContentNegotiation
+from .parsers import NDJSONParser, ORJSONParser
+from .services import DrugInfoService, AsyncDrugInfoService
+from .analytics import BUCKETS, adherence_series, bucket_count
+from . import metrics, write_behind
 from rest_framework.filters import SearchFilter
 
 
-class MedicationViewSet(viewsets.ModelViewSet):
+def parse_id(value):
+    """
+    Parse an id query parameter, raising ValueError for anything that is
+    not an integer in the range of the id columns.
+    """
+    pk = int(value)
+    if not 1 <= pk <= BigIntegerField.MAX_BIGINT:
+        raise ValueError(value)
+    return pk
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified support for list and detail endpoints.
+
+    Validators are derived from the CollectionVersion stamps named in
+    version_collections (one query, no rows loaded), so an unchanged
+    collection is answered with 304 before the queryset or serializers
+    are touched.
+    """
+    version_collections = ()
+
+    def get_validators(self, request):
+        stamps = CollectionVersion.stamps(self.version_collections)
+        key = "|".join([
+            request.get_full_path(),
+            request.META.get("HTTP_ACCEPT", ""),
+            *(f"{name}:{stamps[name][0]}" for name in self.version_collections),
+        ])
+        etag = '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+        updated = [updated_at for _, updated_at in stamps.values() if updated_at is not None]
+        last_modified = int(max(updated).timestamp()) if updated else None
+        return etag, last_modified
+
+    def conditional(self, request, handler, *args, **kwargs):
+        etag, last_modified = self.get_validators(request)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            if last_modified is not None:
+                response["Last-Modified"] = http_date(last_modified)
+            # The ETag covers the Accept header, so caches must too.
+            patch_vary_headers(response, ["Accept"])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, super().retrieve, *args, **kwargs)
+
+
+class SparseFieldsMixin:
+    """
+    ?fields=a,b and ?omit=c on read actions. The serializer only builds the
+    requested fields and get_queryset() only loads their columns.
+    """
+    sparse_actions = ("list", "retrieve")
+
+    def get_sparse_fields(self):
+        """
+        Return the set of requested field names, or None for all fields.
+        """
+        if hasattr(self, "_sparse_fields"):
+            return self._sparse_fields
+        self._sparse_fields = None
+        params = self.request.query_params if self.request is not None else {}
+        if self.action not in self.sparse_actions or not ("fields" in params or "omit" in params):
+            return None
+
+        available = list(self.get_serializer_class()().fields)
+        fields = set(available)
+        for param in ("fields", "omit"):
+            if param not in params:
+                continue
+            names = {name.strip() for name in params[param].split(",") if name.strip()}
+            unknown = sorted(names - set(available))
+            if unknown:
+                raise ParseError({"error": f"Unknown field(s) in '{param}': {', '.join(unknown)}."})
+            fields = fields & names if param == "fields" else fields - names
+        if not fields:
+            raise ParseError({"error": "'fields' and 'omit' must leave at least one field."})
+        self._sparse_fields = fields
+        return fields
+
+    def get_sparse_columns(self, fields):
+        """
+        Model columns needed to serialize fields.
+        """
+        concrete = {field.name for field in self.queryset.model._meta.concrete_fields}
+        return [name for name in fields if name in concrete]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            queryset = queryset.only(*self.get_sparse_columns(fields))
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["fields"] = self.get_sparse_fields()
+        return context
+
+
+class FastListMixin:
+    """
+    Opt-in (FAST_READ_PATH) list serialization that skips the serializer:
+    rows come from values() and are converted with the same field
+    to_representation() calls, so the JSON output is identical.
+
+    fast_fields maps each serializer field, in serializer order, to
+    (column, serializer field or None for values used as-is).
+    """
+    fast_fields = {}
+
+    def use_fast_path(self):
+        return settings.FAST_READ_PATH and bool(self.fast_fields)
+
+    def fast_values(self, queryset):
+        fields = self.get_sparse_fields()
+        columns = [column for name, (column, _) in self.fast_fields.items() if fields is None or name in fields]
+        if isinstance(self.paginator, KeysetPagination):
+            columns += [name.lstrip("-") for name in self.get_keyset_ordering()]
+        return queryset.values(*dict.fromkeys(columns))
+
+    def fast_rows(self, rows):
+        fields = self.get_sparse_fields()
+        plan = [
+            (name, column, field.to_representation if field is not None else None)
+            for name, (column, field) in self.fast_fields.items()
+            if fields is None or name in fields
+        ]
+        return [
+            {name: row[column] if convert is None or row[column] is None else convert(row[column])
+             for name, column, convert in plan}
+            for row in rows
+        ]
+
+    def fast_response(self, queryset):
+        page = self.paginate_queryset(self.fast_values(queryset))
+        if page is not None:
+            return self.get_paginated_response(self.fast_rows(page))
+        return Response(self.fast_rows(self.fast_values(queryset)))
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_path():
+            return super().list(request, *args, **kwargs)
+        return self.fast_response(self.filter_queryset(self.get_queryset()))
+
+
+class MedicationViewSet(SparseFieldsMixin, ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Medication.objects.all()
     serializer_class = MedicationSerializer
+    # Adherence is computed from the dose logs.
+    version_collections = ("medication", "doselog")
+
+    def get_queryset(self):
+        fields = self.get_sparse_fields()
+        if fields is not None and "adherence" not in fields:
+            return super().get_queryset()
+        return super().get_queryset().select_related("adherence_counter")
+
+    def perform_destroy(self, instance):
+        # Dose logs and notes are purged in the background.
+        instance.hide()
+
+    def get_sparse_columns(self, fields):
+        columns = super().get_sparse_columns(fields)
+        if "adherence" in fields:
+            columns += ["adherence_counter__taken", "adherence_counter__total"]
+        if "drug_info" in fields:
+            columns += ["info_brand_name", "info_manufacturer", "info_substance", "info_error", "info_fetched_at"]
+        return columns
 
     @action(detail=True, methods=["get"], url_path="info")
     def get_external_info(self, request, pk=None):
@@ -20,6 +216,39 @@ class MedicationViewSet(viewsets.ModelViewSet):
             return Response(data, status=status.HTTP_502_BAD_GATEWAY)
         return Response(data)
 
+    @action(detail=False, methods=["get"], url_path="info")
+    def batch_external_info(self, request):
+        """
+        External drug info for several medications at once
+        (?ids=1,2,3), keyed by medication id. Each item is either the
+        drug info or an {"error": ...} object. Stored info is served as is;
+        only the remaining medications are looked up.
+        """
+        ids_param = request.query_params.get("ids")
+        if not ids_param:
+            return Response({"error": "The 'ids' query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = list(dict.fromkeys(parse_id(value) for value in ids_param.split(",") if value.strip()))
+        except ValueError:
+            return Response({"error": "Invalid value for 'ids'. Must be a comma-separated list of positive integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({"error": "The 'ids' query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.DRUG_INFO_BATCH_MAX_IDS:
+            return Response({"error": f"At most {settings.DRUG_INFO_BATCH_MAX_IDS} ids can be requested at once."}, status=status.HTTP_400_BAD_REQUEST)
+
+        medications = {medication.pk: medication for medication in Medication.objects.filter(pk__in=ids)}
+        results = {pk: medication.stored_info(fresh=True) for pk, medication in medications.items()}
+        missing = [medication for pk, medication in medications.items() if results[pk] is None]
+        if missing:
+            info = DrugInfoService().fetch_many([medication.name for medication in missing])
+            for medication in missing:
+                results[medication.pk] = info[medication.name]
+                medication.store_info(info[medication.name])
+        return Response({
+            str(pk): results[pk] if pk in results else {"error": "Medication not found."}
+            for pk in ids
+        })
+
     @action(detail=True, methods=["get"], url_path="expected-doses")
     def expected_doses(self, request, pk=None):
         days_param = request.query_params.get("days")
@@ -34,38 +263,396 @@ class MedicationViewSet(viewsets.ModelViewSet):
             return Response({"error": "Invalid value for 'days'. Must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class DoseLogViewSet(viewsets.ModelViewSet):
-    queryset = DoseLog.objects.all()
+async def medication_info(request, pk):
+    """
+    Async variant of MedicationViewSet.get_external_info for ASGI servers,
+    enabled with DRUG_INFO_ASYNC_VIEW. The OpenFDA call does not hold a
+    worker thread, and concurrent requests for the same drug share one
+    upstream call.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    try:
+        medication = await Medication.objects.aget(pk=pk)
+    except Medication.DoesNotExist:
+        return JsonResponse({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    data = medication.stored_info(fresh=True)
+    if data is None:
+        data = await AsyncDrugInfoService().fetch_external_info(medication.name)
+        await sync_to_async(medication.store_info)(data)
+    if isinstance(data, dict) and data.get("error"):
+        return JsonResponse(data, status=status.HTTP_502_BAD_GATEWAY)
+    return JsonResponse(data)
+
+
+class DoseLogViewSet(SparseFieldsMixin, ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
+    # Logs of hidden medications are gone as far as the API is concerned,
+    # even before the purge deletes them.
+    queryset = DoseLog.objects.filter(medication__deleted_at__isnull=True)
     serializer_class = DoseLogSerializer
+    pagination_class = KeysetPagination
+    version_collections = ("doselog", "medication")
+    sparse_actions = ("list", "retrieve", "filter_by_date")
+    fast_fields = {
+        "id": ("id", None),
+        "medication": ("medication_id", None),
+        "taken_at": ("taken_at", serializers.DateTimeField()),
+        "was_taken": ("was_taken", None),
+    }
 
-    @action(detail=False, methods=["get"], url_path="filter")
-    def filter_by_date(self, request):
+    def get_sparse_columns(self, fields):
+        # The paginator reads the keyset columns from every row.
+        keyset = [name.lstrip("-") for name in self.get_keyset_ordering()]
+        return list(dict.fromkeys(super().get_sparse_columns(fields) + keyset))
+
+    def get_keyset_ordering(self):
+        if self.action == "filter_by_date":
+            return ("taken_at", "id")
+        return ("-taken_at", "-id")
+
+    def create(self, request, *args, **kwargs):
+        """
+        With DOSELOG_WRITE_BEHIND, the validated log is committed by the
+        write-behind batcher together with concurrent requests; the
+        response is sent once its batch has committed. A log still queued
+        after DOSELOG_WRITE_BEHIND_TIMEOUT is withdrawn and answered with
+        503; one already being committed is waited for.
+        """
+        if not settings.DOSELOG_WRITE_BEHIND:
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            future = write_behind.get_batcher().submit(DoseLog(**serializer.validated_data))
+        except write_behind.QueueFull:
+            return Response(
+                {"error": "Too many dose logs are waiting to be written. Retry shortly."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"},
+            )
+        try:
+            serializer.instance = future.result(timeout=settings.DOSELOG_WRITE_BEHIND_TIMEOUT)
+        except FutureTimeoutError:
+            if future.cancel():
+                return Response(
+                    {"error": "The dose log was not saved in time. Retry shortly."},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": "1"},
+                )
+            # Its batch is committing; the outcome is moments away.
+            serializer.instance = future.result()
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    def _parse_date_range(self, request):
+        """
+        Parse the 'start'/'end' query parameters into an aware half-open
+        datetime range. Returns (range, error_response).
+        """
         start_param = request.query_params.get("start")
         end_param = request.query_params.get("end")
         if not start_param or not end_param:
-             return Response({"error": "Both 'start' and 'end' query parameters are required."}, status=status.HTTP_400_BAD_REQUEST)
+            return None, Response({"error": "Both 'start' and 'end' query parameters are required."}, status=status.HTTP_400_BAD_REQUEST)
         start = parse_date(start_param)
         end = parse_date(end_param)
         if not start or not end:
-            return Response({"error": "Both 'start' and 'end' query parameters must be valid dates."}, status=status.HTTP_400_BAD_REQUEST)
-        logs = self.get_queryset().filter(taken_at__date__gte=start, taken_at__date__lte=end).order_by("taken_at")
-        serializer = self.get_serializer(logs, many=True)
-        return Response(serializer.data)
+            return None, Response({"error": "Both 'start' and 'end' query parameters must be valid dates."}, status=status.HTTP_400_BAD_REQUEST)
+        return day_range(start, end), None
+
+    @action(detail=False, methods=["get"], url_path="filter")
+    def filter_by_date(self, request):
+        return self.conditional(request, self._filter_by_date)
+
+    def _filter_by_date(self, request):
+        date_range, error = self._parse_date_range(request)
+        if error:
+            return error
+        start_at, end_at = date_range
+        logs = self.get_queryset().filter(taken_at__gte=start_at, taken_at__lt=end_at)
+        if self.use_fast_path():
+            return self.fast_response(logs)
+        page = self.paginate_queryset(logs)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False, methods=["get"], url_path="export", renderer_classes=[NDJSONRenderer, CSVRenderer],
+        content_negotiation_class=FallbackContentNegotiation,
+    )
+    def export(self, request):
+        """
+        Stream every matching dose log as NDJSON (default, also for Accept
+        headers naming neither format) or CSV (?format=csv or Accept:
+        text/csv). Accepts the same 'start'/'end' filters as
+        filter_by_date, both optional, plus 'medication'.
+        """
+        logs = self.get_queryset()
+        if "start" in request.query_params or "end" in request.query_params:
+            date_range, error = self._parse_date_range(request)
+            if error:
+                return error
+            start_at, end_at = date_range
+            logs = logs.filter(taken_at__gte=start_at, taken_at__lt=end_at)
+        medication_param = request.query_params.get("medication")
+        if medication_param is not None:
+            try:
+                logs = logs.filter(medication_id=parse_id(medication_param))
+            except ValueError:
+                return Response({"error": "Invalid value for 'medication'. Must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        chunk_size = settings.DOSELOG_EXPORT_CHUNK_SIZE
+        rows = logs.order_by("taken_at", "id").values_list(
+            "id", "medication_id", "taken_at", "was_taken"
+        ).iterator(chunk_size=chunk_size)
+
+        export_format = request.accepted_renderer.format
+        lines = self._csv_lines(rows) if export_format == "csv" else self._ndjson_lines(rows)
+        response = StreamingHttpResponse(
+            self._batched(lines, chunk_size), content_type=request.accepted_renderer.media_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="doselogs.{export_format}"'
+        return response
+
+    @action(detail=False, methods=["post"], url_path="bulk", parser_classes=[ORJSONParser, NDJSONParser])
+    def bulk_create(self, request):
+        """
+        Create many dose logs from a JSON array or an NDJSON body. Rows are
+        validated in one pass and valid rows are inserted in batches;
+        invalid rows are reported by index without failing the rest.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            return Response({"error": "Expected a list of dose logs."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.DOSELOG_BULK_MAX_ROWS:
+            return Response({"error": f"At most {settings.DOSELOG_BULK_MAX_ROWS} dose logs can be sent at once."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            batch_size = int(request.query_params.get("batch_size", settings.DOSELOG_BULK_BATCH_SIZE))
+            if batch_size <= 0:
+                raise ValueError
+        except ValueError:
+            return Response({"error": "Invalid value for 'batch_size'. Must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Out-of-range ids are left to the item serializer to report.
+        referenced = set()
+        for item in items:
+            if isinstance(item, dict):
+                try:
+                    pk = int(item.get("medication"))
+                except (TypeError, ValueError):
+                    continue
+                if 1 <= pk <= BigIntegerField.MAX_BIGINT:
+                    referenced.add(pk)
+        context = {
+            **self.get_serializer_context(),
+            "now": timezone.now(),
+            "medication_ids": set(Medication.objects.filter(pk__in=referenced).values_list("pk", flat=True)),
+        }
+
+        logs, errors = [], []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors.append({"index": index, "errors": {"non_field_errors": ["Expected an object."]}})
+                continue
+            serializer = DoseLogBulkItemSerializer(data=item, context=context)
+            if serializer.is_valid():
+                logs.append(DoseLog(**serializer.validated_data))
+            else:
+                errors.append({"index": index, "errors": serializer.errors})
+
+        created = DoseLog.objects.bulk_create(logs, batch_size=batch_size) if logs else []
+        if errors and not created:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response(
+            {"created": DoseLogSerializer(created, many=True).data, "errors": errors},
+            status=response_status,
+        )
 
+    @staticmethod
+    def _ndjson_lines(rows):
+        taken_at_field = serializers.DateTimeField()
+        for pk, medication_id, taken_at, was_taken in rows:
+            yield NDJSONRenderer.line({
+                "id": pk,
+                "medication": medication_id,
+                "taken_at": taken_at_field.to_representation(taken_at),
+                "was_taken": was_taken,
+            })
 
-class DoctorNoteViewSet(viewsets.ModelViewSet):
+    @staticmethod
+    def _csv_lines(rows):
+        taken_at_field = serializers.DateTimeField()
+        writer = CSVRenderer.writer()
+        yield writer.writerow(["id", "medication", "taken_at", "was_taken"])
+        for pk, medication_id, taken_at, was_taken in rows:
+            yield writer.writerow([pk, medication_id, taken_at_field.to_representation(taken_at), was_taken])
+
+    @staticmethod
+    def _batched(lines, size):
+        lines = iter(lines)
+        while True:
+            batch = "".join(islice(lines, size))
+            if not batch:
+                return
+            yield batch
+
+
+class DoctorNoteViewSet(SparseFieldsMixin, ConditionalGetMixin, FastListMixin, viewsets.ModelViewSet):
     """
     API endpoint for doctor's notes.
     Allows listing, creating, retrieving, and deleting.
     Updates are NOT allowed.
+    ?q= returns a ranked, paginated full-text search over the note text
+    and medication name.
     """
-    queryset = DoctorNote.objects.all()
+    queryset = DoctorNote.objects.filter(medication__deleted_at__isnull=True).defer("search_vector")
     serializer_class = DoctorNoteSerializer
+    # Notes are searched by medication name.
+    version_collections = ("doctornote", "medication")
+    fast_fields = {
+        "id": ("id", None),
+        "note": ("note", None),
+        "created_at": ("created_at", serializers.DateField()),
+        "medication": ("medication_id", None),
+    }
 
     filter_backends = (SearchFilter,)
     search_fields = ["medication__name"]
+
+    def get_search_query(self):
+        """
+        Full-text query from ?q= on the list action, or None.
+        """
+        if self.action != "list":
+            return None
+        return self.request.query_params.get("q", "").strip() or None
+
+    @property
+    def paginator(self):
+        # Ranked ?q= results are paginated; the plain list is not.
+        if not hasattr(self, "_paginator"):
+            self._paginator = SearchResultsPagination() if self.get_search_query() else None
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        query = self.get_search_query()
+        if query:
+            queryset = search_notes(queryset, query)
+        return queryset
+
     def update(self, request, *args, **kwargs):
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
     def partial_update(self, request, *args, **kwargs):
-        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
\ No newline at end of file
+        return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class MissedDoseAlertViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Missed-dose alerts raised by the detect_missed_doses command, newest
+    day first, optionally for one medication (?medication=<id>).
+    """
+    queryset = MissedDoseAlert.objects.filter(medication__deleted_at__isnull=True)
+    serializer_class = MissedDoseAlertSerializer
+    pagination_class = KeysetPagination
+    # Hiding a medication hides its alerts.
+    version_collections = ("missed_dose_alert", "medication")
+
+    def get_keyset_ordering(self):
+        return ("-day", "-id")
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        medication_param = self.request.query_params.get("medication")
+        if medication_param is not None:
+            try:
+                queryset = queryset.filter(medication_id=parse_id(medication_param))
+            except ValueError:
+                raise ParseError({"error": "Invalid value for 'medication'. Must be a positive integer."})
+        return queryset
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    Dose log and note changes since a sync token (?since=<token>; omit it
+    for a full sync). Each response carries the token for the next sync;
+    keep syncing while has_more is true.
+    """
+
+    def list(self, request):
+        try:
+            data = changes_since(request.query_params.get("since"), context={"request": request})
+        except InvalidToken:
+            return Response({"error": "Invalid sync token."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
+
+
+class AnalyticsViewSet(viewsets.ViewSet):
+    """
+    Population-level reports computed with grouped queries.
+    """
+
+    @action(detail=False, methods=["get"], url_path="adherence")
+    def adherence(self, request):
+        """
+        Taken, expected and adherence per medication per day, week or
+        month between 'start' and 'end' (inclusive). Optional parameters:
+        'bucket' (default day), 'tz' (default current time zone) and
+        'medication' (comma-separated ids).
+        """
+        start = parse_date(request.query_params.get("start") or "")
+        end = parse_date(request.query_params.get("end") or "")
+        if not start or not end:
+            return Response({"error": "Both 'start' and 'end' query parameters must be valid dates."}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({"error": "'start' must be before or equal to 'end'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        bucket = request.query_params.get("bucket", "day")
+        if bucket not in BUCKETS:
+            return Response({"error": f"Invalid value for 'bucket'. Must be one of: {', '.join(BUCKETS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        if bucket_count(start, end, bucket) > settings.ANALYTICS_MAX_BUCKETS:
+            return Response({"error": f"Too many buckets; at most {settings.ANALYTICS_MAX_BUCKETS} are allowed."}, status=status.HTTP_400_BAD_REQUEST)
+
+        tz_name = request.query_params.get("tz")
+        try:
+            tz = zoneinfo.ZoneInfo(tz_name) if tz_name else timezone.get_current_timezone()
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            return Response({"error": f"Unknown time zone '{tz_name}'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        medications = Medication.objects.all()
+        medication_param = request.query_params.get("medication")
+        if medication_param:
+            try:
+                medications = medications.filter(pk__in=[parse_id(value) for value in medication_param.split(",") if value.strip()])
+            except ValueError:
+                return Response({"error": "Invalid value for 'medication'. Must be a comma-separated list of positive integers."}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = adherence_series(medications, start, end, bucket, tz)
+        return Response({
+            "start": start,
+            "end": end,
+            "bucket": bucket,
+            "tz": str(tz),
+            "results": results,
+        })
+
+
+def metrics_view(request):
+    """
+    Request, SQL and hot path metrics plus the drug info cache counters,
+    in the Prometheus text exposition format.
+    """
+    if request.method != "GET":
+        return HttpResponseNotAllowed(["GET"])
+    extra = [
+        "# HELP medtracker_drug_info_cache_total Drug info lookups by cache outcome.",
+        "# TYPE medtracker_drug_info_cache_total counter",
+    ]
+    extra += [
+        f'medtracker_drug_info_cache_total{{result="{name}"}} {count}'
+        for name, count in sorted(DrugInfoService.cache_stats().items())
+    ]
+    return HttpResponse(metrics.render(extra), content_type="text/plain; version=0.0.4; charset=utf-8")
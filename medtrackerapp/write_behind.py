@@ -0,0 +1,186 @@
+"""
+Write-behind batching of single dose log inserts.
+
+With DOSELOG_WRITE_BEHIND enabled, POST /api/logs/ validates the dose
+log and hands it to a process-wide DoseLogBatcher instead of committing
+it itself. A committer thread collects queued logs for up to
+DOSELOG_WRITE_BEHIND_MAX_DELAY_MS (or DOSELOG_WRITE_BEHIND_BATCH_SIZE
+logs) and inserts them with one bulk_create in one transaction. Each
+request waits on a future that resolves only once its batch has
+committed, so an acknowledged log is as durable as with per-request
+commits; logs still queued when the process dies were never
+acknowledged. A full queue is reported to the caller straight away
+rather than queued behind.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+from . import metrics
+from .models import DoseLog
+
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class QueueFull(Exception):
+    """
+    Raised by DoseLogBatcher.submit() when the buffer is full.
+    """
+
+
+class DoseLogBatcher:
+    """
+    Bounded buffer of unsaved dose logs plus the thread committing them
+    in batches.
+    """
+
+    def __init__(self, batch_size=500, max_delay=0.005, max_queue=10000, using="default"):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.using = using
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="doselog-write-behind", daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """
+        Commit everything queued so far, then stop the committer.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def submit(self, log):
+        """
+        Queue an unsaved DoseLog. Returns a future resolving to the saved
+        log once its batch has committed; raises QueueFull if the buffer
+        is full.
+        """
+        future = Future()
+        try:
+            self._queue.put_nowait((log, future))
+        except queue.Full:
+            raise QueueFull()
+        return future
+
+    def _run(self):
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                try:
+                    self.flush(batch)
+                except Exception as exc:
+                    logger.exception("Committing a dose log batch failed.")
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(exc)
+        finally:
+            connections.close_all()
+
+    def flush(self, batch):
+        """
+        Insert a batch of (log, future) pairs in one transaction and
+        resolve the futures. If the batch fails, its logs are retried one
+        by one so a single bad row only fails its own request.
+        """
+        batch = [(log, future) for log, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        close_old_connections()
+        metrics.WRITE_BEHIND_BATCH_ROWS.observe(len(batch))
+        try:
+            self._insert([log for log, _ in batch])
+        except Exception as exc:
+            if len(batch) == 1:
+                batch[0][1].set_exception(exc)
+                return
+            logger.warning("Dose log batch of %s failed (%s); retrying row by row.", len(batch), exc)
+            for item in batch:
+                self._flush_one(*item)
+            return
+        for log, future in batch:
+            future.set_result(log)
+
+    def _flush_one(self, log, future):
+        try:
+            self._insert([log])
+        except Exception as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(log)
+
+    def _insert(self, logs):
+        try:
+            with transaction.atomic(using=self.using):
+                DoseLog.objects.using(self.using).bulk_create(logs)
+        except Exception:
+            # Primary keys assigned before the rollback are not real.
+            for log in logs:
+                log.pk = None
+                log._state.adding = True
+            raise
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """
+    The process-wide batcher, started on first use from the
+    DOSELOG_WRITE_BEHIND_* settings.
+    """
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = DoseLogBatcher(
+                batch_size=settings.DOSELOG_WRITE_BEHIND_BATCH_SIZE,
+                max_delay=settings.DOSELOG_WRITE_BEHIND_MAX_DELAY_MS / 1000,
+                max_queue=settings.DOSELOG_WRITE_BEHIND_QUEUE_SIZE,
+            ).start()
+        return _batcher
+
+
+def shutdown(timeout=None):
+    """
+    Drain and stop the process-wide batcher, if one was started.
+    """
+    global _batcher
+    with _batcher_lock:
+        batcher, _batcher = _batcher, None
+    if batcher is not None:
+        batcher.stop(timeout)